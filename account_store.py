@@ -0,0 +1,357 @@
+"""Penyimpanan pengguna, role, hak akses dan daftar spreadsheet.
+
+Dua backend dengan antarmuka yang sama: ``FileAccountStore`` (config.json dan
+credentials.yaml seperti sebelumnya) dan ``SqliteAccountStore`` (tabel
+berindeks, satu transaksi per perubahan). ``migrate()`` memindahkan isi file
+lama ke SQLite.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config_store import freeze, parse_json, parse_yaml, thaw
+
+USER_FIELDS = ('name', 'email', 'password', 'role')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roles (
+    name TEXT PRIMARY KEY,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS users_role ON users (role);
+CREATE TABLE IF NOT EXISTS spreadsheets (
+    page_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    settings TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS spreadsheets_position ON spreadsheets (position);
+CREATE TABLE IF NOT EXISTS access (
+    role TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (role, page_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS access_page ON access (page_id);
+"""
+
+
+def user_matches(username, info, query):
+    query = query.lower()
+    return any(query in str(value).lower() for value in (username, info.get('name', ''), info.get('email', '')))
+
+
+class FileAccountStore:
+    """Backend lama: roles/spreadsheets di config.json, pengguna di credentials.yaml."""
+
+    def __init__(self, config_store, credentials_store):
+        self.config_store = config_store
+        self.credentials_store = credentials_store
+        self._access = (None, {})
+
+    def version(self):
+        return (id(self.config_store.get()), id(self.credentials_store.get()))
+
+    # --- pengguna ---
+
+    def credentials(self):
+        return self.credentials_store.get()['credentials']
+
+    def user(self, username):
+        return self.credentials()['usernames'].get(username)
+
+    def _matching(self, query=None):
+        usernames = self.credentials()['usernames']
+        return [
+            (username, info) for username, info in sorted(usernames.items())
+            if not query or user_matches(username, info, query)
+        ]
+
+    def users(self, offset=0, limit=50, query=None):
+        return [
+            {'username': username, 'name': info.get('name', ''), 'email': info.get('email', ''), 'role': info.get('role', '')}
+            for username, info in self._matching(query)[offset:offset + limit]
+        ]
+
+    def count_users(self, query=None):
+        if not query:
+            return len(self.credentials()['usernames'])
+        return len(self._matching(query))
+
+    def add_user(self, username, info):
+        if self.user(username) is not None:
+            return False
+        self.credentials_store.set(['credentials', 'usernames', username], info)
+        return True
+
+    def delete_user(self, username):
+        if self.user(username) is None:
+            return False
+        self.credentials_store.delete(['credentials', 'usernames', username])
+        return True
+
+    # --- role dan hak akses ---
+
+    def roles(self):
+        return self.config_store.get()['roles']
+
+    def role_access(self, role):
+        roles = self.roles()
+        cached_roles, access = self._access
+        if cached_roles is not roles:
+            access = {name: frozenset(info.get('access', ())) for name, info in roles.items()}
+            self._access = (roles, access)
+        return access.get(role, frozenset())
+
+    def has_access(self, role, page_id):
+        return page_id in self.role_access(role)
+
+    # --- daftar spreadsheet ---
+
+    def spreadsheets(self):
+        return self.config_store.get()['spreadsheets']
+
+    def spreadsheet(self, page_id):
+        return self.spreadsheets().get(page_id)
+
+    def put_spreadsheet(self, page_id, info):
+        self.config_store.set(['spreadsheets', page_id], info)
+
+
+class SqliteAccountStore:
+    """Backend SQLite (stdlib) dengan tabel berindeks untuk pengguna, role, akses dan spreadsheet.
+
+    Setiap perubahan adalah satu transaksi pendek yang menyentuh satu baris
+    dan menaikkan ``meta.version``; pembaca memakai salinan beku (``freeze``)
+    yang dibangun ulang hanya saat versi itu berubah. Satu koneksi per thread,
+    mode WAL agar pembaca tidak terblokir penulis dari proses lain.
+    """
+
+    def __init__(self, path='barjas.db', timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cached = {}
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0')")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+        connection.execute('COMMIT')
+
+    def version(self):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row['value'])
+
+    def _memo(self, name, build):
+        """Hasil ``build()`` dibekukan dan dipakai ulang selama versi database sama."""
+        version = self.version()
+        with self._lock:
+            cached = self._cached.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        value = freeze(build())
+        with self._lock:
+            self._cached[name] = (version, value)
+        return value
+
+    def is_empty(self):
+        connection = self._connection()
+        return (
+            connection.execute('SELECT 1 FROM users LIMIT 1').fetchone() is None
+            and connection.execute('SELECT 1 FROM spreadsheets LIMIT 1').fetchone() is None
+        )
+
+    # --- pengguna ---
+
+    @staticmethod
+    def _user_info(row):
+        info = json.loads(row['extra'])
+        info.update({field: row[field] for field in USER_FIELDS})
+        return info
+
+    def credentials(self):
+        """``{'usernames': {...}}`` untuk streamlit-authenticator."""
+        def build():
+            rows = self._connection().execute('SELECT * FROM users ORDER BY username')
+            return {'usernames': {row['username']: self._user_info(row) for row in rows}}
+        return self._memo('credentials', build)
+
+    def user(self, username):
+        row = self._connection().execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        return freeze(self._user_info(row)) if row is not None else None
+
+    @staticmethod
+    def _where(query):
+        if not query:
+            return '', ()
+        # % dan _ di kata kunci dicari apa adanya, bukan sebagai wildcard LIKE
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f"%{escaped}%"
+        return " WHERE username LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\'", (pattern, pattern, pattern)
+
+    def users(self, offset=0, limit=50, query=None):
+        where, params = self._where(query)
+        rows = self._connection().execute(
+            f'SELECT username, name, email, role FROM users{where} ORDER BY username LIMIT ? OFFSET ?',
+            params + (limit, offset)
+        )
+        return [dict(row) for row in rows]
+
+    def count_users(self, query=None):
+        where, params = self._where(query)
+        return self._connection().execute(f'SELECT COUNT(*) FROM users{where}', params).fetchone()[0]
+
+    def add_user(self, username, info):
+        info = thaw(info)
+        extra = {key: value for key, value in info.items() if key not in USER_FIELDS}
+        try:
+            with self._transaction() as connection:
+                connection.execute(
+                    'INSERT INTO users (username, name, email, password, role, extra) VALUES (?, ?, ?, ?, ?, ?)',
+                    (username, info.get('name', ''), info.get('email', ''), info['password'], info['role'], json.dumps(extra))
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def delete_user(self, username):
+        with self._transaction() as connection:
+            deleted = connection.execute('DELETE FROM users WHERE username = ?', (username,)).rowcount
+        return deleted > 0
+
+    # --- role dan hak akses ---
+
+    def roles(self):
+        def build():
+            connection = self._connection()
+            roles = {row['name']: {'description': row['description'], 'access': []} for row in connection.execute('SELECT * FROM roles ORDER BY name')}
+            for row in connection.execute('SELECT role, page_id FROM access ORDER BY role, position'):
+                roles.setdefault(row['role'], {'description': '', 'access': []})['access'].append(row['page_id'])
+            return roles
+        return self._memo('roles', build)
+
+    def role_access(self, role):
+        rows = self._connection().execute('SELECT page_id FROM access WHERE role = ?', (role,))
+        return frozenset(row['page_id'] for row in rows)
+
+    def has_access(self, role, page_id):
+        row = self._connection().execute('SELECT 1 FROM access WHERE role = ? AND page_id = ?', (role, page_id)).fetchone()
+        return row is not None
+
+    # --- daftar spreadsheet ---
+
+    @staticmethod
+    def _sheet_info(row):
+        info = json.loads(row['settings'])
+        info.update({'name': row['name'], 'url': row['url']})
+        return info
+
+    def spreadsheets(self):
+        def build():
+            rows = self._connection().execute('SELECT * FROM spreadsheets ORDER BY position, page_id')
+            return {row['page_id']: self._sheet_info(row) for row in rows}
+        return self._memo('spreadsheets', build)
+
+    def spreadsheet(self, page_id):
+        row = self._connection().execute('SELECT * FROM spreadsheets WHERE page_id = ?', (page_id,)).fetchone()
+        return freeze(self._sheet_info(row)) if row is not None else None
+
+    def put_spreadsheet(self, page_id, info):
+        info = thaw(info)
+        settings = {key: value for key, value in info.items() if key not in ('name', 'url')}
+        with self._transaction() as connection:
+            connection.execute(
+                """INSERT INTO spreadsheets (page_id, position, name, url, settings)
+                   VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM spreadsheets), ?, ?, ?)
+                   ON CONFLICT (page_id) DO UPDATE SET name = excluded.name, url = excluded.url, settings = excluded.settings""",
+                (page_id, info['name'], info['url'], json.dumps(settings))
+            )
+
+    # --- migrasi ---
+
+    def migrate(self, config, credentials):
+        """Salin roles, akses dan spreadsheet dari config.json serta pengguna dari credentials.yaml.
+
+        Dijalankan dalam satu transaksi; baris yang sudah ada tidak ditimpa
+        sehingga aman dijalankan ulang.
+        """
+        config, credentials = thaw(config), thaw(credentials)
+        with self._transaction() as connection:
+            for name, info in config.get('roles', {}).items():
+                connection.execute('INSERT OR IGNORE INTO roles (name, description) VALUES (?, ?)', (name, info.get('description', '')))
+                for position, page_id in enumerate(info.get('access', [])):
+                    connection.execute('INSERT OR IGNORE INTO access (role, page_id, position) VALUES (?, ?, ?)', (name, page_id, position))
+            for position, (page_id, info) in enumerate(config.get('spreadsheets', {}).items()):
+                settings = {key: value for key, value in info.items() if key not in ('name', 'url')}
+                connection.execute(
+                    'INSERT OR IGNORE INTO spreadsheets (page_id, position, name, url, settings) VALUES (?, ?, ?, ?, ?)',
+                    (page_id, position, info['name'], info['url'], json.dumps(settings))
+                )
+            for username, info in credentials.get('credentials', {}).get('usernames', {}).items():
+                extra = {key: value for key, value in info.items() if key not in USER_FIELDS}
+                connection.execute(
+                    'INSERT OR IGNORE INTO users (username, name, email, password, role, extra) VALUES (?, ?, ?, ?, ?, ?)',
+                    (username, info.get('name', ''), info.get('email', ''), info['password'], info.get('role', 'user'), json.dumps(extra))
+                )
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', '1')")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrasi config.json dan credentials.yaml ke SQLite")
+    parser.add_argument('--db', default='barjas.db')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--credentials', default='credentials.yaml')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = parse_json(file.read())
+    credentials = {}
+    if os.path.exists(args.credentials):
+        with open(args.credentials, 'r') as file:
+            credentials = parse_yaml(file.read())
+
+    store = SqliteAccountStore(args.db)
+    store.migrate(config, credentials)
+    print(f"{store.count_users()} pengguna, {len(store.roles())} role, {len(store.spreadsheets())} spreadsheet di {args.db}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Ringkasan lintas sheet (PSP/TPH/NAK/BUN + Perubahan) untuk halaman Analisa."""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Nama kolom yang dicari (huruf kecil) untuk tiap besaran; nama persis didahulukan,
+# lalu nama yang memuat kandidat sebagai kata utuh
+DEFAULT_COLUMNS = {
+    'pagu': ['pagu', 'anggaran', 'hps'],
+    'realisasi': ['realisasi', 'nilai kontrak', 'nilai'],
+    'penyedia': ['penyedia', 'vendor', 'rekanan'],
+    'status': ['status', 'tahap'],
+    'paket': ['nama paket', 'paket', 'uraian', 'kegiatan'],
+}
+
+# Besaran berupa nilai rupiah: kolomnya harus berisi angka
+AMOUNT_KEYS = ('pagu', 'realisasi')
+
+# Isi sel yang dianggap angka: ``1250000``, ``Rp 1.250.000,00``, ``-1234.50``
+NUMBER_PATTERN = r'^\s*(?:rp\.?)?\s*-?\d[\d.,]*\s*$'
+
+
+def normalize(name):
+    return re.sub(r'\s+', ' ', str(name)).strip().lower()
+
+
+def is_numeric_column(series, threshold=0.8):
+    """``True`` jika sebagian besar sel terisi berupa angka (bukan nomor seperti ``12/KTR/2024``)."""
+    if pd.api.types.is_numeric_dtype(series):
+        return True
+    # Cukup contoh sel awal; kolom besar tidak perlu dipindai seluruhnya
+    values = series.dropna().head(500).astype(str).str.strip()
+    values = values[values != '']
+    if values.empty:
+        return False
+    return values.str.match(NUMBER_PATTERN, case=False).mean() >= threshold
+
+
+def find_column(frame, candidates, numeric=False):
+    """Kolom pertama yang cocok dengan salah satu kandidat; ``numeric`` mensyaratkan isi angka."""
+    columns = {normalize(column): column for column in frame.columns}
+    patterns = [re.compile(rf'(?<!\w){re.escape(candidate)}(?!\w)') for candidate in candidates]
+    for exact in (True, False):
+        for candidate, pattern in zip(candidates, patterns):
+            for normalized, column in columns.items():
+                matched = normalized == candidate if exact else pattern.search(normalized) is not None
+                if matched and (not numeric or is_numeric_column(frame[column])):
+                    return column
+    return None
+
+
+def to_number(series):
+    """Angka dari kolom rupiah seperti ``Rp 1.250.000,00``; vektorisasi penuh.
+
+    Format Indonesia (titik ribuan, koma desimal) didahulukan; titik dianggap
+    desimal bila tidak ada koma dan titik itu bukan pemisah ribuan (``1234.50``,
+    ``1,234.50``).
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    text = series.astype(str).str.replace(r'[^0-9,.\-]', '', regex=True)
+    # Format Inggris dengan koma ribuan dan titik desimal (``1,234.50``): buang komanya
+    text = text.where(~text.str.fullmatch(r'-?\d{1,3}(?:,\d{3})+\.\d+'), text.str.replace(',', '', regex=False))
+    thousands = text.str.contains(',', regex=False) | text.str.fullmatch(r'-?\d{1,3}(?:\.\d{3})+')
+    text = text.where(~thousands, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(text, errors='coerce')
+
+
+def source_columns(frame, columns):
+    """Kolom sumber tiap besaran baku di satu tab (``None`` bila tidak ada)."""
+    return {
+        key: find_column(frame, columns[key], numeric=key in AMOUNT_KEYS)
+        for key in ('pagu', 'realisasi', 'penyedia', 'status', 'paket')
+    }
+
+
+def standardize_tab(page_id, tab_name, frame, sources):
+    part = pd.DataFrame({
+        'bidang': page_id.upper(),
+        'sheet': tab_name,
+        'pagu': to_number(frame[sources['pagu']]),
+    })
+    for key in ('realisasi',):
+        column = sources[key]
+        part[key] = to_number(frame[column]) if column is not None else 0.0
+    for key in ('penyedia', 'status', 'paket'):
+        column = sources[key]
+        part[key] = frame[column].astype('string') if column is not None else pd.NA
+    return part[part['pagu'].notna()]
+
+
+def standardize(page_id, frames, columns, parts=None):
+    """Gabungkan semua tab sebuah sheet menjadi tabel dengan kolom baku.
+
+    ``parts`` (opsional) memo ``{(page_id, tab): (cap, tabel_baku)}``: tab yang
+    isi kolom sumbernya tidak berubah sejak versi sebelumnya tidak dihitung ulang.
+    """
+    result = []
+    for tab_name, frame in frames.items():
+        sources = source_columns(frame, columns)
+        if sources['pagu'] is None or frame.empty:
+            continue
+        if parts is None:
+            result.append(standardize_tab(page_id, tab_name, frame, sources))
+            continue
+        used = list(dict.fromkeys(column for column in sources.values() if column is not None))
+        hashes = pd.util.hash_pandas_object(frame[used], index=False).to_numpy()
+        stamp = (tuple(sources.items()), hashlib.sha1(hashes.tobytes()).hexdigest())
+        cached = parts.get((page_id, tab_name))
+        if cached is None or cached[0] != stamp:
+            cached = parts[(page_id, tab_name)] = (stamp, standardize_tab(page_id, tab_name, frame, sources))
+        result.append(cached[1])
+    if parts is not None:
+        for key in [key for key in parts if key[0] == page_id and key[1] not in frames]:
+            parts.pop(key, None)
+    if not result:
+        return pd.DataFrame(columns=['bidang', 'sheet', 'pagu', 'realisasi', 'penyedia', 'status', 'paket'])
+    return pd.concat(result, ignore_index=True)
+
+
+def build_summary(sources, changes=None, columns=None, parts=None):
+    """Hitung semua tabel ringkasan dari ``{page_id: {tab: DataFrame}}``.
+
+    Agregat (groupby) selalu dihitung ulang dari tabel baku gabungan; yang
+    dipakai ulang antarversi hanya tabel baku per tab lewat ``parts``.
+    """
+    columns = {**DEFAULT_COLUMNS, **(columns or {})}
+    data = pd.concat([standardize(page_id, frames, columns, parts) for page_id, frames in sources.items()], ignore_index=True)
+    data['realisasi'] = data['realisasi'].fillna(0.0)
+
+    per_bidang = data.groupby('bidang', observed=True).agg(
+        paket=('pagu', 'size'),
+        pagu=('pagu', 'sum'),
+        realisasi=('realisasi', 'sum'),
+    )
+    per_bidang['sisa'] = per_bidang['pagu'] - per_bidang['realisasi']
+    per_bidang['persen_realisasi'] = (per_bidang['realisasi'] / per_bidang['pagu'].where(per_bidang['pagu'] != 0)).mul(100).round(2)
+
+    summary = {
+        'data': data,
+        'per_bidang': per_bidang.reset_index(),
+        'total': {
+            'paket': int(len(data)),
+            'pagu': float(data['pagu'].sum()),
+            'realisasi': float(data['realisasi'].sum()),
+        },
+    }
+
+    if data['status'].notna().any():
+        summary['per_status'] = data.pivot_table(
+            index='bidang', columns='status', values='pagu', aggfunc='size', fill_value=0, observed=True
+        ).reset_index()
+
+    if data['penyedia'].notna().any():
+        summary['per_penyedia'] = (
+            data.dropna(subset=['penyedia'])
+            .groupby(['penyedia', 'bidang'], observed=True)['realisasi'].sum()
+            .unstack(fill_value=0.0)
+            .assign(total=lambda frame: frame.sum(axis=1))
+            .sort_values('total', ascending=False)
+            .head(20)
+            .reset_index()
+        )
+
+    if changes:
+        rows = []
+        for tab_name, frame in changes.items():
+            value_column = find_column(frame, columns['pagu'] + columns['realisasi'], numeric=True)
+            rows.append({
+                'sheet': tab_name,
+                'perubahan': len(frame),
+                'nilai': float(to_number(frame[value_column]).sum()) if value_column is not None else None,
+            })
+        summary['perubahan'] = pd.DataFrame(rows)
+
+    return summary
+
+
+# Kunci entri memori untuk tabel baku per tab (lihat ``AnalyticsCache.parts``)
+PARTS_KEY = 'tabel baku'
+
+
+class AnalyticsCache:
+    """Memo hasil ``build_summary`` per kombinasi versi data sumber.
+
+    ``parts`` menyimpan tabel baku per tab agar versi baru sebuah sheet hanya
+    menghitung ulang tab yang berubah.
+    """
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.parts = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'builds': 0}
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._sizes[key] = (self._sizes[key][0], time.time())
+                self.stats['hits'] += 1
+                return self._entries[key]
+        result = build()
+        nbytes = sum(int(frame.memory_usage(deep=True).sum()) for frame in result.values() if isinstance(frame, pd.DataFrame))
+        with self._lock:
+            self._entries[key] = result
+            self._sizes[key] = (nbytes, time.time())
+            self.stats['builds'] += 1
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self._sizes.pop(old, None)
+        return result
+
+    def memory_entries(self):
+        with self._lock:
+            entries = [(key, nbytes, used_at) for key, (nbytes, used_at) in self._sizes.items()]
+        parts = list(self.parts.values())
+        if parts:
+            nbytes = sum(int(part.memory_usage(deep=True).sum()) for _, part in parts)
+            entries.append((PARTS_KEY, nbytes, max((used_at for _, _, used_at in entries), default=time.time())))
+        return entries
+
+    def release(self, key):
+        if key == PARTS_KEY:
+            parts, self.parts = self.parts, {}
+            return sum(int(part.memory_usage(deep=True).sum()) for _, part in parts.values())
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return 0
+            return self._sizes.pop(key)[0]
@@ -1,15 +1,41 @@
+import time
+import_started = time.perf_counter()
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import yaml
 import os
-import json
-import base64
-import requests
-import io
-from PIL import Image
-from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
-from datetime import datetime
+import tempfile
+import hashlib
+import html
+from datetime import datetime, timedelta
+from export_cache import ExportCache, make_fetcher, fetch_many
+from http_client import HttpClient
+from download_server import DownloadServer, load_secret, sign_token, write_zip
+from config_store import (
+    FileStore, JournaledStore, ReadOnlyDict, freeze,
+    parse_json, parse_yaml, parse_text, dump_json, dump_yaml
+)
+from sheet_data import TableCache, FrameTable, frames_from_gspread, frames_from_xlsx, frame_layout
+from account_store import FileAccountStore, SqliteAccountStore
+from session_auth import SessionCache, PasswordVerifier, RateLimiter, LoginBusy
+from prefetch import PrefetchScheduler
+from analytics import AnalyticsCache, build_summary
+from snapshot_store import SnapshotStore
+from shared_cache import SharedExportStore
+from search_index import SearchIndex
+from memory_budget import MemoryBudget, SpillStore, deep_size, process_rss
+from concurrent.futures import ThreadPoolExecutor
+from logo_store import save_logo, save_data_uri, logo_path, logo_url, remove_logo
+from metrics import REGISTRY as metrics
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit import runtime
+from startup import BOOT, Warmup, preload
+from theme_assets import ThemeAssets, switcher_html
+
+# gspread, streamlit_authenticator, pyarrow/openpyxl (columnar_store) dan
+# write_queue diimpor di fungsi yang memakainya: lebih dari separuh waktu impor
+# saat start dingin, padahal tidak dibutuhkan untuk menggambar halaman pertama
+BOOT.mark('imports', time.perf_counter() - import_started)
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -19,13 +45,24 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load CSS
-def load_css():
-    with open('style.css') as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+# Mulai pengukuran eksekusi script ini (ditutup di bagian paling bawah)
+run_context = get_script_run_ctx()
+metrics.begin_run(run_context.session_id if run_context else None)
+
+# Store file bersama: tiap file diparse sekali per proses dan dibaca ulang
+# hanya jika mtime atau ukurannya berubah
+@st.cache_resource
+def get_file_store(path, kind):
+    if kind == 'json':
+        return JournaledStore(path, parse_json, dump_json)
+    if kind == 'yaml':
+        return JournaledStore(path, parse_yaml, dump_yaml)
+    return FileStore(path, parse_text)
 
-# Load CSS
-load_css()
+# Fungsi untuk mengirim HTML sekaligus mencatat ukurannya
+def render_html(stage, html):
+    metrics.size(stage, html)
+    st.markdown(html, unsafe_allow_html=True)
 
 # Inisialisasi session state
 if 'authenticated' not in st.session_state:
@@ -36,15 +73,47 @@ if 'role' not in st.session_state:
     st.session_state['role'] = None
 if 'current_page' not in st.session_state:
     st.session_state['current_page'] = 'home'
-if 'theme' not in st.session_state:
-    st.session_state['theme'] = 'light'
+
+# Navigasi lewat callback: state diubah sebelum script dijalankan sehingga
+# satu klik cukup satu kali eksekusi, dan halaman tercermin di URL (?page=...)
+def navigate(page):
+    st.session_state['current_page'] = page
+    st.query_params['page'] = page
+
+# Fungsi untuk menyamakan halaman aktif dengan parameter URL (untuk bookmark)
+def sync_page_with_url():
+    page = st.query_params.get('page')
+    if page and page != st.session_state['current_page']:
+        st.session_state['current_page'] = page
+    elif st.query_params.get('page') != st.session_state['current_page']:
+        st.query_params['page'] = st.session_state['current_page']
+
+# Pesan hasil aksi dari callback, ditampilkan sekali pada eksekusi berikutnya
+def flash(kind, message):
+    st.session_state.setdefault('flash', []).append((kind, message))
+
+def show_flash():
+    for kind, message in st.session_state.pop('flash', []):
+        getattr(st, kind)(message)
+
+# Fungsi untuk menyimpan kredensial
+def save_credentials(credentials):
+    get_file_store('credentials.yaml', 'yaml').replace(credentials)
+
+# Fungsi untuk menyimpan konfigurasi
+def save_config(config):
+    get_file_store('config.json', 'json').replace(config)
+
+# Fungsi untuk mengubah satu bagian konfigurasi tanpa menulis ulang seluruh file
+def update_config(path, value):
+    get_file_store('config.json', 'json').set(path, value)
 
 # Fungsi untuk memuat konfigurasi
+@metrics.timed('load_config')
 def load_config():
     config_path = 'config.json'
     if os.path.exists(config_path):
-        with open(config_path, 'r') as file:
-            return json.load(file)
+        return get_file_store(config_path, 'json').get()
     else:
         # Konfigurasi default
         default_config = {
@@ -115,7 +184,8 @@ def load_config():
                     "name": "Analisa",
                     "url": "https://docs.google.com/spreadsheets/d/1HrcReS9fHohnWzptsILGsaW01Mt55LSPaf44Lq8-A2Q/edit?usp=drive_link",
                     "embed": True,
-                    "download": True
+                    "download": True,
+                    "mode": "analytics"
                 }
             },
             "features": {
@@ -125,25 +195,125 @@ def load_config():
                 "user_management": True,
                 "link_management": True,
                 "page_editing": True
+            },
+            "cache": {
+                "ttl_seconds": 300,
+                "max_bytes": 67108864
+            },
+            "analytics": {
+                "sources": ["psp", "tph", "nak", "bun"],
+                "changes": "perubahan"
+            },
+            "snapshots": {
+                "enabled": True,
+                "path": "snapshots",
+                "max_versions": 50
+            },
+            "columnar": {
+                "enabled": True,
+                "path": "columnar"
+            },
+            "editing": {
+                "debounce_seconds": 2,
+                "max_delay_seconds": 10
+            },
+            "storage": {
+                "backend": "sqlite",
+                "path": "barjas.db"
+            },
+            "shared_cache": {
+                "enabled": True,
+                "path": "shared_cache",
+                "poll_seconds": 1.0
+            },
+            "auth": {
+                "session_ttl_seconds": 28800,
+                "bcrypt_workers": 2,
+                "max_pending": 16,
+                "rate_limit_attempts": 10,
+                "rate_limit_window_seconds": 60,
+                "session_recheck_seconds": 60,
+                "trusted_proxies": [],
+                "secret_path": ".server_secret"
+            },
+            "startup": {
+                "warm_up": True,
+                "import_budget_ms": 500,
+                "first_paint_budget_ms": 1500
+            },
+            "memory": {
+                "enabled": True,
+                "max_mb": 512,
+                "max_rss_mb": 0,
+                "target_ratio": 0.85,
+                "interval_seconds": 10,
+                "idle_session_minutes": 30,
+                "idle_drop_min_kb": 16,
+                "spill_path": "spill",
+                "spill_max_mb": 1024
+            },
+            "exports": {
+                "enabled": True,
+                "path": "exports",
+                "workers": 2,
+                "max_results": 100,
+                "max_mb": 1024,
+                "refresh_seconds": 1.5
+            },
+            "api": {
+                "enabled": True,
+                "token_ttl_days": 90,
+                "default_limit": 1000,
+                "max_limit": 50000
+            },
+            "metrics": {
+                "enabled": True,
+                "capacity": 20000,
+                "export_interval_seconds": 60,
+                "jsonl_path": "metrics/spans.jsonl",
+                "prometheus_path": "metrics/metrics.prom"
+            },
+            "download_server": {
+                "enabled": True,
+                "host": "0.0.0.0",
+                "port": 8502,
+                "public_url": ""
+            },
+            "prefetch": {
+                "enabled": True,
+                "interval_seconds": 240,
+                "jitter": 0.1,
+                "workers": 4
+            },
+            "http": {
+                "connect_timeout": 5,
+                "read_timeout": 30,
+                "retries": 3,
+                "backoff_seconds": 0.5,
+                "max_backoff_seconds": 8,
+                "pool_size": 10,
+                "breaker_threshold": 5,
+                "breaker_reset_seconds": 30,
+                "export_base_url": ""
             }
         }
         
         # Simpan konfigurasi default
-        with open(config_path, 'w') as file:
-            json.dump(default_config, file, indent=2)
+        save_config(default_config)
         
-        return default_config
+        return freeze(default_config)
 
 # Muat konfigurasi
 config = load_config()
 
 # Fungsi untuk memuat kredensial pengguna
+@metrics.timed('load_credentials')
 def load_credentials():
     credentials_path = 'credentials.yaml'
     if os.path.exists(credentials_path):
-        with open(credentials_path, 'r') as file:
-            return yaml.load(file, Loader=SafeLoader)
+        return get_file_store(credentials_path, 'yaml').get()
     else:
+        import streamlit_authenticator as stauth
         # Kredensial default
         default_credentials = {
             'credentials': {
@@ -170,70 +340,444 @@ def load_credentials():
         }
         
         # Simpan kredensial default
-        with open(credentials_path, 'w') as file:
-            yaml.dump(default_credentials, file)
+        save_credentials(default_credentials)
         
-        return default_credentials
+        return freeze(default_credentials)
 
 # Muat kredensial
 credentials = load_credentials()
 
-# Inisialisasi authenticator sekali saja (global)
-authenticator = stauth.Authenticate(
-    credentials['credentials'],
-    credentials['cookie']['name'],
-    credentials['cookie']['key'],
-    credentials['cookie']['expiry_days']
-)
+# Backend pengguna, role, hak akses dan daftar spreadsheet (file atau SQLite)
+@st.cache_resource
+def get_account_store():
+    settings = config.get('storage', {})
+    if settings.get('backend', 'file') != 'sqlite':
+        return FileAccountStore(get_file_store('config.json', 'json'), get_file_store('credentials.yaml', 'yaml'))
+    
+    store = SqliteAccountStore(settings.get('path', 'barjas.db'))
+    # Migrasi sekali dari config.json/credentials.yaml saat database masih kosong
+    if store.is_empty():
+        store.migrate(config, credentials)
+    return store
 
-# Fungsi untuk menyimpan kredensial
-def save_credentials(credentials):
-    with open('credentials.yaml', 'w') as file:
-        yaml.dump(credentials, file)
+# Fungsi untuk melengkapi konfigurasi dan kredensial dengan isi backend penyimpanan
+def load_registry():
+    store = get_account_store()
+    return (
+        ReadOnlyDict(config, roles=store.roles(), spreadsheets=store.spreadsheets()),
+        ReadOnlyDict(credentials, credentials=store.credentials())
+    )
 
-# Fungsi untuk menyimpan konfigurasi
-def save_config(config):
-    with open('config.json', 'w') as file:
-        json.dump(config, file, indent=2)
+config, credentials = load_registry()
+
+# Fungsi untuk mengecek hak akses role ke satu halaman
+def has_access(role, page_id):
+    return role == 'admin' or get_account_store().has_access(role, page_id)
+
+# Rahasia penanda tangan token (sesi, cookie login ulang, link unduhan, API).
+# Bukan cookie.key di credentials.yaml, yang ikut di-commit: diambil dari
+# st.secrets['server_secret'] atau dibuat acak sekali di auth.secret_path
+@st.cache_resource
+def get_server_secret():
+    if st.secrets.load_if_toml_exists() and 'server_secret' in st.secrets:
+        return str(st.secrets['server_secret'])
+    return load_secret(config.get('auth', {}).get('secret_path', '.server_secret'))
+
+# Token sesi, pengecekan bcrypt dan rate limit login, satu per proses
+@st.cache_resource
+def get_session_cache():
+    settings = config.get('auth', {})
+    return SessionCache(
+        get_server_secret(),
+        settings.get('session_ttl_seconds', 8 * 3600),
+        lookup=lambda username: (get_account_store().user(username) or {}).get('role'),
+        recheck_seconds=settings.get('session_recheck_seconds', 60)
+    )
+
+@st.cache_resource
+def get_password_verifier():
+    settings = config.get('auth', {})
+    return PasswordVerifier(settings.get('bcrypt_workers', 2), settings.get('max_pending', 16))
+
+@st.cache_resource
+def get_rate_limiter():
+    settings = config.get('auth', {})
+    return RateLimiter(settings.get('rate_limit_attempts', 10), settings.get('rate_limit_window_seconds', 60))
+
+# Authenticator hanya dipakai untuk cookie login ulang, jadi dibuat saat sesi
+# belum login saja, bukan di setiap eksekusi. Daftar pengguna tidak diperlukan
+# di sini karena password dicek sendiri lewat get_password_verifier()
+def get_authenticator():
+    import streamlit_authenticator as stauth
+    return stauth.Authenticate(
+        {'usernames': {}},
+        credentials['cookie']['name'],
+        get_server_secret(),
+        credentials['cookie']['expiry_days']
+    )
+
+# Pindahkan logo lama berbentuk data URI ke file statis
+if config.get('app_logo', '').startswith('data:'):
+    migrated_logo = save_data_uri(config['app_logo'])
+    if migrated_logo != config['app_logo']:
+        update_config(['app_logo'], migrated_logo)
+        config = load_config()
+        config, credentials = load_registry()
+
+# Snapshot sheet di disk agar restart tetap hangat dan perubahan per baris tercatat
+@st.cache_resource
+def get_snapshot_store():
+    settings = config.get('snapshots', {})
+    return SnapshotStore(settings.get('path', 'snapshots'), max_versions=settings.get('max_versions', 50))
+
+# File Arrow per tab yang dibaca lewat memory map untuk tampilan tabel
+@st.cache_resource
+def get_columnar_store():
+    from columnar_store import ColumnarStore
+    return ColumnarStore(config.get('columnar', {}).get('path', 'columnar'))
+
+# Fungsi untuk mengonversi workbook ke tabel kolumnar (sekali per isi) lalu membukanya
+def load_columnar_tables(sheet_id, content, digest, store=None):
+    if not config.get('columnar', {}).get('enabled', True):
+        return None
+    store = store or get_columnar_store()
+    tables = store.open(sheet_id, digest)
+    if tables is None:
+        with metrics.span('columnar_ingest'):
+            store.ingest(sheet_id, content, digest)
+        tables = store.open(sheet_id, digest)
+    return tables
+
+# Fungsi untuk membaca workbook menjadi DataFrame, lewat tabel kolumnar bila aktif
+def xlsx_frames(sheet_id, content, digest, store=None):
+    tables = load_columnar_tables(sheet_id, content, digest, store)
+    if tables is None:
+        return frames_from_xlsx(content)
+    from columnar_store import frames_from_tables
+    return frames_from_tables(tables)
+
+# Tier cache di disk yang dibagi semua worker Streamlit pada host ini
+@st.cache_resource
+def get_shared_store():
+    settings = config.get('shared_cache', {})
+    if not settings.get('enabled', True):
+        return None
+    return SharedExportStore(settings.get('path', 'shared_cache'), poll_seconds=settings.get('poll_seconds', 1.0))
+
+# Tier disk untuk entri cache yang dilepas anggaran memori, None jika anggaran mati
+@st.cache_resource
+def get_spill_store():
+    settings = config.get('memory', {})
+    if not settings.get('enabled', True):
+        return None
+    return SpillStore(settings.get('spill_path', 'spill'), max_bytes=settings.get('spill_max_mb', 1024) * 1024 * 1024)
+
+# Cache ekspor bersama untuk semua sesi dalam satu proses
+@st.cache_resource
+def get_export_cache():
+    shared = get_shared_store()
+    cache = ExportCache(shared=shared, spill=get_spill_store())
+    table_cache = get_table_cache()
+    if shared is not None:
+        # Invalidasi dari worker mana pun (mis. URL diganti di Manajemen Link)
+        def on_event(event):
+            if event.get('kind') != 'invalidate':
+                return
+            for sheet_id in event.get('sheet_ids') or [None]:
+                cache.invalidate(sheet_id)
+                table_cache.invalidate(sheet_id)
+        shared.subscribe(on_event)
+    if not config.get('snapshots', {}).get('enabled', True):
+        return cache
+    
+    # Mulai hangat dari snapshot terakhir; salinan kedaluwarsa cukup divalidasi ulang
+    store = get_snapshot_store()
+    sheet_ids = {get_sheet_id(sheet_info['url']) for sheet_info in config['spreadsheets'].values()}
+    for sheet_id in store.sheet_ids():
+        saved = store.load_export(sheet_id) if sheet_id in sheet_ids else None
+        if saved is not None:
+            content, meta = saved
+            cache.restore(sheet_id, content, etag=meta.get('etag'), last_modified=meta.get('last_modified'), fetched_at=meta.get('fetched_at'))
+    
+    # Diff dan penulisan snapshot dikerjakan di luar thread pengunduh
+    columnar_store = get_columnar_store()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot')
+    
+    def record_snapshot(entry):
+        table_entry = table_cache.peek(entry.sheet_id)
+        if table_entry is not None and table_entry.version == entry.digest:
+            frames = table_entry.frames
+        else:
+            frames = xlsx_frames(entry.sheet_id, entry.content, entry.digest, columnar_store)
+        store.save(entry.sheet_id, entry.content, frames, etag=entry.etag, last_modified=entry.last_modified, fetched_at=entry.fetched_at)
+    
+    cache.add_listener(lambda entry: executor.submit(record_snapshot, entry))
+    return cache
+
+# Fungsi untuk membuang cache sheet tertentu (None = semua) di semua worker
+def invalidate_sheets(sheet_ids=None):
+    sheet_ids = [sheet_id for sheet_id in sheet_ids if sheet_id] if sheet_ids is not None else None
+    export_cache, table_cache = get_export_cache(), get_table_cache()
+    for sheet_id in sheet_ids if sheet_ids is not None else [None]:
+        export_cache.invalidate(sheet_id)
+        table_cache.invalidate(sheet_id)
+    shared = get_shared_store()
+    if shared is not None:
+        for sheet_id in sheet_ids or []:
+            shared.invalidate(sheet_id)
+        shared.publish('invalidate', sheet_ids=sheet_ids)
+
+# Fungsi untuk mengambil ID spreadsheet dari URL
+def get_sheet_id(url):
+    if "/d/" in url and "/edit" in url:
+        return url.split("/d/")[1].split("/edit")[0]
+    elif "/d/" in url and "/view" in url:
+        return url.split("/d/")[1].split("/view")[0]
+    return None
+
+# Klien HTTP bersama (connection pool, timeout, retry, circuit breaker).
+# Pengaturan 'http' di config berlaku setelah aplikasi di-restart.
+@st.cache_resource
+def get_http_client():
+    settings = config.get('http', {})
+    return HttpClient(
+        connect_timeout=settings.get('connect_timeout', 5),
+        read_timeout=settings.get('read_timeout', 30),
+        retries=settings.get('retries', 3),
+        backoff_seconds=settings.get('backoff_seconds', 0.5),
+        max_backoff_seconds=settings.get('max_backoff_seconds', 8),
+        pool_size=settings.get('pool_size', 10),
+        breaker_threshold=settings.get('breaker_threshold', 5),
+        breaker_reset_seconds=settings.get('breaker_reset_seconds', 30)
+    )
+
+# Fungsi unduh ekspor xlsx dengan header validasi cache
+@st.cache_resource
+def get_export_fetcher():
+    return make_fetcher(get_http_client(), config.get('http', {}).get('export_base_url') or None)
 
 # Fungsi untuk mengunduh file dari Google Sheets
+@metrics.timed('download_spreadsheet')
 def download_spreadsheet(url, filename):
     try:
         # Mengubah URL untuk mengunduh sebagai Excel
         if "docs.google.com/spreadsheets" in url:
             # Ekstrak ID spreadsheet
-            if "/d/" in url and "/edit" in url:
-                sheet_id = url.split("/d/")[1].split("/edit")[0]
-            elif "/d/" in url and "/view" in url:
-                sheet_id = url.split("/d/")[1].split("/view")[0]
-            else:
+            sheet_id = get_sheet_id(url)
+            if sheet_id is None:
                 return None, "Format URL tidak valid"
             
-            # URL untuk mengunduh sebagai Excel
-            export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=xlsx"
-            
-            # Unduh file
-            response = requests.get(export_url)
-            if response.status_code == 200:
-                return response.content, None
-            else:
-                return None, f"Gagal mengunduh file: {response.status_code}"
+            # Ambil dari cache, unduh ulang hanya jika sudah kedaluwarsa
+            cache_settings = config.get('cache', {})
+            cache = get_export_cache()
+            cache.configure(
+                ttl_seconds=cache_settings.get('ttl_seconds', 300),
+                max_bytes=cache_settings.get('max_bytes', 64 * 1024 * 1024)
+            )
+            return cache.get(sheet_id, get_export_fetcher())
         else:
             return None, "URL bukan Google Spreadsheet"
     except Exception as e:
         return None, f"Error: {str(e)}"
 
+# Server unduhan lokal, dijalankan sekali per proses
+@st.cache_resource
+def get_download_server(host, port):
+    return DownloadServer(
+        get_export_cache(),
+        get_server_secret(),
+        get_http_client(),
+        get_export_fetcher(),
+        host=host,
+        port=port,
+        export_base_url=config.get('http', {}).get('export_base_url') or None,
+        assets=get_theme_assets(),
+        api=get_data_api(),
+        exports=get_export_service()
+    )
+
+# API data JSON/CSV/Arrow di server samping, dengan aturan akses yang sama dengan show_page
+@st.cache_resource
+def get_data_api():
+    settings = config.get('api', {})
+    if not settings.get('enabled', True):
+        return None
+    from data_api import DataApi
+    store = get_account_store()
+    return DataApi(
+        make_api_source(),
+        store,
+        get_server_secret(),
+        lambda role, page_id: role == 'admin' or store.has_access(role, page_id),
+        sheet_id=get_sheet_id,
+        default_limit=settings.get('default_limit', 1000),
+        max_limit=settings.get('max_limit', 50000)
+    )
+
+# Fungsi untuk mengambil permintaan HTTP (websocket) sesi ini, None di luar
+# server Streamlit (mis. AppTest atau bench.py)
+def get_session_request():
+    from tornado.httputil import HTTPServerRequest
+    try:
+        request = runtime.get_instance().get_client(get_script_run_ctx().session_id).request
+    except (AttributeError, RuntimeError):
+        return None
+    return request if isinstance(request, HTTPServerRequest) else None
+
+# Fungsi untuk menentukan alamat server unduhan yang dilihat browser. None bila
+# browser tidak bisa memakainya: server mati, atau aplikasi dibuka lewat HTTPS /
+# reverse proxy tanpa download_server.public_url (link http:// ke port 8502
+# diblokir sebagai mixed content atau portnya tidak terbuka), sehingga
+# pemanggil memakai st.download_button
+def get_download_base_url(settings=None):
+    settings = config.get('download_server', {}) if settings is None else settings
+    if not settings.get('enabled', True):
+        return None
+    if not get_download_server(settings.get('host', '0.0.0.0'), settings.get('port', 8502)).available:
+        return None
+    if settings.get('public_url'):
+        return settings['public_url'].rstrip('/')
+    request = get_session_request()
+    if request is None:
+        return f"http://localhost:{settings.get('port', 8502)}"
+    headers = request.headers
+    proxied = any(headers.get(name) for name in ('X-Forwarded-For', 'X-Forwarded-Host', 'X-Forwarded-Proto', 'Forwarded'))
+    if proxied or request.protocol != 'http':
+        return None
+    host = request.host_name
+    return f"http://{host}:{settings.get('port', 8502)}"
+
+# Bundle CSS tema (terang/gelap) dari style.css, dibangun sekali per isi file
+@st.cache_resource
+def get_theme_assets():
+    return ThemeAssets()
+
+# Fungsi untuk menentukan sumber CSS tiap tema: URL ber-hash di server samping
+# (di-cache browser), atau isi CSS langsung bila server samping tidak tersedia
+def theme_sources():
+    bundles = get_theme_assets().build(get_file_store('style.css', 'text').get())
+    base_url = get_download_base_url()
+    if base_url:
+        return {theme: {'href': f"{base_url}/assets/{bundle.filename}"} for theme, bundle in bundles.items()}
+    return {theme: {'css': bundle.content.decode('utf-8')} for theme, bundle in bundles.items()}
+
+# Pasang tema di halaman. Stylesheet dipasang sekali oleh skrip komponen di
+# <head> browser; isi komponen tidak berubah antar-rerun sehingga tidak dimuat ulang
+@metrics.timed('load_theme')
+def load_theme():
+    switcher = switcher_html(theme_sources())
+    metrics.size('html_css', switcher)
+    components.html(switcher, height=0)
+
 # Fungsi untuk menghasilkan link download
-def get_download_button(url, filename):
-    """Generates a download button for the file"""
-    content, error = download_spreadsheet(url, filename)
+def get_download_button(url, filename, base_url):
+    """Generates a download link served by the local download server"""
+    sheet_id = get_sheet_id(url) if "docs.google.com/spreadsheets" in url else None
+    if sheet_id is None:
+        return '<p style="color: red;">Error: URL bukan Google Spreadsheet yang valid</p>'
+    
+    token = sign_token(get_server_secret(), {'scope': 'download', 'sheet': sheet_id, 'name': filename})
+    href = f'<a href="{base_url}/download/{token}" download="{html.escape(filename)}" class="download-btn"><i class="fas fa-download"></i> Download Spreadsheet</a>'
+    return href
+
+# Fungsi untuk menampilkan tombol download
+def show_download_button(page_id, url, filename):
+    base_url = get_download_base_url()
+    if base_url:
+        st.markdown(get_download_button(url, filename, base_url), unsafe_allow_html=True)
+        return
+    
+    # Cadangan: unduh hanya setelah pengguna meminta, lalu sajikan lewat st.download_button
+    prepared_key = f"download_ready_{page_id}"
+    if not st.session_state.get(prepared_key):
+        if st.button("📥 Siapkan Download", key=f"prepare_{page_id}"):
+            st.session_state[prepared_key] = True
+        else:
+            return
     
+    content, error = download_spreadsheet(url, filename)
     if error:
-        return f'<p style="color: red;">Error: {error}</p>'
+        st.error(f"Error: {error}")
+        return
+    st.download_button(
+        "Download Spreadsheet",
+        data=content,
+        file_name=filename,
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"download_{page_id}"
+    )
+
+# Fungsi untuk menampilkan tombol download semua spreadsheet sebagai ZIP
+def show_bundle_download(role):
+    sheets = {}
+    for page_id in get_role_access(role):
+        sheet_info = config['spreadsheets'].get(page_id)
+        if not sheet_info or not sheet_info['download']:
+            continue
+        sheet_id = get_sheet_id(sheet_info['url']) if "docs.google.com/spreadsheets" in sheet_info['url'] else None
+        if sheet_id is not None:
+            sheets[sheet_id] = f"{sheet_info['name']}.xlsx"
+    if not sheets:
+        return
     
-    b64 = base64.b64encode(content).decode()
-    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}" class="download-btn"><i class="fas fa-download"></i> Download Spreadsheet</a>'
-    return href
+    bundle_name = f"{config['app_name']}.zip"
+    label = f"📦 Download Semua ({len(sheets)} file, ZIP)"
+    base_url = get_download_base_url()
+    if base_url:
+        # Satu klik: server samping mengambil semua sheet bersamaan dan
+        # mengalirkan ZIP sambil jalan, tanpa melewati memori proses Streamlit
+        token = sign_token(get_server_secret(), {'scope': 'bundle', 'sheets': [[sheet_id, name] for sheet_id, name in sheets.items()], 'name': bundle_name})
+        st.markdown(
+            f'<a href="{base_url}/bundle/{token}" download="{html.escape(bundle_name)}" class="download-btn"><i class="fas fa-download"></i> {html.escape(label)}</a>',
+            unsafe_allow_html=True
+        )
+        return
+    
+    if not st.button(label, key="bundle_download"):
+        return
+    
+    # Cadangan: ZIP ditulis ke file sementara begitu tiap sheet selesai (isi
+    # workbook tidak dikumpulkan), progres tiap sheet ditampilkan sambil jalan
+    progress = st.progress(0.0, text="Mengambil spreadsheet...")
+    def report(results):
+        for done, (sheet_id, content, error, elapsed) in enumerate(results, start=1):
+            if error:
+                st.write(f"❌ {sheets[sheet_id]}: {error}")
+            else:
+                st.write(f"✅ {sheets[sheet_id]} ({len(content) / 1024:.0f} KB, {elapsed:.1f} detik)")
+            progress.progress(done / len(sheets), text=f"{done}/{len(sheets)} spreadsheet siap")
+            yield sheet_id, content, error, elapsed
+    
+    with tempfile.TemporaryFile() as bundle:
+        write_zip(bundle, report(fetch_many(get_export_cache(), get_export_fetcher(), list(sheets))), sheets)
+        bundle.seek(0)
+        # Dibaca sekali dari disk: satu salinan untuk media st.download_button
+        st.download_button("Simpan ZIP", data=bundle.read(), file_name=bundle_name, mime="application/zip")
+
+# Fungsi untuk membuat token API pengguna yang sedang login (callback tombol)
+def issue_api_token():
+    from data_api import issue_token
+    days = config.get('api', {}).get('token_ttl_days', 90)
+    st.session_state['api_token'] = issue_token(get_server_secret(), st.session_state['username'], days * 86400)
+
+# Fungsi untuk menampilkan token dan contoh pemanggilan API data
+def show_api_access():
+    settings = config.get('download_server', {})
+    if not config.get('api', {}).get('enabled', True) or not settings.get('enabled', True):
+        return
+    with st.expander("🔌 Akses API"):
+        st.write("Baca sheet yang bisa Anda akses sebagai JSON, CSV atau Arrow dari skrip dan aplikasi lain. Hak aksesnya sama dengan akun Anda.")
+        st.button("Buat token API", key="api_token_button", on_click=issue_api_token)
+        token = st.session_state.get('api_token')
+        if token:
+            st.code(token, language=None)
+            base_url = get_download_base_url(settings) or "<download_server.public_url>"
+            st.code(
+                f'curl -H "Authorization: Bearer {token}" {base_url}/api/sheets\n'
+                f'curl -H "Authorization: Bearer {token}" "{base_url}/api/sheets/<id>/<tab>?format=csv&columns=A,B&where=A:eq:nilai&limit=100"',
+                language="bash"
+            )
+            st.caption(f"Token berlaku {config.get('api', {}).get('token_ttl_days', 90)} hari. Operator where: eq, ne, contains, gt, gte, lt, lte.")
 
 # Fungsi untuk menampilkan iframe spreadsheet
 def display_spreadsheet(url):
@@ -245,90 +789,885 @@ def display_spreadsheet(url):
     '''
     st.markdown(iframe_html, unsafe_allow_html=True)
 
+# Cache DataFrame per sheet untuk mode tampilan tabel
+@st.cache_resource
+def get_table_cache():
+    return TableCache(spill=get_spill_store())
+
+# Klien gspread dari service account, None jika belum dikonfigurasi
+@st.cache_resource
+def get_gspread_client():
+    import gspread
+    # load_if_toml_exists tidak menampilkan error di halaman bila secrets.toml belum ada
+    if st.secrets.load_if_toml_exists() and 'gcp_service_account' in st.secrets:
+        return gspread.service_account_from_dict(dict(st.secrets['gcp_service_account']))
+    if os.path.exists('service_account.json'):
+        return gspread.service_account(filename='service_account.json')
+    return None
+
+# Fungsi untuk membaca tabel dari snapshot dengan digest tertentu
+def load_snapshot_frames(sheet_id, digest):
+    if not config.get('snapshots', {}).get('enabled', True):
+        return None
+    try:
+        return get_snapshot_store().load_frames(sheet_id, digest)
+    except Exception:
+        return None
+
+# Fungsi untuk menampilkan baris yang berubah pada versi terakhir sebuah tab
+def show_recent_changes(url, tab_name):
+    if not config.get('snapshots', {}).get('enabled', True):
+        return
+    sheet_id = get_sheet_id(url)
+    store = get_snapshot_store()
+    history = store.history(sheet_id)
+    if len(history) < 2:
+        return
+    
+    latest = history[-1]
+    counts = latest['tabs'].get(tab_name, {'added': 0, 'removed': 0})
+    label = f"Perubahan terakhir ({datetime.fromtimestamp(latest['fetched_at']).strftime('%d-%m-%Y %H:%M')}): +{counts['added']} / -{counts['removed']} baris"
+    with st.expander(label):
+        added, removed = store.changes(sheet_id).get(tab_name, (None, None))
+        if added is not None and len(added):
+            st.write("Baris baru/diubah")
+            st.dataframe(added, use_container_width=True, hide_index=True)
+        if removed is not None and len(removed):
+            st.write("Baris lama/dihapus")
+            st.dataframe(removed, use_container_width=True, hide_index=True)
+        st.caption(f"Versi {latest['version']} · {len(history)} versi tersimpan")
+
+# Fungsi untuk memuat isi spreadsheet sebagai DataFrame per tab
+@metrics.timed('load_sheet_frames')
+def load_sheet_frames(url):
+    sheet_id = get_sheet_id(url) if "docs.google.com/spreadsheets" in url else None
+    if sheet_id is None:
+        return None, "URL bukan Google Spreadsheet yang valid"
+    
+    cache_settings = config.get('cache', {})
+    table_cache = get_table_cache()
+    table_cache.configure(max_bytes=cache_settings.get('table_max_bytes', 128 * 1024 * 1024))
+    
+    try:
+        client = get_gspread_client()
+        if client is not None:
+            # Versi berganti tiap periode TTL sehingga data dibaca ulang secara berkala
+            version = int(time.time() // max(1, cache_settings.get('ttl_seconds', 300)))
+            return table_cache.get(sheet_id, version, lambda: frames_from_gspread(client, sheet_id)), None
+        
+        # Tanpa service account: parse workbook dari cache ekspor
+        content, error = download_spreadsheet(url, sheet_id)
+        if error:
+            return None, error
+        entry = get_export_cache().peek(sheet_id)
+        version = entry.digest if entry is not None else hashlib.sha256(content).hexdigest()
+        # Tabel snapshot di disk dipakai bila isinya sama sehingga tidak perlu parse ulang xlsx
+        return table_cache.get(sheet_id, version, lambda: load_snapshot_frames(sheet_id, version) or xlsx_frames(sheet_id, content, version)), None
+    except Exception as e:
+        return None, f"Error: {str(e)}"
+
+# Fungsi untuk membuka tab spreadsheet sebagai tabel kolumnar (tanpa memuat DataFrame penuh)
+@metrics.timed('load_sheet_tables')
+def load_sheet_tables(url):
+    if not config.get('columnar', {}).get('enabled', True) or get_gspread_client() is not None:
+        return None
+    sheet_id = get_sheet_id(url) if "docs.google.com/spreadsheets" in url else None
+    if sheet_id is None:
+        return None
+    try:
+        content, error = download_spreadsheet(url, sheet_id)
+        if error:
+            return None
+        entry = get_export_cache().peek(sheet_id)
+        digest = entry.digest if entry is not None else hashlib.sha256(content).hexdigest()
+        return load_columnar_tables(sheet_id, content, digest)
+    except Exception:
+        return None
+
+# Pembaca sheet untuk API data. Berjalan di thread server samping (tanpa sesi
+# Streamlit), jadi semua objek cache diambil di sini lebih dulu; urutannya sama
+# dengan load_sheet_frames/load_sheet_tables: gspread, lalu tabel kolumnar, lalu DataFrame
+def make_api_source():
+    cache_settings = config.get('cache', {})
+    ttl_seconds = max(1, cache_settings.get('ttl_seconds', 300))
+    export_cache, fetch, table_cache = get_export_cache(), get_export_fetcher(), get_table_cache()
+    client = get_gspread_client()
+    columnar_store = get_columnar_store() if config.get('columnar', {}).get('enabled', True) else None
+    snapshot_store = get_snapshot_store() if config.get('snapshots', {}).get('enabled', True) else None
+    
+    def load(sheet_id):
+        if client is not None:
+            version = int(time.time() // ttl_seconds)
+            return version, table_cache.get(sheet_id, version, lambda: frames_from_gspread(client, sheet_id))
+        content, error = export_cache.get(sheet_id, fetch)
+        if error:
+            raise RuntimeError(error)
+        entry = export_cache.peek(sheet_id)
+        digest = entry.digest if entry is not None else hashlib.sha256(content).hexdigest()
+        if columnar_store is not None:
+            return digest, load_columnar_tables(sheet_id, content, digest, columnar_store)
+        
+        def build():
+            try:
+                frames = snapshot_store.load_frames(sheet_id, digest) if snapshot_store is not None else None
+            except Exception:
+                frames = None
+            return frames or frames_from_xlsx(content)
+        return digest, table_cache.get(sheet_id, digest, build)
+    return load
+
+# Fungsi untuk mendapatkan versi DataFrame sebuah sheet di cache tabel
+def get_frames_version(url, frames):
+    entry = get_table_cache().peek(get_sheet_id(url))
+    return entry.version if entry is not None and entry.frames is frames else id(frames)
+
+# Fungsi untuk mengumpulkan angka cache dan upstream sebagai gauge Prometheus
+def collect_gauges(export_cache=None, table_cache=None, http_client=None):
+    export_info = (export_cache or get_export_cache()).info()
+    table_info = (table_cache or get_table_cache()).info()
+    http_stats = (http_client or get_http_client()).stats
+    export_lookups = export_info['hits'] + export_info['misses']
+    table_lookups = table_info['hits'] + table_info['builds']
+    return {
+        'export_cache_hits_total': export_info['hits'],
+        'export_cache_misses_total': export_info['misses'],
+        'export_cache_revalidated_total': export_info['revalidated'],
+        'export_cache_shared_hits_total': export_info['shared_hits'],
+        'export_cache_hit_ratio': export_info['hits'] / export_lookups if export_lookups else 0.0,
+        'export_cache_bytes': export_info['bytes'],
+        'table_cache_hit_ratio': table_info['hits'] / table_lookups if table_lookups else 0.0,
+        'table_cache_bytes': table_info['bytes'],
+        'upstream_bytes_total': export_info['bytes_fetched'],
+        'upstream_requests_total': http_stats['requests'],
+        'upstream_retries_total': http_stats['retries'],
+        'upstream_failures_total': http_stats['failures'],
+        'process_rss_bytes': process_rss() or 0,
+    }
+
+# Ekspor metrik berkala ke file JSON lines dan Prometheus, satu thread per proses
+@st.cache_resource
+def start_metrics_export():
+    settings = config.get('metrics', {})
+    export_cache, table_cache, http_client = get_export_cache(), get_table_cache(), get_http_client()
+    metrics.start_exporter(
+        settings.get('export_interval_seconds', 60),
+        settings.get('jsonl_path', 'metrics/spans.jsonl'),
+        settings.get('prometheus_path', 'metrics/metrics.prom'),
+        gauges=lambda: collect_gauges(export_cache, table_cache, http_client)
+    )
+    return True
+
+# Kunci session_state yang tidak pernah dibuang dari sesi yang menganggur
+SESSION_KEEP_KEYS = {'authenticated', 'username', 'role', 'current_page', 'session_token', 'logout', 'first_paint_recorded'}
+
+# Fungsi untuk mengambil SessionInfo sesi lain (API internal Streamlit; None jika tidak tersedia)
+def get_session_info(session_id):
+    try:
+        return runtime.get_instance()._session_mgr.get_session_info(session_id)
+    except Exception:
+        return None
+
+# Fungsi untuk menghitung byte file media (download_button, gambar) yang dipegang sesi
+def session_media_bytes(session_id):
+    try:
+        manager = runtime.get_instance().media_file_mgr
+        with manager._lock:
+            file_ids = set(manager._files_by_session_and_coord.get(session_id, {}).values())
+        return sum(manager._storage.get_file(file_id).content_size for file_id in file_ids)
+    except Exception:
+        return 0
+
+# Fungsi untuk mengukur byte session_state dan media satu sesi; None jika sesinya sudah tutup
+def measure_session(session_id):
+    info = get_session_info(session_id)
+    if info is None:
+        return None
+    state = info.session.session_state.filtered_state
+    return deep_size(state) + session_media_bytes(session_id)
+
+# Fungsi untuk membuang data besar sesi yang lama tidak aktif. Status login dan
+# halaman tetap; nilai yang dibuang dibuat ulang saat pengguna kembali berinteraksi
+def drop_session_data(session_id):
+    info = get_session_info(session_id)
+    if info is None:
+        return 0
+    min_bytes = config.get('memory', {}).get('idle_drop_min_kb', 16) * 1024
+    state = info.session.session_state
+    freed = 0
+    for key, value in list(state.filtered_state.items()):
+        if key in SESSION_KEEP_KEYS:
+            continue
+        size = deep_size(value)
+        if size >= min_bytes:
+            try:
+                del state[key]
+                freed += size
+            except KeyError:
+                pass
+    media = session_media_bytes(session_id)
+    if media:
+        manager = runtime.get_instance().media_file_mgr
+        manager.clear_session_refs(session_id)
+        manager.remove_orphaned_files()
+        freed += media
+    return freed
+
+# Anggaran memori global untuk cache dan sesi, ditegakkan di thread latar, satu per proses
+@st.cache_resource
+def get_memory_budget():
+    settings = config.get('memory', {})
+    if not settings.get('enabled', True):
+        return None
+    budget = MemoryBudget(
+        max_bytes=settings.get('max_mb', 512) * 1024 * 1024,
+        target_ratio=settings.get('target_ratio', 0.85),
+        idle_session_seconds=settings.get('idle_session_minutes', 30) * 60,
+        interval_seconds=settings.get('interval_seconds', 10),
+        max_rss_bytes=settings.get('max_rss_mb', 0) * 1024 * 1024 or None
+    )
+    budget.register('export', get_export_cache())
+    budget.register('tables', get_table_cache())
+    budget.register('analytics', get_analytics_cache())
+    budget.register('search', get_search_index())
+    api = get_data_api() if config.get('download_server', {}).get('enabled', True) else None
+    if api is not None:
+        budget.register('api', api)
+    budget.attach_sessions(measure_session, drop_session_data)
+    return budget.start()
+
+# Warm-up sekali per proses setelah halaman pertama tergambar: modul yang
+# ditunda diimpor dan resource bersama dibuat di latar belakang, sehingga
+# permintaan berikutnya tidak menanggungnya
+@st.cache_resource
+def start_warmup():
+    tasks = [
+        ('imports', preload),
+        ('http_client', get_http_client),
+        ('export_cache', get_export_cache),
+        ('table_cache', get_table_cache),
+        ('gspread_client', get_gspread_client),
+    ]
+    settings = config.get('download_server', {})
+    if settings.get('enabled', True):
+        tasks.append(('download_server', lambda: get_download_server(settings.get('host', '0.0.0.0'), settings.get('port', 8502))))
+    return Warmup(tasks).start()
+
+# Fungsi untuk mencatat waktu sampai halaman pertama sesi ini selesai digambar
+def record_first_paint():
+    if st.session_state.get('first_paint_recorded'):
+        return
+    st.session_state['first_paint_recorded'] = True
+    seconds = time.perf_counter() - import_started
+    metrics.record('first_paint', seconds)
+    BOOT.mark('first_paint', seconds)
+
+# Penjadwal refresh/prefetch latar belakang, satu per proses
+@st.cache_resource
+def get_prefetch_scheduler():
+    settings = config.get('prefetch', {})
+    return PrefetchScheduler(
+        get_export_cache(),
+        get_export_fetcher(),
+        table_cache=get_table_cache(),
+        gspread_client=get_gspread_client(),
+        workers=settings.get('workers', 4),
+        jitter=settings.get('jitter', 0.1)
+    )
+
+# Fungsi untuk menyamakan jadwal refresh dengan daftar spreadsheet di config
+def sync_prefetch():
+    settings = config.get('prefetch', {})
+    if not settings.get('enabled', True):
+        return None
+    
+    sheets = {}
+    for page_id, sheet_info in config['spreadsheets'].items():
+        sheet_id = get_sheet_id(sheet_info['url']) if "docs.google.com/spreadsheets" in sheet_info['url'] else None
+        if sheet_id is not None:
+            sheets[page_id] = (sheet_id, sheet_info.get('refresh_seconds'), sheet_info.get('mode', 'embed'))
+    
+    scheduler = get_prefetch_scheduler()
+    scheduler.sync(sheets, settings.get('interval_seconds', 240))
+    return scheduler
+
+# Fungsi untuk mendapatkan daftar halaman yang boleh diakses sebuah role
+def get_role_access(role):
+    if role == 'admin':
+        return list(config['spreadsheets'].keys())
+    return list(config['roles'].get(role, {}).get('access', []))
+
+# Fungsi untuk memprefetch sheet milik pengguna yang baru login
+def prefetch_for_role(role):
+    scheduler = sync_prefetch()
+    if scheduler is not None:
+        scheduler.prefetch(get_role_access(role))
+
+# Antrian tulis balik edit sel ke Google Sheets, satu per proses (butuh service account)
+@st.cache_resource
+def get_write_queue():
+    client = get_gspread_client()
+    if client is None:
+        return None
+    from write_queue import WriteQueue, make_writer
+    table_cache = get_table_cache()
+    write = make_writer(client)
+    
+    def current(sheet_id):
+        entry = table_cache.peek(sheet_id)
+        return (entry.version, entry.frames) if entry is not None else None
+    
+    def timed_write(sheet_id, data):
+        with metrics.span('sheet_write'):
+            return write(sheet_id, data)
+    
+    return WriteQueue(timed_write, current=current)
+
+# Fungsi untuk mengecek apakah edit langsung bisa dipakai
+def inline_editing_available():
+    return config['features'].get('inline_editing', False) and get_write_queue() is not None
+
+# Callback data_editor: edit sel masuk antrian dan langsung tampil (optimistic)
+def queue_edits(key, sheet_id, tab_name, version, frame, labels):
+    from write_queue import CellEdit
+    layout = frame_layout(frame)
+    edits = []
+    for position, changes in st.session_state[key].get('edited_rows', {}).items():
+        label = labels[int(position)]
+        for column, value in changes.items():
+            row, col = layout.cell(label, column)
+            edits.append(CellEdit(tab_name, label, column, row, col, frame.at[label, column], value, version))
+    if edits:
+        get_write_queue().submit(sheet_id, edits)
+
+# Callback tombol kirim: flush antrian tanpa menunggu jeda debounce
+def flush_edits(sheet_id):
+    get_write_queue().flush(sheet_id)
+
+# Fungsi untuk menampilkan potongan tabel sebagai grid yang bisa diedit
+def display_editor(page_id, url, tab_name, frame, rows):
+    queue = get_write_queue()
+    settings = config.get('editing', {})
+    queue.configure(delay=settings.get('debounce_seconds', 2), max_delay=settings.get('max_delay_seconds', 10))
+    sheet_id = get_sheet_id(url)
+    entry = get_table_cache().peek(sheet_id)
+    version = entry.version if entry is not None else None
+    
+    # Category tidak bisa diisi nilai baru di data_editor, jadi ditampilkan sebagai teks
+    view = rows.copy()
+    for column in view.select_dtypes('category').columns:
+        view[column] = view[column].astype('string')
+    for (label, column), value in queue.overlay(sheet_id, tab_name, frame, version).items():
+        if label in view.index:
+            try:
+                view.at[label, column] = value
+            except (TypeError, ValueError):
+                view[column] = view[column].astype(object)
+                view.at[label, column] = value
+    
+    key = f"table_editor_{page_id}"
+    st.data_editor(
+        view, key=key, use_container_width=True, hide_index=True, num_rows='fixed',
+        on_change=queue_edits, args=(key, sheet_id, tab_name, version, frame, list(view.index))
+    )
+    
+    status = queue.status(sheet_id)
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if status['pending']:
+            st.caption(f"{status['pending']} sel menunggu dikirim ke Google Sheets")
+        elif status['last'] is not None:
+            st.caption(f"{status['last']['written']} sel terkirim pukul {datetime.fromtimestamp(status['last']['at']).strftime('%H:%M:%S')}")
+    with col2:
+        st.button("Kirim sekarang", key=f"table_editor_flush_{page_id}", disabled=not status['pending'], on_click=flush_edits, args=(sheet_id,))
+    
+    last = status['last']
+    if last is not None and last['error']:
+        st.error(f"Gagal menyimpan perubahan, akan dicoba lagi: {last['error']}")
+    if last is not None and last['conflicts']:
+        st.warning("Sel berikut sudah diubah di Google Sheets sejak Anda mengedit, sehingga tidak ditimpa:")
+        st.dataframe(pd.DataFrame(last['conflicts']), use_container_width=True, hide_index=True)
+
+# Fungsi untuk menampilkan spreadsheet sebagai tabel native
+def display_table(page_id, url, editable=False):
+    # Tabel kolumnar di-memory-map: hanya kolom filter dan baris halaman ini yang dibaca
+    tables = None if editable else load_sheet_tables(url)
+    if tables is None:
+        frames, error = load_sheet_frames(url)
+        if error:
+            st.error(error)
+            return
+        tables = {name: FrameTable(frame) for name, frame in (frames or {}).items()}
+    if not tables:
+        st.info("Spreadsheet tidak memiliki data.")
+        return
+    
+    col1, col2, col3 = st.columns([2, 2, 3])
+    with col1:
+        tab_name = st.selectbox("Sheet", list(tables.keys()), key=f"table_tab_{page_id}")
+    table = tables[tab_name]
+    with col2:
+        filter_column = st.selectbox("Filter kolom", [""] + table.columns, key=f"table_filter_col_{page_id}")
+    with col3:
+        filter_query = st.text_input("Cari", key=f"table_filter_query_{page_id}")
+    
+    filtered = table.filter(filter_column, filter_query)
+    
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        page_size = st.selectbox("Baris per halaman", [50, 100, 250, 500], key=f"table_page_size_{page_id}")
+    total_pages = max(1, -(-filtered.num_rows // page_size))
+    with col2:
+        page = st.number_input("Halaman", min_value=1, max_value=total_pages, value=1, key=f"table_page_{page_id}")
+    
+    # Hanya potongan halaman ini yang dikirim ke browser
+    start = (min(int(page), total_pages) - 1) * page_size
+    rows = filtered.rows(start, start + page_size)
+    if editable and isinstance(table, FrameTable) and frame_layout(table.frame) is not None:
+        display_editor(page_id, url, tab_name, table.frame, rows)
+    else:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    st.caption(f"{filtered.num_rows} baris · halaman {int(page)} dari {total_pages}")
+    
+    show_recent_changes(url, tab_name)
+
+# Layanan ekspor turunan (CSV, Parquet, xlsx per bidang, rekap) di process pool, satu per proses
+@st.cache_resource
+def get_export_service():
+    from export_jobs import ExportService
+    settings = config.get('exports', {})
+    return ExportService(
+        settings.get('path', 'exports'),
+        workers=settings.get('workers', 2),
+        max_results=settings.get('max_results', 100),
+        max_bytes=settings.get('max_mb', 1024) * 1024 * 1024
+    )
+
+# Fungsi untuk mengantrikan ekspor turunan dari data sheet di cache (callback tombol)
+def submit_export(page_id):
+    from export_jobs import FORMATS
+    spreadsheet = config['spreadsheets'][page_id]
+    url = spreadsheet['url']
+    frames, error = load_sheet_frames(url)
+    tab = st.session_state[f"export_tab_{page_id}"]
+    if error or tab not in (frames or {}):
+        flash('error', error or f"Tab {tab} tidak ditemukan.")
+        return
+    fmt = st.session_state[f"export_format_{page_id}"]
+    params = {'tab': tab, 'title': f"{spreadsheet['name']} - {tab}"}
+    if st.session_state.get(f"export_filtered_{page_id}"):
+        params['filter_column'] = st.session_state.get(f"table_filter_col_{page_id}")
+        params['filter_query'] = st.session_state.get(f"table_filter_query_{page_id}")
+    if fmt in ('xlsx_bidang', 'recap') and st.session_state.get(f"export_group_{page_id}"):
+        params['group'] = st.session_state[f"export_group_{page_id}"]
+    job = get_export_service().submit(
+        get_sheet_id(url),
+        get_frames_version(url, frames),
+        fmt,
+        params,
+        lambda: frames[tab],
+        f"{spreadsheet['name']} - {tab}{FORMATS[fmt]['ext']}"
+    )
+    keys = [key for key in st.session_state.get(f"export_jobs_{page_id}", []) if key != job.key]
+    st.session_state[f"export_jobs_{page_id}"] = [job.key] + keys[:4]
+
+# Fungsi untuk menampilkan hasil satu job ekspor yang sudah selesai
+def show_export_result(job, placeholder):
+    from export_jobs import FORMATS
+    with placeholder.container():
+        if job.state == 'failed':
+            st.error(f"{job.filename}: gagal ({job.error})")
+            return
+        caption = f"{job.filename} · {job.result.get('rows', 0):,} baris · {job.result.get('size', 0) / 1024:.0f} KB"
+        base_url = get_download_base_url()
+        if base_url:
+            token = sign_token(get_server_secret(), {'scope': 'export', 'export': job.key, 'name': job.filename, 'mime': FORMATS[job.fmt]['mime']})
+            filename = html.escape(job.filename)
+            st.markdown(
+                f'<a href="{base_url}/export/{token}" download="{filename}" class="download-btn"><i class="fas fa-download"></i> {filename}</a>',
+                unsafe_allow_html=True
+            )
+        else:
+            with open(job.path, 'rb') as file:
+                st.download_button(job.filename, data=file.read(), file_name=job.filename, mime=FORMATS[job.fmt]['mime'], key=f"export_download_{job.key}")
+        st.caption(caption)
+
+# Fungsi untuk menampilkan progres job ekspor sesi ini. Job berjalan di process
+# pool; script hanya menggambar progres saat ini, lalu poll_exports() di akhir
+# eksekusi menjadwalkan eksekusi berikutnya selama masih ada job yang berjalan
+def show_export_jobs(page_id):
+    service = get_export_service()
+    jobs = [job for job in (service.get(key) for key in st.session_state.get(f"export_jobs_{page_id}", [])) if job is not None]
+    pending = False
+    for job in jobs:
+        if job.done:
+            show_export_result(job, st.empty())
+        else:
+            pending = True
+            progress = job.progress()
+            st.progress(progress, text=f"{job.filename}: {'menunggu antrian' if job.state == 'queued' else 'diproses'} {progress:.0%}")
+    if pending:
+        st.session_state['export_pending'] = True
+        st.button("🔄 Perbarui status ekspor", key=f"export_refresh_{page_id}")
+
+# Fungsi yang dipanggil paling akhir di script: halaman, footer dan hook setelah
+# tampil sudah selesai, jadi jeda singkat sebelum rerun tidak menahan apa pun
+def poll_exports():
+    if not st.session_state.pop('export_pending', False):
+        return
+    time.sleep(config.get('exports', {}).get('refresh_seconds', 1.5))
+    st.rerun()
+
+# Fungsi untuk menampilkan panel ekspor turunan di halaman sheet
+def show_export_panel(page_id, url):
+    if not st.toggle("📤 Ekspor turunan (CSV, Parquet, Excel per bidang, rekap)", key=f"export_panel_{page_id}"):
+        return
+    from export_jobs import FORMATS, GROUP_CANDIDATES
+    from analytics import find_column
+    show_flash()
+    tables = load_sheet_tables(url)
+    if tables is None:
+        frames, error = load_sheet_frames(url)
+        if error:
+            st.error(error)
+            return
+        tables = {name: FrameTable(frame) for name, frame in (frames or {}).items()}
+    if not tables:
+        st.info("Spreadsheet tidak memiliki data.")
+        return
+    
+    col1, col2, col3 = st.columns([2, 2, 2])
+    with col1:
+        tab_names = list(tables.keys())
+        current_tab = st.session_state.get(f"table_tab_{page_id}")
+        tab_name = st.selectbox("Tab", tab_names, index=tab_names.index(current_tab) if current_tab in tab_names else 0, key=f"export_tab_{page_id}")
+    with col2:
+        fmt = st.selectbox("Format", list(FORMATS), format_func=lambda key: FORMATS[key]['label'], key=f"export_format_{page_id}")
+    with col3:
+        if fmt in ('xlsx_bidang', 'recap'):
+            columns = tables[tab_name].columns
+            detected = find_column(pd.DataFrame(columns=columns), GROUP_CANDIDATES)
+            options = [""] + columns
+            st.selectbox("Kelompokkan per", options, index=options.index(detected) if detected in options else 0, key=f"export_group_{page_id}")
+    
+    filter_column = st.session_state.get(f"table_filter_col_{page_id}")
+    filter_query = st.session_state.get(f"table_filter_query_{page_id}")
+    if filter_column and filter_query:
+        st.checkbox(f"Hanya baris yang cocok dengan filter tabel ({filter_column} berisi \"{filter_query}\")", value=True, key=f"export_filtered_{page_id}")
+    st.button("Buat ekspor", key=f"export_submit_{page_id}", on_click=submit_export, args=(page_id,))
+    show_export_jobs(page_id)
+
+# Memo hasil analisa lintas sheet, satu per proses
+@st.cache_resource
+def get_analytics_cache():
+    return AnalyticsCache()
+
+# Fungsi untuk menghitung ringkasan analisa dari sheet sumber yang boleh diakses role
+@metrics.timed('load_analytics')
+def load_analytics(role):
+    settings = config.get('analytics', {})
+    access = get_role_access(role)
+    page_ids = [page_id for page_id in settings.get('sources', ['psp', 'tph', 'nak', 'bun']) if page_id in access]
+    changes_id = settings.get('changes', 'perubahan')
+    if changes_id not in access:
+        changes_id = None
+    
+    frames = {}
+    versions = []
+    errors = []
+    for page_id in page_ids + ([changes_id] if changes_id else []):
+        if page_id not in config['spreadsheets']:
+            continue
+        url = config['spreadsheets'][page_id]['url']
+        sheet_frames, error = load_sheet_frames(url)
+        if error:
+            errors.append(f"{config['spreadsheets'][page_id]['name']}: {error}")
+            continue
+        frames[page_id] = sheet_frames
+        versions.append((page_id, get_frames_version(url, sheet_frames)))
+    
+    sources = {page_id: frames[page_id] for page_id in page_ids if page_id in frames}
+    if not sources:
+        return None, errors
+    
+    # Dihitung ulang hanya jika versi salah satu sheet sumber berubah
+    key = (tuple(versions), repr(sorted(settings.get('columns', {}).items())))
+    cache = get_analytics_cache()
+    summary = cache.get(
+        key,
+        lambda: build_summary(sources, frames.get(changes_id), settings.get('columns'), cache.parts)
+    )
+    return summary, errors
+
+# Fungsi untuk menampilkan dashboard analisa
+def display_analytics(role):
+    with st.spinner("Menghitung ringkasan..."):
+        summary, errors = load_analytics(role)
+    for error in errors:
+        st.warning(error)
+    if summary is None:
+        st.info("Belum ada data sumber untuk dianalisa.")
+        return
+    
+    total = summary['total']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Jumlah Paket", f"{total['paket']:,}")
+    col2.metric("Total Pagu", f"Rp {total['pagu']:,.0f}")
+    realisasi_persen = total['realisasi'] / total['pagu'] * 100 if total['pagu'] else 0
+    col3.metric("Total Realisasi", f"Rp {total['realisasi']:,.0f}", f"{realisasi_persen:.1f}%")
+    
+    st.subheader("Realisasi per Sub Bidang")
+    per_bidang = summary['per_bidang']
+    st.bar_chart(per_bidang.set_index('bidang')[['pagu', 'realisasi']])
+    st.dataframe(per_bidang, use_container_width=True, hide_index=True)
+    
+    if 'per_status' in summary:
+        st.subheader("Jumlah Paket per Status")
+        st.dataframe(summary['per_status'], use_container_width=True, hide_index=True)
+    
+    if 'per_penyedia' in summary:
+        st.subheader("20 Penyedia dengan Realisasi Terbesar")
+        st.dataframe(summary['per_penyedia'], use_container_width=True, hide_index=True)
+    
+    if 'perubahan' in summary:
+        st.subheader("Perubahan")
+        st.dataframe(summary['perubahan'], use_container_width=True, hide_index=True)
+
+# Indeks pencarian lintas sheet, satu per proses
+@st.cache_resource
+def get_search_index():
+    return SearchIndex()
+
+# Fungsi untuk memperbarui indeks; hanya sheet yang versinya berubah yang diindeks ulang
+@metrics.timed('refresh_search_index')
+def refresh_search_index(page_ids):
+    index = get_search_index()
+    errors = []
+    for page_id in page_ids:
+        url = config['spreadsheets'][page_id]['url']
+        frames, error = load_sheet_frames(url)
+        if error:
+            errors.append(f"{config['spreadsheets'][page_id]['name']}: {error}")
+            continue
+        index.update(get_sheet_id(url), get_frames_version(url, frames), frames)
+    return errors
+
+# Callback kotak pencarian di sidebar
+def start_search():
+    st.query_params['q'] = st.session_state['search_query']
+    navigate('search')
+
+# Fungsi untuk menampilkan hasil pencarian lintas sheet
+def show_search_page():
+    st.title("🔍 Hasil Pencarian")
+    query = st.session_state.get('search_query', '').strip()
+    if not query:
+        st.info("Ketik kata kunci di kotak pencarian pada sidebar.")
+        return
+    
+    page_ids = [page_id for page_id in get_role_access(st.session_state['role']) if page_id in config['spreadsheets']]
+    with st.spinner("Memperbarui indeks pencarian..."):
+        errors = refresh_search_index(page_ids)
+    for error in errors:
+        st.warning(error)
+    
+    sheet_pages = {get_sheet_id(config['spreadsheets'][page_id]['url']): page_id for page_id in page_ids}
+    index = get_search_index()
+    started = time.perf_counter()
+    hits = index.search(query, list(sheet_pages), limit=300, per_sheet=50)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    st.caption(f"{len(hits)} hasil untuk \"{query}\" dalam {elapsed_ms:.1f} ms")
+    if not hits:
+        return
+    
+    results = {}
+    for score, sheet_id, tab_name, row in hits:
+        values = index.row(sheet_id, tab_name, row)
+        results.setdefault(sheet_pages[sheet_id], []).append({
+            'Tab': tab_name,
+            'Baris': row + 1,
+            'Isi': " · ".join(str(value) for value in values.dropna().tolist()) if values is not None else ""
+        })
+    
+    for page_id, rows in results.items():
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.subheader(f"{config['spreadsheets'][page_id]['name']} ({len(rows)})")
+        with col2:
+            st.button("Buka", key=f"search_open_{page_id}", on_click=navigate, args=(page_id,))
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
 # Fungsi untuk menampilkan halaman berdasarkan role
+@metrics.timed('show_page')
 def show_page(page_id):
     if page_id not in config['spreadsheets']:
         st.error(f"Halaman {page_id} tidak ditemukan.")
         return
     
     # Cek akses pengguna
-    if st.session_state['role'] != 'admin' and page_id not in config['roles'][st.session_state['role']]['access']:
+    if not has_access(st.session_state['role'], page_id):
         st.error("Anda tidak memiliki akses ke halaman ini.")
         return
     
     spreadsheet = config['spreadsheets'][page_id]
     st.title(spreadsheet['name'])
     
+    # Edit langsung ditawarkan bila fitur aktif dan service account tersedia
+    editable = spreadsheet.get('mode', 'embed') != 'analytics' and inline_editing_available() and st.toggle("Edit langsung", key=f"edit_mode_{page_id}")
+    
     # Tampilkan spreadsheet
-    if spreadsheet['embed']:
+    if editable or spreadsheet.get('mode', 'embed') == 'table':
+        display_table(page_id, spreadsheet['url'], editable=editable)
+    elif spreadsheet.get('mode', 'embed') == 'analytics':
+        display_analytics(st.session_state['role'])
+    elif spreadsheet['embed']:
         display_spreadsheet(spreadsheet['url'])
     
     # Tombol download
     if spreadsheet['download']:
-        st.markdown(get_download_button(spreadsheet['url'], f"{spreadsheet['name']}.xlsx"), unsafe_allow_html=True)
+        show_download_button(page_id, spreadsheet['url'], f"{spreadsheet['name']}.xlsx")
+        if spreadsheet.get('mode', 'embed') != 'analytics' and config.get('exports', {}).get('enabled', True):
+            show_export_panel(page_id, spreadsheet['url'])
+
+# Callback form admin: dijalankan sebelum eksekusi berikutnya sehingga
+# halaman langsung tampil dengan konfigurasi yang baru disimpan
+def add_user():
+    import streamlit_authenticator as stauth
+    # Username disimpan huruf kecil seperti yang dicari saat login dan hapus
+    username = st.session_state['add_user_username'].strip().lower()
+    if not username or not st.session_state['add_user_password']:
+        flash('error', "Username dan password wajib diisi.")
+        return
+    added = get_account_store().add_user(username, {
+        'email': st.session_state['add_user_email'],
+        'name': st.session_state['add_user_name'],
+        'password': stauth.Hasher([st.session_state['add_user_password']]).generate()[0],
+        'role': st.session_state['add_user_role']
+    })
+    if not added:
+        flash('error', "Username sudah digunakan.")
+        return
+    flash('success', "Pengguna berhasil ditambahkan.")
+
+def delete_user():
+    username_to_delete = st.session_state['delete_user_username'].strip().lower()
+    if username_to_delete == st.session_state['username']:
+        flash('error', "Anda tidak dapat menghapus akun yang sedang digunakan.")
+        return
+    store = get_account_store()
+    if not username_to_delete or store.user(username_to_delete) is None or not store.delete_user(username_to_delete):
+        flash('error', "Pengguna tidak ditemukan.")
+        return
+    get_session_cache().revoke_user(username_to_delete)
+    flash('success', "Pengguna berhasil dihapus.")
+
+def edit_spreadsheet(sheet_to_edit):
+    old_url = config['spreadsheets'][sheet_to_edit]['url']
+    new_url = st.session_state[f"edit_sheet_url_{sheet_to_edit}"]
+    get_account_store().put_spreadsheet(sheet_to_edit, dict(
+        config['spreadsheets'][sheet_to_edit],
+        name=st.session_state[f"edit_sheet_name_{sheet_to_edit}"],
+        url=new_url,
+        embed=st.session_state[f"edit_sheet_embed_{sheet_to_edit}"],
+        download=st.session_state[f"edit_sheet_download_{sheet_to_edit}"],
+        mode=st.session_state[f"edit_sheet_mode_{sheet_to_edit}"]
+    ))
+    if new_url != old_url:
+        invalidate_sheets([get_sheet_id(old_url), get_sheet_id(new_url)])
+    flash('success', "Spreadsheet berhasil diperbarui.")
+
+def save_app_name():
+    update_config(['app_name'], st.session_state['edit_app_name'])
+    flash('success', "Nama aplikasi berhasil diperbarui.")
+
+def save_features():
+    update_config(['features'], dict(
+        config['features'],
+        **{name: st.session_state[f"feature_{name}"] for name in (
+            'embed_spreadsheet', 'inline_editing', 'download_button',
+            'user_management', 'link_management', 'page_editing'
+        )}
+    ))
+    flash('success', "Fitur berhasil diperbarui.")
+
+def save_cache_settings():
+    update_config(['cache'], dict(
+        config.get('cache', {}),
+        ttl_seconds=int(st.session_state['cache_ttl_minutes']) * 60,
+        max_bytes=int(st.session_state['cache_max_mb']) * 1024 * 1024
+    ))
+    invalidate_sheets()
+    flash('success', "Pengaturan cache berhasil diperbarui.")
+
+def save_uploaded_logo():
+    uploaded_file = st.session_state['logo_upload']
+    if uploaded_file is None:
+        return
+    bytes_data = uploaded_file.getvalue()
+    old_logo = config.get('app_logo', '')
+    
+    if uploaded_file.type == 'image/svg+xml':
+        # SVG tidak perlu diperkecil, simpan sebagai data URI
+        import base64
+        encoded = base64.b64encode(bytes_data).decode()
+        new_logo = f"data:{uploaded_file.type};base64,{encoded}"
+    else:
+        # Simpan sebagai file statis yang sudah diperkecil
+        new_logo = save_logo(bytes_data)
+    
+    # Config hanya menyimpan referensi file
+    update_config(['app_logo'], new_logo)
+    if old_logo != new_logo:
+        remove_logo(old_logo)
+    flash('success', "Logo berhasil disimpan.")
 
 # Fungsi untuk menampilkan halaman admin
 def show_admin_page():
     st.title("Halaman Admin")
+    show_flash()
     
-    tab1, tab2, tab3, tab4 = st.tabs(["Manajemen Pengguna", "Manajemen Link", "Pengaturan Aplikasi", "Logo Aplikasi"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Manajemen Pengguna", "Manajemen Link", "Pengaturan Aplikasi", "Logo Aplikasi", "Kinerja"])
     
     with tab1:
         st.header("Manajemen Pengguna")
         
-        # Tampilkan daftar pengguna
+        # Tampilkan daftar pengguna per halaman; hanya halaman ini yang dibaca dari backend
         st.subheader("Daftar Pengguna")
-        users_data = []
-        for username, user_info in credentials['credentials']['usernames'].items():
-            users_data.append({
-                'Username': username,
-                'Nama': user_info['name'],
-                'Email': user_info['email'],
-                'Role': user_info['role']
-            })
+        account_store = get_account_store()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            user_query = st.text_input("Cari pengguna", key="users_query", placeholder="Username, nama atau email")
+        total_users = account_store.count_users(user_query)
+        total_pages = max(1, -(-total_users // 50))
+        with col2:
+            users_page = st.number_input("Halaman", min_value=1, max_value=total_pages, value=1, key="users_page")
+        users_data = account_store.users(offset=(min(int(users_page), total_pages) - 1) * 50, limit=50, query=user_query)
         
-        users_df = pd.DataFrame(users_data)
+        users_df = pd.DataFrame([{
+            'Username': user_info['username'],
+            'Nama': user_info['name'],
+            'Email': user_info['email'],
+            'Role': user_info['role']
+        } for user_info in users_data])
         st.dataframe(users_df)
+        st.caption(f"{total_users} pengguna · halaman {min(int(users_page), total_pages)} dari {total_pages}")
         
         # Form tambah pengguna
         st.subheader("Tambah Pengguna Baru")
         with st.form("add_user_form"):
-            new_username = st.text_input("Username")
-            new_name = st.text_input("Nama")
-            new_email = st.text_input("Email")
-            new_password = st.text_input("Password", type="password")
-            new_role = st.selectbox("Role", ["admin", "user"])
-            
-            submit_button = st.form_submit_button("Tambah Pengguna")
+            st.text_input("Username", key="add_user_username")
+            st.text_input("Nama", key="add_user_name")
+            st.text_input("Email", key="add_user_email")
+            st.text_input("Password", type="password", key="add_user_password")
+            st.selectbox("Role", ["admin", "user"], key="add_user_role")
             
-            if submit_button:
-                if new_username in credentials['credentials']['usernames']:
-                    st.error("Username sudah digunakan.")
-                else:
-                    credentials['credentials']['usernames'][new_username] = {
-                        'email': new_email,
-                        'name': new_name,
-                        'password': stauth.Hasher([new_password]).generate()[0],
-                        'role': new_role
-                    }
-                    save_credentials(credentials)
-                    st.success("Pengguna berhasil ditambahkan.")
-                    st.experimental_rerun()
+            st.form_submit_button("Tambah Pengguna", on_click=add_user)
         
         # Form hapus pengguna
         st.subheader("Hapus Pengguna")
         with st.form("delete_user_form"):
-            username_to_delete = st.selectbox("Pilih Username", list(credentials['credentials']['usernames'].keys()))
-            delete_button = st.form_submit_button("Hapus Pengguna")
-            
-            if delete_button:
-                if username_to_delete == st.session_state['username']:
-                    st.error("Anda tidak dapat menghapus akun yang sedang digunakan.")
-                else:
-                    del credentials['credentials']['usernames'][username_to_delete]
-                    save_credentials(credentials)
-                    st.success("Pengguna berhasil dihapus.")
-                    st.experimental_rerun()
+            # Username diketik langsung: daftar di atas hanya satu halaman hasil pencarian
+            st.text_input("Username", key="delete_user_username")
+            st.form_submit_button("Hapus Pengguna", on_click=delete_user)
     
     with tab2:
         st.header("Manajemen Link Spreadsheet")
@@ -342,31 +1681,49 @@ def show_admin_page():
                 'Nama': sheet_info['name'],
                 'URL': sheet_info['url'],
                 'Embed': sheet_info['embed'],
+                'Mode': sheet_info.get('mode', 'embed'),
                 'Download': sheet_info['download']
             })
         
         spreadsheets_df = pd.DataFrame(spreadsheets_data)
         st.dataframe(spreadsheets_df)
         
-        # Form edit spreadsheet
+        # Status refresh latar belakang
+        st.subheader("Status Refresh Otomatis")
+        scheduler = sync_prefetch()
+        if scheduler is None:
+            st.info("Refresh otomatis dinonaktifkan.")
+        else:
+            status_data = []
+            for job in sorted(scheduler.status(), key=lambda item: item['page_id']):
+                status_data.append({
+                    'ID': job['page_id'],
+                    'Refresh Terakhir': datetime.fromtimestamp(job['last_refresh']).strftime('%H:%M:%S') if job['last_refresh'] else '-',
+                    'Durasi (detik)': round(job['last_duration'], 2) if job['last_duration'] is not None else None,
+                    'Berikutnya': datetime.fromtimestamp(job['next_run']).strftime('%H:%M:%S'),
+                    'Interval (detik)': int(job['interval']),
+                    'Status': 'Berjalan' if job['running'] else (job['last_error'] or 'OK')
+                })
+            st.dataframe(pd.DataFrame(status_data), hide_index=True)
+        
+        # Form edit spreadsheet; pilihan sheet di luar form agar isian langsung mengikuti
         st.subheader("Edit Spreadsheet")
+        sheet_to_edit = st.selectbox("Pilih Spreadsheet", list(config['spreadsheets'].keys()), key="edit_sheet_id")
         with st.form("edit_spreadsheet_form"):
-            sheet_to_edit = st.selectbox("Pilih Spreadsheet", list(config['spreadsheets'].keys()))
-            new_name = st.text_input("Nama Baru", value=config['spreadsheets'][sheet_to_edit]['name'])
-            new_url = st.text_input("URL Baru", value=config['spreadsheets'][sheet_to_edit]['url'])
-            new_embed = st.checkbox("Embed", value=config['spreadsheets'][sheet_to_edit]['embed'])
-            new_download = st.checkbox("Download", value=config['spreadsheets'][sheet_to_edit]['download'])
-            
-            edit_button = st.form_submit_button("Simpan Perubahan")
+            st.text_input("Nama Baru", value=config['spreadsheets'][sheet_to_edit]['name'], key=f"edit_sheet_name_{sheet_to_edit}")
+            st.text_input("URL Baru", value=config['spreadsheets'][sheet_to_edit]['url'], key=f"edit_sheet_url_{sheet_to_edit}")
+            st.checkbox("Embed", value=config['spreadsheets'][sheet_to_edit]['embed'], key=f"edit_sheet_embed_{sheet_to_edit}")
+            st.checkbox("Download", value=config['spreadsheets'][sheet_to_edit]['download'], key=f"edit_sheet_download_{sheet_to_edit}")
+            view_modes = {'embed': "Iframe Google Sheets", 'table': "Tabel (native)", 'analytics': "Dashboard Analisa"}
+            st.selectbox(
+                "Mode Tampilan",
+                list(view_modes.keys()),
+                index=list(view_modes.keys()).index(config['spreadsheets'][sheet_to_edit].get('mode', 'embed')),
+                format_func=view_modes.get,
+                key=f"edit_sheet_mode_{sheet_to_edit}"
+            )
             
-            if edit_button:
-                config['spreadsheets'][sheet_to_edit]['name'] = new_name
-                config['spreadsheets'][sheet_to_edit]['url'] = new_url
-                config['spreadsheets'][sheet_to_edit]['embed'] = new_embed
-                config['spreadsheets'][sheet_to_edit]['download'] = new_download
-                save_config(config)
-                st.success("Spreadsheet berhasil diperbarui.")
-                st.experimental_rerun()
+            st.form_submit_button("Simpan Perubahan", on_click=edit_spreadsheet, args=(sheet_to_edit,))
     
     with tab3:
         st.header("Pengaturan Aplikasi")
@@ -374,49 +1731,57 @@ def show_admin_page():
         # Form edit nama aplikasi
         st.subheader("Edit Nama Aplikasi")
         with st.form("edit_app_name_form"):
-            new_app_name = st.text_input("Nama Aplikasi", value=config['app_name'])
-            save_app_name_button = st.form_submit_button("Simpan Nama Aplikasi")
-            
-            if save_app_name_button:
-                config['app_name'] = new_app_name
-                save_config(config)
-                st.success("Nama aplikasi berhasil diperbarui.")
-                st.experimental_rerun()
+            st.text_input("Nama Aplikasi", value=config['app_name'], key="edit_app_name")
+            st.form_submit_button("Simpan Nama Aplikasi", on_click=save_app_name)
         
         # Form edit fitur
         st.subheader("Edit Fitur")
         with st.form("edit_features_form"):
-            embed_spreadsheet = st.checkbox("Embed Spreadsheet", value=config['features']['embed_spreadsheet'])
-            inline_editing = st.checkbox("Inline Editing", value=config['features']['inline_editing'])
-            download_button = st.checkbox("Download Button", value=config['features']['download_button'])
-            user_management = st.checkbox("User Management", value=config['features']['user_management'])
-            link_management = st.checkbox("Link Management", value=config['features']['link_management'])
-            page_editing = st.checkbox("Page Editing", value=config['features']['page_editing'])
-            
-            save_features_button = st.form_submit_button("Simpan Fitur")
+            st.checkbox("Embed Spreadsheet", value=config['features']['embed_spreadsheet'], key="feature_embed_spreadsheet")
+            st.checkbox("Inline Editing", value=config['features']['inline_editing'], key="feature_inline_editing")
+            st.checkbox("Download Button", value=config['features']['download_button'], key="feature_download_button")
+            st.checkbox("User Management", value=config['features']['user_management'], key="feature_user_management")
+            st.checkbox("Link Management", value=config['features']['link_management'], key="feature_link_management")
+            st.checkbox("Page Editing", value=config['features']['page_editing'], key="feature_page_editing")
             
-            if save_features_button:
-                config['features']['embed_spreadsheet'] = embed_spreadsheet
-                config['features']['inline_editing'] = inline_editing
-                config['features']['download_button'] = download_button
-                config['features']['user_management'] = user_management
-                config['features']['link_management'] = link_management
-                config['features']['page_editing'] = page_editing
-                save_config(config)
-                st.success("Fitur berhasil diperbarui.")
-                st.experimental_rerun()
-    
+            st.form_submit_button("Simpan Fitur", on_click=save_features)
+
+        # Form pengaturan cache ekspor
+        st.subheader("Cache Ekspor Spreadsheet")
+        cache_settings = config.get('cache', {})
+        cache_info = get_export_cache().info()
+        st.write(f"**Isi cache:** {cache_info['entries']} file, {cache_info['bytes'] / (1024 * 1024):.1f} MB")
+        st.write(f"**Hit/Miss:** {cache_info['hits']}/{cache_info['misses']}")
+        with st.form("edit_cache_form"):
+            st.number_input(
+                "Masa berlaku cache (menit)",
+                min_value=0,
+                value=int(cache_settings.get('ttl_seconds', 300) // 60),
+                key="cache_ttl_minutes"
+            )
+            st.number_input(
+                "Batas ukuran cache (MB)",
+                min_value=1,
+                value=int(cache_settings.get('max_bytes', 64 * 1024 * 1024) // (1024 * 1024)),
+                key="cache_max_mb"
+            )
+
+            st.form_submit_button("Simpan Pengaturan Cache", on_click=save_cache_settings)
+
     with tab4:
         st.header("Logo Aplikasi")
         
         # Tampilkan logo saat ini jika ada
         if config.get('app_logo'):
             st.subheader("Logo Saat Ini")
-            st.image(config['app_logo'], width=150)
+            if config['app_logo'].startswith('data:'):
+                st.image(config['app_logo'], width=150)
+            else:
+                st.image(logo_path(config['app_logo'], 150), width=150)
         
         # Form untuk mengunggah logo baru
         st.subheader("Unggah Logo Baru")
-        uploaded_file = st.file_uploader("Pilih file gambar", type=['png', 'jpg', 'jpeg', 'svg'])
+        uploaded_file = st.file_uploader("Pilih file gambar", type=['png', 'jpg', 'jpeg', 'svg'], key="logo_upload")
         
         if uploaded_file is not None:
             # Tampilkan preview
@@ -424,17 +1789,161 @@ def show_admin_page():
             st.image(uploaded_file, width=150)
             
             # Tombol simpan
-            if st.button("Simpan Logo"):
-                # Konversi gambar ke base64
-                bytes_data = uploaded_file.getvalue()
-                encoded = base64.b64encode(bytes_data).decode()
-                
-                # Simpan ke konfigurasi
-                mime_type = uploaded_file.type
-                config['app_logo'] = f"data:{mime_type};base64,{encoded}"
-                save_config(config)
-                st.success("Logo berhasil disimpan.")
-                st.experimental_rerun()
+            st.button("Simpan Logo", on_click=save_uploaded_logo)
+    
+    with tab5:
+        st.header("Kinerja")
+        # Persentil hanya dihitung saat panel ini dinyalakan
+        if st.toggle("Tampilkan statistik kinerja", key="perf_panel"):
+            show_performance_panel()
+
+# Fungsi untuk menegakkan anggaran memori sekarang (callback tombol panel kinerja)
+def enforce_memory_budget():
+    result = get_memory_budget().enforce()
+    flash('success', f"Anggaran ditegakkan: {result['evicted']} entri dilepas ({result['evicted_bytes'] / 1048576:.1f} MB), data sesi {result['session_bytes_dropped'] / 1048576:.1f} MB dibuang.")
+
+# Fungsi untuk menampilkan rincian memori per cache dan per sesi
+def show_memory_breakdown(budget):
+    info, usage, rss = budget.info(), budget.usage(), process_rss()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("RSS proses", f"{rss / 1048576:.0f} MB" if rss is not None else "-")
+    col2.metric("Terhitung", f"{usage['total'] / 1048576:.1f} MB")
+    col3.metric("Anggaran", f"{info['max_bytes'] / 1048576:.0f} MB", f"{usage['total'] / info['max_bytes']:.0%} terpakai", delta_color="off")
+    col4.metric("Entri dilepas", f"{info['evictions']:,}", f"{info['evicted_bytes'] / 1048576:.1f} MB", delta_color="off")
+    
+    spill = get_spill_store()
+    cache_rows = [
+        {'Cache': name, 'Entri': item['entries'], 'MB': round(item['bytes'] / 1048576, 2)}
+        for name, item in usage['caches'].items()
+    ]
+    if spill is not None:
+        spill_info = spill.info()
+        cache_rows.append({'Cache': 'spill (disk)', 'Entri': spill_info['entries'], 'MB': round(spill_info['bytes'] / 1048576, 2)})
+    st.dataframe(pd.DataFrame(cache_rows), use_container_width=True, hide_index=True)
+    
+    now = time.time()
+    session_rows = [
+        {
+            'Sesi': session_id[:8],
+            'MB': round(session['bytes'] / 1048576, 3),
+            'Menganggur (menit)': round((now - session['seen']) / 60, 1),
+            'Data dibuang': '✅' if session['dropped'] else ''
+        }
+        for session_id, session in sorted(usage['sessions'].items(), key=lambda item: -item[1]['bytes'])
+    ]
+    if session_rows:
+        st.dataframe(pd.DataFrame(session_rows), use_container_width=True, hide_index=True)
+    
+    last = info['last']
+    st.caption(
+        (f"Putaran terakhir {datetime.fromtimestamp(last['at']).strftime('%H:%M:%S')} ({last['seconds'] * 1000:.0f} ms)" if last else "Belum ada putaran")
+        + f" · {info['sessions_dropped']} sesi menganggur dibersihkan ({info['session_bytes_dropped'] / 1048576:.1f} MB)"
+        + (f" · plafon RSS {info['max_rss_bytes'] / 1048576:.0f} MB" if info['max_rss_bytes'] else "")
+    )
+    st.button("Tegakkan anggaran sekarang", key="memory_enforce", on_click=enforce_memory_budget)
+
+# Fungsi untuk menampilkan statistik waktu per tahap dan efektivitas cache
+def show_performance_panel():
+    summary = metrics.summary()
+    
+    st.subheader("Waktu per Tahap")
+    stage_rows = []
+    for stage, item in sorted(summary.items()):
+        if 'p50' in item:
+            stage_rows.append({
+                'Tahap': stage,
+                'Jumlah': item['count'],
+                'p50 (ms)': round(item['p50'] * 1000, 1),
+                'p95 (ms)': round(item['p95'] * 1000, 1),
+                'p99 (ms)': round(item['p99'] * 1000, 1),
+                'Maks (ms)': round(item['max'] * 1000, 1)
+            })
+    st.dataframe(pd.DataFrame(stage_rows), use_container_width=True, hide_index=True)
+    
+    st.subheader("Ukuran HTML per Eksekusi")
+    size_rows = []
+    for stage, item in sorted(summary.items()):
+        if 'bytes_mean' in item:
+            size_rows.append({
+                'Bagian': stage,
+                'Rata-rata (KB)': round(item['bytes_mean'] / 1024, 1),
+                'p95 (KB)': round(item['bytes_p95'] / 1024, 1)
+            })
+    st.dataframe(pd.DataFrame(size_rows), use_container_width=True, hide_index=True)
+    
+    st.subheader("Cache dan Upstream")
+    gauges = collect_gauges()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hit rate cache ekspor", f"{gauges['export_cache_hit_ratio'] * 100:.1f}%")
+    col2.metric("Hit rate cache tabel", f"{gauges['table_cache_hit_ratio'] * 100:.1f}%")
+    col3.metric("Unduhan dari Google", f"{gauges['upstream_bytes_total'] / (1024 * 1024):.1f} MB")
+    col4.metric("Request HTTP", f"{gauges['upstream_requests_total']:,}", f"{gauges['upstream_retries_total']} retry", delta_color="off")
+    breakers = get_http_client().breaker_states()
+    if breakers:
+        labels = {'closed': "normal", 'half-open': "mencoba lagi", 'open': "terputus"}
+        st.caption("Circuit breaker: " + ", ".join(f"{host} {labels.get(state, state)}" for host, state in sorted(breakers.items())) + f" · {gauges['upstream_failures_total']:,} request gagal")
+    
+    st.subheader("Login")
+    sessions, passwords, limiter = get_session_cache().info(), get_password_verifier().info(), get_rate_limiter().info()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Sesi aktif", sessions['sessions'])
+    col2.metric("Cek sesi dari cache", f"{sessions['hits']:,}")
+    col3.metric("Cek password", f"{passwords['checks']:,}", f"{passwords['pending']} antri", delta_color="off")
+    col4.metric("Ditolak (sibuk/limit)", passwords['busy'] + limiter['limited'])
+    
+    api = get_data_api() if config.get('download_server', {}).get('enabled', True) else None
+    if api is not None:
+        api_info = api.info()
+        st.caption(f"API data: {api_info['requests']:,} permintaan, {api_info['not_modified']:,} dijawab 304, {api_info['errors']:,} ditolak/gagal, {api_info['tables']} sheet di cache Arrow")
+    if config.get('exports', {}).get('enabled', True):
+        export_info = get_export_service().info()
+        st.caption(f"Ekspor turunan: {export_info['submitted']:,} dibuat, {export_info['cache_hits'] + export_info['joined']:,} dipakai ulang, {export_info['failed']:,} gagal, {export_info['running']} berjalan, {export_info['results']} hasil tersimpan ({export_info['workers']} worker)")
+
+    st.subheader("Memori")
+    budget = get_memory_budget()
+    if budget is None:
+        st.info("Anggaran memori dimatikan (memory.enabled di config.json).")
+    else:
+        show_memory_breakdown(budget)
+    
+    st.subheader("Start Dingin")
+    startup_settings = config.get('startup', {})
+    budget_rows = [
+        {
+            'Tahap': row['stage'],
+            'Terukur (ms)': row['ms'],
+            'Anggaran (ms)': row['budget_ms'],
+            'Status': '-' if row['ok'] is None else ('✅' if row['ok'] else '⚠️ melebihi anggaran')
+        }
+        for row in BOOT.report({
+            'imports': startup_settings.get('import_budget_ms', 500),
+            'first_paint': startup_settings.get('first_paint_budget_ms', 1500)
+        })
+    ]
+    st.dataframe(pd.DataFrame(budget_rows), use_container_width=True, hide_index=True)
+    warmup = start_warmup().info() if startup_settings.get('warm_up', True) else None
+    if warmup is not None:
+        st.caption(
+            f"Warm-up: {warmup['state']}"
+            + (f" ({warmup['seconds'] * 1000:.0f} ms) — " if warmup['seconds'] is not None else " — ")
+            + ", ".join(f"{task['task']} {task['seconds'] * 1000:.0f} ms" + (" (gagal)" if task['error'] else "") for task in warmup['tasks'])
+        )
+    
+    st.subheader("Sesi")
+    session_rows = [
+        {'Sesi': session[:8], 'Rerun': item['runs'], 'p50 (ms)': round(item['p50'] * 1000, 1), 'Maks (ms)': round(item['max'] * 1000, 1)}
+        for session, item in metrics.sessions().items()
+    ]
+    st.dataframe(pd.DataFrame(session_rows), use_container_width=True, hide_index=True)
+    
+    settings = config.get('metrics', {})
+    st.caption(f"Ekspor berkala: {settings.get('jsonl_path', 'metrics/spans.jsonl')} dan {settings.get('prometheus_path', 'metrics/metrics.prom')}")
+    st.download_button(
+        "Unduh metrik (Prometheus)",
+        data=metrics.prometheus_text(gauges),
+        file_name="metrics.prom",
+        mime="text/plain"
+    )
 
 # Fungsi untuk menampilkan halaman beranda
 def show_home_page():
@@ -442,7 +1951,8 @@ def show_home_page():
     
     if 'username' in st.session_state and st.session_state['username'] is not None:
         username = st.session_state['username']
-        name = credentials['credentials']['usernames'][username]['name']
+        user_info = get_account_store().user(username)
+        name = user_info['name'] if user_info is not None else username
         role = st.session_state.get('role', 'guest')
         
         st.write(f"Selamat datang, {name}!")
@@ -482,6 +1992,8 @@ def show_home_page():
         for access in access_list:
             if access in config.get('spreadsheets', {}):
                 st.write(f"- {config['spreadsheets'][access]['name']}")
+        show_bundle_download(role)
+        show_api_access()
     else:
         st.info("Silakan login untuk melihat daftar akses yang tersedia.")
 
@@ -491,114 +2003,218 @@ def show_home_page():
 def show_sidebar():
     with st.sidebar:
         # Header
-        st.markdown("""<div class="app-header">""", unsafe_allow_html=True)
+        render_html('html_sidebar', """<div class="app-header">""")
 
         if config.get('app_logo'):
-            st.markdown(
-                f'<div class="logo-container"><img src="{config["app_logo"]}" class="app-logo" alt="Logo"></div>',
-                unsafe_allow_html=True
-            )
+            render_html('html_sidebar', f'<div class="logo-container"><img src="{logo_url(config["app_logo"], 120)}" class="app-logo" alt="Logo"></div>')
 
-        st.markdown("<h2>📊 Menu Navigasi</h2>", unsafe_allow_html=True)
+        render_html('html_sidebar', "<h2>📊 Menu Navigasi</h2>")
 
         # Info user login
-        if (
-            st.session_state.get('authenticated')
-            and st.session_state.get('username') in credentials['credentials']['usernames']
-        ):
+        user_info = get_account_store().user(st.session_state.get('username')) if st.session_state.get('authenticated') else None
+        if user_info is not None:
             username = st.session_state.get('username')
-            user_info = credentials['credentials']['usernames'][username]
             name = user_info.get('name', username)
             role = st.session_state.get('role', 'user')
 
-            st.markdown(f"""
+            render_html('html_sidebar', f"""
             <div class="card">
                 <p>Selamat datang,</p>
                 <h3>{name}</h3>
                 <span class="badge badge-{role}">{role.upper()}</span>
             </div>
-            """, unsafe_allow_html=True)
+            """)
 
         else:
-            st.markdown("""
+            render_html('html_sidebar', """
             <div class="card">
                 <p>Silakan login</p>
             </div>
-            """, unsafe_allow_html=True)
+            """)
             name = "Guest"
             role = "guest"
 
         # Menu umum
-        if st.button("🏠 Beranda"):
-            st.session_state['current_page'] = 'home'
-            st.experimental_rerun()
+        st.button("🏠 Beranda", on_click=navigate, args=('home',))
+
+        # Pencarian lintas sheet
+        if st.session_state.get('authenticated'):
+            st.text_input(
+                "🔍 Cari di semua sheet",
+                key="search_query",
+                on_change=start_search,
+                placeholder="Vendor, nama paket, no. kontrak"
+            )
 
         # Menu admin (khusus admin)
         if st.session_state.get('role') == 'admin':
-            if st.button("⚙️ Admin Panel"):
-                st.session_state['current_page'] = 'admin'
-                st.experimental_rerun()
+            st.button("⚙️ Admin Panel", on_click=navigate, args=('admin',))
 
         # Menu spreadsheet
-        st.markdown("<h3>📑 Spreadsheet</h3>", unsafe_allow_html=True)
+        render_html('html_sidebar', "<h3>📑 Spreadsheet</h3>")
         role = st.session_state.get('role', 'guest')
         for sheet_id, sheet_info in config['spreadsheets'].items():
-            if role == 'admin' or (
-                role in config['roles']
-                and sheet_id in config['roles'][role]['access']
-            ):
-                if st.button(f"📄 {sheet_info['name']}"):
-                    st.session_state['current_page'] = sheet_id
-                    st.experimental_rerun()
+            if has_access(role, sheet_id):
+                st.button(f"📄 {sheet_info['name']}", key=f"nav_{sheet_id}", on_click=navigate, args=(sheet_id,))
 
         # Toggle tema
-        st.markdown("<hr>", unsafe_allow_html=True)
+        render_html('html_sidebar', "<hr>")
         col1, col2 = st.columns([3, 1])
         with col1:
             st.markdown("Tema:")
         with col2:
-            if st.session_state['theme'] == 'light':
-                if st.button("🌙"):
-                    st.session_state['theme'] = 'dark'
-                    st.experimental_rerun()
-            else:
-                if st.button("☀️"):
-                    st.session_state['theme'] = 'light'
-                    st.experimental_rerun()
+            # Tombol di dalam komponen: tema ditukar di browser tanpa rerun
+            components.html(switcher_html(theme_sources(), toggle=True), height=40)
 
         # === Tombol Logout tetap di sidebar, hanya muncul kalau sudah login ===
         if st.session_state.get('authenticated'):
-            try:
-                authenticator.logout("🚪 Logout", "sidebar")
-            except KeyError:
-                # fallback reset session
-                st.session_state['authenticated'] = False
-                st.session_state['username'] = None
-                st.session_state['role'] = None
-                st.session_state['current_page'] = 'home'
-                st.session_state['theme'] = 'light'
-                st.session_state['authentication_status'] = None
+            st.button("🚪 Logout", key="logout_button", on_click=logout)
+
+# Fungsi untuk menentukan alamat klien (untuk rate limit login). X-Forwarded-For
+# bisa diisi bebas oleh klien, jadi hanya dipakai bila koneksi datang dari proxy
+# tepercaya (auth.trusted_proxies), dan yang diambil hop paling kanan yang
+# bukan proxy tepercaya
+def get_client_address():
+    request = get_session_request()
+    if request is None:
+        return 'unknown'
+    address = request.remote_ip
+    trusted = set(config.get('auth', {}).get('trusted_proxies', []))
+    if address not in trusted:
+        return address
+    for hop in reversed(request.headers.get('X-Forwarded-For', '').split(',')):
+        hop = hop.strip()
+        if hop and hop not in trusted:
+            return hop
+    return address
+
+# Fungsi untuk memulai sesi setelah password atau cookie terverifikasi
+def start_session(username, role):
+    st.session_state['session_token'] = get_session_cache().issue(username, role)
+    st.session_state['authenticated'] = True
+    st.session_state['username'] = username
+    st.session_state['role'] = role
+    st.session_state['logout'] = False
+    prefetch_for_role(role)
+
+# Fungsi untuk mengakhiri sesi (logout, token kedaluwarsa atau dicabut)
+def end_session():
+    get_session_cache().revoke(st.session_state.pop('session_token', None))
+    st.session_state['authenticated'] = False
+    st.session_state['username'] = None
+    st.session_state['role'] = 'guest'
+    st.session_state['current_page'] = 'home'
+
+# Callback form login: rate limit per IP lalu bcrypt di pool terbatas
+def submit_login():
+    username = st.session_state['login_username'].strip().lower()
+    password = st.session_state['login_password']
+    st.session_state['login_password'] = ''
+    client = get_client_address()
+    limiter = get_rate_limiter()
+    if not limiter.allow(client):
+        st.session_state['login_error'] = f"Terlalu banyak percobaan login gagal. Coba lagi dalam {limiter.retry_after(client)} detik."
+        return
+
+    user = get_account_store().user(username)
+    try:
+        with metrics.span('login.verify'):
+            valid = user is not None and get_password_verifier().check(password, user['password'])
+    except LoginBusy:
+        st.session_state['login_error'] = "Server sedang memproses banyak login. Silakan coba lagi sebentar lagi."
+        return
+    if not valid:
+        limiter.record(client)
+        st.session_state['login_error'] = "Username atau password salah."
+        return
+
+    st.session_state.pop('login_error', None)
+    start_session(username, user['role'])
+    # Cookie login ulang ditulis pada eksekusi berikutnya (komponen tidak bisa dirender di callback)
+    st.session_state['set_login_cookie'] = True
+
+# Callback tombol logout
+def logout():
+    end_session()
+    # Authenticator tidak membaca cookie lagi selama 'logout' bernilai True
+    st.session_state['logout'] = True
+    st.session_state['delete_login_cookie'] = True
+
+# Fungsi untuk menulis cookie login ulang (API streamlit-authenticator 0.2.3)
+def set_login_cookie():
+    authenticator = get_authenticator()
+    authenticator.exp_date = authenticator._set_exp_date()
+    authenticator.cookie_manager.set(
+        authenticator.cookie_name,
+        authenticator._token_encode(),
+        expires_at=datetime.now() + timedelta(days=authenticator.cookie_expiry_days)
+    )
+
+# Fungsi untuk menghapus cookie login ulang
+def delete_login_cookie(authenticator):
+    try:
+        authenticator.cookie_manager.delete(authenticator.cookie_name)
+    except KeyError:
+        # Cookie belum pernah ada di browser ini
+        pass
+
+# Fungsi untuk membaca username dari cookie login ulang yang masih berlaku
+def read_login_cookie(authenticator):
+    authenticator.token = authenticator.cookie_manager.get(authenticator.cookie_name)
+    if not authenticator.token:
+        return None
+    token = authenticator._token_decode()
+    if not token or token.get('exp_date', 0) <= datetime.utcnow().timestamp():
+        return None
+    return token.get('username')
+
+# Fungsi untuk memeriksa sesi di awal setiap eksekusi. Sesi yang sudah login
+# cukup dicek lewat token di cache; authenticator (komponen cookie) hanya
+# dibuat selama sesi belum login atau sesaat setelah login/logout
+def sync_session():
+    if st.session_state['authenticated']:
+        session = get_session_cache().verify(st.session_state.get('session_token'))
+        if session is None:
+            end_session()
+        else:
+            st.session_state['username'], st.session_state['role'] = session
+
+    if st.session_state.pop('set_login_cookie', False):
+        set_login_cookie()
+        return
+    if st.session_state['authenticated']:
+        return
+
+    authenticator = get_authenticator()
+    if st.session_state.pop('delete_login_cookie', False):
+        delete_login_cookie(authenticator)
+        return
+    if st.session_state.get('logout'):
+        # Browser bisa masih mengirim cookie lama sampai komponen selesai menghapusnya
+        return
+    with metrics.span('login.cookie'):
+        username = read_login_cookie(authenticator)
+        user = get_account_store().user(username) if username else None
+    if user is not None:
+        start_session(username, user['role'])
+
+# Fungsi untuk menampilkan form login
+def show_login_form():
+    with st.form('login_form'):
+        st.subheader('Login')
+        st.text_input('Username', key='login_username')
+        st.text_input('Password', type='password', key='login_password')
+        st.form_submit_button('Login', on_click=submit_login)
+
+    if st.session_state.get('login_error'):
+        st.error(st.session_state['login_error'])
+    else:
+        st.info("Masukkan username dan password Anda.")
 
 # Fungsi untuk menampilkan halaman login
 def show_login_page():
     st.title(config['app_name'])
-    
-    
-    name, authentication_status, username = authenticator.login(
-    fields={"Form name": "Login"},
-    location="main"
-)
-
-    
-    if authentication_status:
-        st.session_state['authenticated'] = True
-        st.session_state['username'] = username
-        st.session_state['role'] = credentials['credentials']['usernames'][username]['role']
-        st.experimental_rerun()
-    elif authentication_status == False:
-        st.error('Username/password salah')
-    elif authentication_status == None:
-        st.warning('Silakan masukkan username dan password')
+    show_login_form()
 
 # Main app
 def main():
@@ -608,105 +2224,77 @@ def main():
         "username": None,
         "role": "guest",
         "current_page": "home",
-        "theme": "light",
     }.items():
         if key not in st.session_state:
             st.session_state[key] = val
 
+    sync_session()
+    
+    metrics_settings = config.get('metrics', {})
+    metrics.configure(capacity=metrics_settings.get('capacity', 20000), enabled=metrics_settings.get('enabled', True))
+
     if not st.session_state["authenticated"]:
-        # === Halaman login cantik ===
-        logo_html = ""
-        if config.get("app_logo"):
-            logo_html = f'<img src="{config["app_logo"]}" class="login-logo" alt="Logo">'
-        else:
-            # fallback kalau logo belum diupload
-            logo_html = '<img src="https://upload.wikimedia.org/wikipedia/commons/a/a7/React-icon.svg" class="login-logo" alt="Logo">'
-
-        st.markdown(f"""
-<style>
-.login-container {{
-    text-align: center;
-    margin-bottom: 20px;
-}}
-.login-logo {{
-    width: 120px;
-    height: auto;
-    margin-bottom: 15px;
-}}
-.login-card {{
-    max-width: 400px;
-    margin: 0 auto;
-    padding: 30px;
-    border-radius: 15px;
-    background-color: #f9f9f9;
-    box-shadow: 0px 4px 12px rgba(0,0,0,0.1);
-    text-align: center;
-}}
-.marquee {{
-    width: 100%;
-    overflow: hidden;
-    white-space: nowrap;
-    box-sizing: border-box;
-    color: #007BFF;
-    font-weight: bold;
-    font-size: 18px;
-    margin-top: 10px;
-}}
-.marquee span {{
-    display: inline-block;
-    padding-left: 100%;
-    animation: marquee 10s linear infinite;
-}}
-@keyframes marquee {{
-    0%   {{ transform: translate(0, 0); }}
-    100% {{ transform: translate(-100%, 0); }}
-}}
-</style>
+        # Setelah login, tombol tema di sidebar yang memasang stylesheet
+        load_theme()
+        with st.container():
+            # === Halaman login cantik ===
+            logo_html = ""
+            if config.get("app_logo"):
+                logo_html = f'<img src="{logo_url(config["app_logo"], 120)}" class="login-logo" alt="Logo">'
+            else:
+                # fallback kalau logo belum diupload
+                logo_html = '<img src="https://upload.wikimedia.org/wikipedia/commons/a/a7/React-icon.svg" class="login-logo" alt="Logo">'
 
+            # CSS halaman login ada di bundle tema (style.css)
+            render_html('html_login', f"""
 <div class="login-container">
     {logo_html}
     <h2>Silakan Login</h2>
     <div class="marquee"><span> REKAP BARANG DAN JASA DINAS PERTANIAN KABUPATEN LOMBOK BARAT TAHUN 2025 </span></div>
 </div>
 <div class="login-card">
-""", unsafe_allow_html=True)
-
+""")
 
-        # Form login
-        name, authentication_status, username = authenticator.login(
-    fields={"Form name": "Login"},
-    location="main"
-)
 
+            # Form login
+            show_login_form()
 
-        if authentication_status:
-            st.session_state["authenticated"] = True
-            st.session_state["username"] = username
-            st.session_state["role"] = credentials["credentials"]["usernames"][username]["role"]
-            st.experimental_rerun()
-        elif authentication_status is False:
-            st.error("Username atau password salah.")
-        else:
-            st.info("Masukkan username dan password Anda.")
-
-        st.markdown("</div>", unsafe_allow_html=True)
+            st.markdown("</div>", unsafe_allow_html=True)
 
-    else:
+    if st.session_state["authenticated"]:
         # === Sudah login → tampilkan sidebar + halaman ===
+        sync_page_with_url()
+        if st.session_state["current_page"] == "search" and "search_query" not in st.session_state:
+            # Link hasil pencarian yang dibuka langsung: isi kotak pencarian dari URL
+            st.session_state["search_query"] = st.query_params.get("q", "")
         show_sidebar()
 
         if st.session_state["current_page"] == "home":
             show_home_page()
+        elif st.session_state["current_page"] == "search":
+            show_search_page()
         elif st.session_state["current_page"] == "admin":
             if st.session_state["role"] == "admin":
                 show_admin_page()
             else:
                 st.error("Anda tidak memiliki akses ke halaman ini.")
-                st.session_state["current_page"] = "home"
-                st.experimental_rerun()
+                navigate("home")
+                show_home_page()
         else:
             show_page(st.session_state["current_page"])
 
+    # Halaman sudah tergambar; pekerjaan latar belakang baru disiapkan setelah ini
+    record_first_paint()
+
+    # Pastikan refresh latar belakang berjalan untuk semua spreadsheet
+    sync_prefetch()
+    if metrics_settings.get('enabled', True):
+        start_metrics_export()
+    if config.get('startup', {}).get('warm_up', True):
+        start_warmup()
+    budget = get_memory_budget()
+    if budget is not None:
+        budget.touch_session(run_context.session_id if run_context else None)
 
 if __name__ == "__main__":
     main()
@@ -719,3 +2307,9 @@ st.markdown("""
 </div>
 </div>
 """, unsafe_allow_html=True)
+
+# Selesai satu eksekusi script
+metrics.end_run()
+
+# Job ekspor masih berjalan: perbarui progresnya dengan rerun berkala
+poll_exports()
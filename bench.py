@@ -0,0 +1,376 @@
+"""Benchmark beban tanpa browser: N sesi AppTest menjelajah aplikasi terhadap stub ekspor xlsx lokal.
+
+Contoh:
+    python bench.py --sessions 8 --steps 20 --rows 2000 --latency 0.2
+
+Aplikasi disalin ke direktori sementara dengan ``http.export_base_url``
+diarahkan ke server stub, sehingga ``download_spreadsheet`` tidak pernah
+menyentuh Google. Hasil setiap run ditambahkan ke ``bench_results.jsonl``
+dan dibandingkan dengan run terakhir yang memakai parameter sama.
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import openpyxl
+
+APP_FILES = ('style.css', 'config.json', 'credentials.yaml')
+APP_DIRS = ('static', '.streamlit')
+
+
+def make_workbook(rows, tabs=2, seed=0):
+    """Workbook xlsx mirip rekap pengadaan dengan ``rows`` baris per tab."""
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    for tab in range(tabs):
+        sheet = workbook.create_sheet(f"Rekap {tab + 1}")
+        sheet.append(['No', 'Nama Paket', 'Penyedia', 'Sub Bidang', 'Status', 'Pagu', 'Realisasi'])
+        for row in range(rows):
+            pagu = rng.randrange(5, 500) * 1000000
+            sheet.append([
+                row + 1,
+                f"Pengadaan paket {rng.choice(['benih', 'pupuk', 'alsintan', 'obat hewan', 'bibit'])} {row}",
+                f"CV Mitra Tani {rng.randrange(40)}",
+                rng.choice(['PSP', 'TPH', 'NAK', 'BUN']),
+                rng.choice(['Selesai', 'Proses', 'Belum Mulai']),
+                pagu,
+                int(pagu * rng.random()),
+            ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Meniru ``/spreadsheets/d/<id>/export`` milik Google, termasuk ETag/304."""
+
+    def do_GET(self):
+        stub = self.server.stub
+        match = re.match(r'^/spreadsheets/d/([^/]+)/export', self.path)
+        if match is None:
+            self.send_error(404)
+            return
+        time.sleep(stub.latency)
+        content, etag = stub.workbook(match.group(1))
+        if self.headers.get('If-None-Match') == etag:
+            stub.count(not_modified=1)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        stub.count(full=1, bytes=len(content))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    def __init__(self, rows, latency, tabs=2):
+        self.rows = rows
+        self.latency = latency
+        self.tabs = tabs
+        self.counts = {'requests': 0, 'full': 0, 'not_modified': 0, 'bytes': 0}
+        self._workbooks = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        threading.Thread(target=self._httpd.serve_forever, name='bench-stub', daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def workbook(self, sheet_id):
+        with self._lock:
+            if sheet_id not in self._workbooks:
+                seed = int(hashlib.sha1(sheet_id.encode()).hexdigest()[:8], 16)
+                content = make_workbook(self.rows, self.tabs, seed)
+                self._workbooks[sheet_id] = (content, f'"{hashlib.sha1(content).hexdigest()[:16]}"')
+            return self._workbooks[sheet_id]
+
+    def count(self, **values):
+        with self._lock:
+            self.counts['requests'] += 1
+            for key, value in values.items():
+                self.counts[key] += value
+
+    def stop(self):
+        self._httpd.shutdown()
+
+
+def prepare_app(source_dir, work_dir, stub_url, args):
+    """Salin aplikasi ke ``work_dir`` dan arahkan ekspornya ke server stub."""
+    for name in os.listdir(source_dir):
+        if name.endswith('.py') and name != os.path.basename(__file__):
+            shutil.copy(os.path.join(source_dir, name), work_dir)
+    for name in APP_FILES:
+        shutil.copy(os.path.join(source_dir, name), work_dir)
+    for name in APP_DIRS:
+        if os.path.isdir(os.path.join(source_dir, name)):
+            shutil.copytree(os.path.join(source_dir, name), os.path.join(work_dir, name))
+
+    config_path = os.path.join(work_dir, 'config.json')
+    with open(config_path, 'r') as file:
+        config = json.load(file)
+    config.setdefault('http', {})['export_base_url'] = stub_url
+    config.setdefault('download_server', {})['enabled'] = False
+    config.setdefault('prefetch', {})['enabled'] = args.prefetch
+    config.setdefault('cache', {})['ttl_seconds'] = args.ttl
+    if args.mode != 'as-is':
+        for page_id, sheet_info in config['spreadsheets'].items():
+            if sheet_info.get('mode') != 'analytics':
+                sheet_info['mode'] = args.mode
+    with open(config_path, 'w') as file:
+        json.dump(config, file, indent=2)
+    return config
+
+
+def allow_concurrent_apptests():
+    """AppTest memasang ``Runtime._instance`` tiruan untuk setiap run lalu
+    menghapusnya, sehingga beberapa sesi paralel saling menimpa. Pasang satu
+    runtime tiruan bersama dan arahkan penulisan per-run ke subclass."""
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import app_test
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = shared
+
+    class PerRunRuntime(Runtime):
+        _instance = None
+
+    app_test.Runtime = PerRunRuntime
+
+    # Sesi diisi dari thread benchmark, bukan thread script; peringatannya tidak relevan
+    logging.getLogger('streamlit.runtime.scriptrunner.script_run_context').setLevel(logging.ERROR)
+
+
+def run_session(index, args, config, results):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(args.seed + index)
+    role = 'admin' if index < args.admins else 'user'
+    usernames = [name for name, user in load_usernames().items() if user.get('role') == role]
+    access = list(config['spreadsheets']) if role == 'admin' else list(config['roles'][role]['access'])
+
+    at = AppTest.from_file('app.py', default_timeout=args.timeout)
+    at.session_state['authenticated'] = True
+    at.session_state['username'] = usernames[0] if usernames else role
+    at.session_state['role'] = role
+    at.session_state['session_token'] = session_token(config, at.session_state['username'], role)
+    at.session_state['current_page'] = 'home'
+    timed_run(at, 'home', results)
+
+    for _ in range(args.steps):
+        time.sleep(rng.uniform(0, args.think_time))
+        targets = ['home'] * 2 + access * 3 + (['admin'] if role == 'admin' else [])
+        target = rng.choice(targets)
+        if target == 'home':
+            button = next((item for item in at.sidebar.button if item.label == "🏠 Beranda"), None)
+        elif target == 'admin':
+            button = next((item for item in at.sidebar.button if item.label == "⚙️ Admin Panel"), None)
+        else:
+            button = next((item for item in at.sidebar.button if item.key == f"nav_{target}"), None)
+        if button is None:
+            at.session_state['current_page'] = target
+        else:
+            button.click()
+        timed_run(at, 'admin' if target == 'admin' else 'home' if target == 'home' else f"page:{target}", results)
+
+
+def timed_run(at, kind, results):
+    started = time.perf_counter()
+    error = None
+    try:
+        at.run()
+        if at.exception:
+            error = at.exception[0].message
+    except Exception as e:
+        error = str(e)
+    results.append({'kind': kind, 'seconds': time.perf_counter() - started, 'error': error})
+
+
+def load_credentials():
+    import yaml
+    with open('credentials.yaml', 'r') as file:
+        return yaml.safe_load(file)
+
+
+def load_usernames():
+    return load_credentials()['credentials']['usernames']
+
+
+def session_token(config, username, role):
+    """Token sesi seperti hasil login, agar sesi benchmark melewati jalur cepat autentikasi."""
+    from download_server import load_secret, sign_token
+    # Rahasia yang sama dengan get_server_secret() di app.py (dibuat bila belum ada)
+    secret = load_secret(config.get('auth', {}).get('secret_path', '.server_secret'))
+    return sign_token(secret, {'scope': 'session', 'u': username, 'r': role}, 3600)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = np.array(values)
+    p50, p95, p99 = np.quantile(values, (0.5, 0.95, 0.99))
+    return {'count': int(len(values)), 'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(values.max())}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KB, macOS byte
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit(source_dir):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=source_dir, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def benchmark(args):
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    stub = StubServer(args.rows, args.latency, args.tabs)
+    work_dir = tempfile.mkdtemp(prefix='barjas-bench-')
+    previous_dir = os.getcwd()
+    try:
+        config = prepare_app(source_dir, work_dir, stub.url, args)
+        os.chdir(work_dir)
+        sys.path.insert(0, work_dir)
+        allow_concurrent_apptests()
+
+        results = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            futures = [executor.submit(run_session, index, args, config, results) for index in range(args.sessions)]
+            for future in futures:
+                future.result()
+        duration = time.perf_counter() - started
+    finally:
+        os.chdir(previous_dir)
+        stub.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    kinds = {}
+    for item in results:
+        group = 'page' if item['kind'].startswith('page:') else item['kind']
+        kinds.setdefault(group, []).append(item['seconds'])
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(source_dir),
+        'params': {key: getattr(args, key) for key in ('sessions', 'admins', 'steps', 'rows', 'tabs', 'latency', 'think_time', 'mode', 'prefetch', 'ttl')},
+        'duration_seconds': duration,
+        'runs': len(results),
+        'errors': sum(1 for item in results if item['error']),
+        'error_samples': sorted({item['error'] for item in results if item['error']})[:5],
+        'throughput_runs_per_second': len(results) / duration if duration else 0.0,
+        'latency': {'all': percentiles([item['seconds'] for item in results]), **{kind: percentiles(values) for kind, values in sorted(kinds.items())}},
+        'peak_rss_mb': peak_rss_mb(),
+        'upstream': dict(stub.counts),
+    }
+
+
+def load_previous(path, params):
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get('params') == params:
+                    previous = record
+    return previous
+
+
+def report(result, previous=None):
+    def delta(current, old, lower_is_better=True):
+        if old in (None, 0):
+            return ''
+        change = (current - old) / old * 100
+        if abs(change) < 0.05:
+            return f"  (sama dengan {previous['commit'] or previous['timestamp']})"
+        better = change < 0 if lower_is_better else change > 0
+        return f"  ({change:+.1f}% {'lebih baik' if better else 'lebih buruk'} dari {previous['commit'] or previous['timestamp']})"
+
+    old = previous or {}
+    lines = [
+        f"Parameter      : {json.dumps(result['params'])}",
+        f"Durasi         : {result['duration_seconds']:.1f} detik, {result['runs']} eksekusi script, {result['errors']} error",
+        f"Throughput     : {result['throughput_runs_per_second']:.2f} eksekusi/detik"
+        + delta(result['throughput_runs_per_second'], old.get('throughput_runs_per_second'), lower_is_better=False),
+    ]
+    for kind, stats in result['latency'].items():
+        if stats:
+            old_p95 = old.get('latency', {}).get(kind, {}).get('p95')
+            lines.append(
+                f"Latensi {kind:<7}: p50 {stats['p50'] * 1000:.0f} ms, p95 {stats['p95'] * 1000:.0f} ms, "
+                f"p99 {stats['p99'] * 1000:.0f} ms, maks {stats['max'] * 1000:.0f} ms" + delta(stats['p95'], old_p95)
+            )
+    lines.append(f"Peak RSS       : {result['peak_rss_mb']:.0f} MB" + delta(result['peak_rss_mb'], old.get('peak_rss_mb')))
+    upstream = result['upstream']
+    lines.append(
+        f"Upstream       : {upstream['requests']} request ({upstream['full']} penuh, {upstream['not_modified']} 304), "
+        f"{upstream['bytes'] / (1024 * 1024):.1f} MB" + delta(upstream['requests'], old.get('upstream', {}).get('requests'))
+    )
+    for sample in result['error_samples']:
+        lines.append(f"Error          : {sample}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=8, help="jumlah sesi login bersamaan")
+    parser.add_argument('--admins', type=int, default=1, help="berapa dari sesi tersebut yang admin")
+    parser.add_argument('--steps', type=int, default=20, help="jumlah navigasi per sesi")
+    parser.add_argument('--rows', type=int, default=2000, help="baris per tab pada xlsx stub")
+    parser.add_argument('--tabs', type=int, default=2, help="jumlah tab per workbook stub")
+    parser.add_argument('--latency', type=float, default=0.2, help="latensi stub per request (detik)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="jeda acak maksimum antar klik (detik)")
+    parser.add_argument('--mode', choices=['table', 'embed', 'as-is'], default='table', help="mode tampilan sheet selama benchmark")
+    parser.add_argument('--prefetch', action='store_true', help="aktifkan penjadwal refresh latar")
+    parser.add_argument('--ttl', type=int, default=300, help="TTL cache ekspor (detik)")
+    parser.add_argument('--timeout', type=float, default=120, help="batas waktu satu eksekusi script (detik)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--results', default='bench_results.jsonl', help="file JSON lines untuk menyimpan hasil")
+    args = parser.parse_args()
+
+    result = benchmark(args)
+    results_path = os.path.abspath(args.results)
+    previous = load_previous(results_path, result['params'])
+    print(report(result, previous))
+    with open(results_path, 'a') as file:
+        file.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Konversi ekspor xlsx ke file Arrow IPC per tab yang dibaca lewat memory map."""
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config_store import atomic_write
+from sheet_data import optimize_frame, unique_headers
+
+BATCH_ROWS = 5000
+
+
+def column_array(values):
+    """Array Arrow dari satu kolom; kolom campuran (angka + teks) disimpan sebagai teks."""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def unify_type(types):
+    types = {kind for kind in types if not pa.types.is_null(kind)}
+    if not types:
+        return pa.null()
+    if len(types) == 1:
+        return types.pop()
+    if all(pa.types.is_integer(kind) or pa.types.is_floating(kind) for kind in types):
+        return pa.float64()
+    return pa.string()
+
+
+def tab_to_table(rows):
+    """Baca baris dari ``iter_rows`` secara bertahap menjadi ``pa.Table``.
+
+    Aturannya sama dengan ``values_to_frame``: baris kosong dilewati, baris
+    pertama yang berisi menjadi header, dan kolom yang seluruhnya kosong dibuang.
+    """
+    headers = None
+    width = 0
+    batches = []
+    pending = []
+
+    def flush():
+        if pending:
+            columns = list(zip(*(row + (None,) * (width - len(row)) for row in pending)))
+            batches.append([column_array(list(column)) for column in columns])
+            pending.clear()
+
+    for row in rows:
+        row = tuple(None if cell == '' else cell for cell in row)
+        if all(cell is None for cell in row):
+            continue
+        if headers is None:
+            headers = row
+            width = len(row)
+            continue
+        if len(row) > width:
+            # Baris lebih lebar dari header: batch sebelumnya diberi kolom kosong tambahan
+            flush()
+            for batch in batches:
+                batch.extend(pa.nulls(len(batch[0]) if batch else 0) for _ in range(len(row) - width))
+            width = len(row)
+        pending.append(row)
+        if len(pending) >= BATCH_ROWS:
+            flush()
+    flush()
+
+    if headers is None:
+        return pa.table({})
+    names = unique_headers(list(headers) + [None] * (width - len(headers)))
+    columns = {}
+    for index, name in enumerate(names):
+        chunks = [batch[index] for batch in batches]
+        target = unify_type(chunk.type for chunk in chunks)
+        if pa.types.is_null(target):
+            continue
+        chunks = [chunk if chunk.type == target else chunk.cast(target) for chunk in chunks]
+        columns[name] = pa.chunked_array(chunks, type=target)
+    return pa.table(columns)
+
+
+def iter_xlsx_tabs(content):
+    """``(nama_tab, pa.Table)`` untuk setiap tab, dibaca satu per satu dengan mode read-only."""
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, tab_to_table(worksheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def write_ipc(table, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=65536)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ColumnarTable:
+    """Satu tab di atas ``pa.Table`` (biasanya hasil memory map, tanpa salinan)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def open(cls, path):
+        source = pa.memory_map(path, 'r')
+        return cls(pa.ipc.open_file(source).read_all())
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    @property
+    def num_rows(self):
+        return self.table.num_rows
+
+    def filter(self, column=None, query=None):
+        """Hanya kolom ``column`` yang dipindai; baris yang cocok diambil dengan ``take``."""
+        if not column or not query:
+            return self
+        values = self.table.column(column)
+        if not pa.types.is_string(values.type):
+            values = values.cast(pa.string())
+        mask = pc.fill_null(pc.match_substring(values, query, ignore_case=True), False)
+        return ColumnarTable(self.table.take(pc.indices_nonzero(mask)))
+
+    def rows(self, start=0, stop=None, columns=None):
+        """DataFrame untuk rentang baris (dan kolom) tertentu saja."""
+        table = self.table.select(columns) if columns else self.table
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        return table.slice(start, max(0, stop - start)).to_pandas()
+
+    def to_pandas(self):
+        return self.table.to_pandas()
+
+
+def frames_from_tables(tables):
+    """``{nama_tab: DataFrame}`` dari tabel kolumnar, dengan dtype yang sama seperti ``values_to_frame``."""
+    return {name: optimize_frame(table.to_pandas()) for name, table in tables.items()}
+
+
+class ColumnarStore:
+    """File Arrow IPC per tab di ``<root>/<sheet_id>/<digest>/``.
+
+    ``ingest()`` mengonversi workbook sekali per isi (digest); ``open()``
+    memetakan file ke memori sehingga halaman hanya menyentuh kolom dan
+    baris yang ditampilkan.
+    """
+
+    def __init__(self, root='columnar', max_open=32):
+        self.root = root
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.stats = {'ingests': 0, 'opens': 0}
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, sheet_id, *parts):
+        return os.path.join(self.root, sheet_id, *parts)
+
+    def manifest(self, sheet_id):
+        try:
+            with open(self._dir(sheet_id, 'manifest.json'), 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def ingest(self, sheet_id, content, digest=None):
+        digest = digest or hashlib.sha256(content).hexdigest()
+        with self._lock:
+            sheet_lock = self._locks.setdefault(sheet_id, threading.Lock())
+        with sheet_lock:
+            manifest = self.manifest(sheet_id)
+            if manifest is not None and manifest['digest'] == digest:
+                return manifest
+
+            version_dir = self._dir(sheet_id, digest[:16])
+            os.makedirs(version_dir, exist_ok=True)
+            tabs = []
+            for index, (name, table) in enumerate(iter_xlsx_tabs(content)):
+                filename = f"tab-{index}.arrow"
+                write_ipc(table, os.path.join(version_dir, filename))
+                tabs.append({'name': name, 'file': filename, 'rows': table.num_rows, 'columns': table.column_names})
+            manifest = {'digest': digest, 'dir': digest[:16], 'tabs': tabs}
+            atomic_write(self._dir(sheet_id, 'manifest.json'), json.dumps(manifest))
+            self.stats['ingests'] += 1
+
+            # Versi lama dihapus; memory map yang masih terbuka tetap valid di Linux
+            for name in os.listdir(self._dir(sheet_id)):
+                path = self._dir(sheet_id, name)
+                if os.path.isdir(path) and name != manifest['dir']:
+                    shutil.rmtree(path, ignore_errors=True)
+            return manifest
+
+    def open(self, sheet_id, digest=None):
+        """``{nama_tab: ColumnarTable}`` atau ``None`` jika belum di-ingest (atau digest berbeda)."""
+        manifest = self.manifest(sheet_id)
+        if manifest is None or (digest is not None and manifest['digest'] != digest):
+            return None
+        key = (sheet_id, manifest['digest'])
+        with self._lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return self._open[key]
+
+        tables = {
+            tab['name']: ColumnarTable.open(self._dir(sheet_id, manifest['dir'], tab['file']))
+            for tab in manifest['tabs']
+        }
+        with self._lock:
+            self._open[key] = tables
+            self.stats['opens'] += 1
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return tables
+
+    def info(self):
+        with self._lock:
+            return {'open': len(self._open), **self.stats}
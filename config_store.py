@@ -0,0 +1,258 @@
+"""Cache file konfigurasi per proses yang dibaca ulang hanya saat file berubah."""
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import yaml
+from yaml.loader import SafeLoader
+
+
+class ReadOnlyDict(dict):
+    """Dict yang dibagi ke semua sesi; ubah lewat salinan dari ``thaw()``."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Konfigurasi bersama bersifat read-only, gunakan thaw() untuk mengubahnya")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return ReadOnlyDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Salinan dict/list biasa yang boleh diubah dan di-dump ke JSON/YAML."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def parse_json(text):
+    return json.loads(text)
+
+
+def parse_yaml(text):
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def parse_text(text):
+    return text
+
+
+def dump_json(value):
+    return json.dumps(value, indent=2)
+
+
+def dump_yaml(value):
+    return yaml.dump(value)
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Kunci antar-proses berbasis file ``<path>.lock``."""
+    with open(f"{path}.lock", 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write(path, text):
+    """Tulis ke file sementara, fsync, lalu rename agar pembaca tidak melihat file setengah jadi."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def apply_op(document, op):
+    """Terapkan satu operasi journal (``set``/``delete``) ke dokumen."""
+    *parents, key = op['path']
+    target = document
+    for part in parents:
+        target = target.setdefault(part, {})
+    if op['op'] == 'set':
+        target[key] = op['value']
+    elif op['op'] == 'delete':
+        target.pop(key, None)
+
+
+class FileStore:
+    """Memparse satu file sekali dan menyimpannya sampai mtime/ukurannya berubah."""
+
+    def __init__(self, path, parser=parse_text):
+        self.path = path
+        self.parser = parser
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._value = None
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        with open(self.path, 'r') as file:
+            return self.parser(file.read())
+
+    def get(self):
+        signature = self._stat()
+        if signature == self._signature:
+            return self._value
+
+        with self._lock:
+            signature = self._stat()
+            if signature != self._signature:
+                self._value = freeze(self._read())
+                self._signature = signature
+                self.loads += 1
+        return self._value
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+
+class JournaledStore(FileStore):
+    """FileStore yang bisa ditulis per kunci tanpa menulis ulang seluruh dokumen.
+
+    Setiap ``set``/``delete`` ditambahkan sebagai satu baris JSON ke
+    ``<path>.journal`` (di-fsync, di bawah kunci antar-proses). Pembaca
+    menerapkan journal di atas file utama. Setelah ``compact_delay`` detik
+    tanpa perubahan, atau setelah ``max_journal`` operasi, journal dilebur ke
+    file utama dengan satu penulisan atomik.
+    """
+
+    def __init__(self, path, parser, dumper, compact_delay=2.0, max_journal=100):
+        super().__init__(path, parser)
+        self.dumper = dumper
+        self.compact_delay = compact_delay
+        self.max_journal = max_journal
+        self.journal_path = f"{path}.journal"
+        self.flushes = 0
+        self._pending = 0
+        self._timer = None
+
+    def _stat(self):
+        base = super()._stat()
+        try:
+            stat = os.stat(self.journal_path)
+            journal = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            journal = None
+        return base, journal
+
+    def _read(self):
+        with file_lock(self.path, shared=True):
+            return self._read_unlocked()
+
+    def _read_unlocked(self):
+        document = super()._read()
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as journal:
+                for line in journal:
+                    if line.strip():
+                        apply_op(document, json.loads(line))
+        return document
+
+    def set(self, path, value):
+        self._append({'op': 'set', 'path': list(path), 'value': thaw(value)})
+
+    def delete(self, path):
+        self._append({'op': 'delete', 'path': list(path)})
+
+    def replace(self, document):
+        """Tulis ulang seluruh dokumen (mis. saat membuat konfigurasi default)."""
+        with self._lock, file_lock(self.path):
+            atomic_write(self.path, self.dumper(thaw(document)))
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._pending = 0
+
+    def _append(self, op):
+        line = json.dumps(op) + '\n'
+        with self._lock:
+            with file_lock(self.path):
+                with open(self.journal_path, 'a') as journal:
+                    journal.write(line)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+            self._pending += 1
+            if self._pending >= self.max_journal:
+                self._compact_locked()
+            else:
+                self._schedule_locked()
+
+    def _schedule_locked(self):
+        # Debounce: rentetan submit form cukup dilebur sekali
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.compact_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with file_lock(self.path):
+            if not os.path.exists(self.journal_path):
+                self._pending = 0
+                return
+            document = self._read_unlocked()
+            atomic_write(self.path, self.dumper(document))
+            os.remove(self.journal_path)
+        self._pending = 0
+        self.flushes += 1
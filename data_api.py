@@ -0,0 +1,278 @@
+"""API baca-saja (JSON/CSV/Arrow) di atas cache sheet aplikasi, dilayani oleh server samping.
+
+Endpoint (semua butuh ``Authorization: Bearer <token>``, token dari halaman Beranda)::
+
+    GET /api/sheets                       daftar sheet yang boleh diakses
+    GET /api/sheets/<page_id>             tab, kolom dan jumlah baris
+    GET /api/sheets/<page_id>/<tab>       isi tab
+
+Parameter isi tab: ``format=json|csv|arrow``, ``columns=A,B``,
+``where=Kolom:op:nilai`` (boleh berulang; op: eq, ne, contains, gt, gte, lt,
+lte), ``offset`` dan ``limit``.
+"""
+import gzip
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, quote, unquote, urlencode
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from download_server import sign_token, verify_token
+
+TOKEN_SCOPE = 'api'
+FORMATS = {
+    'json': 'application/json; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+OPERATORS = {
+    'eq': pc.equal, 'ne': pc.not_equal,
+    'gt': pc.greater, 'gte': pc.greater_equal,
+    'lt': pc.less, 'lte': pc.less_equal,
+}
+GZIP_MIN_BYTES = 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def issue_token(secret, username, ttl_seconds):
+    return sign_token(secret, {'u': username, 'scope': TOKEN_SCOPE}, ttl_seconds)
+
+
+def arrow_table(table):
+    """``pa.Table`` dari ``ColumnarTable`` atau DataFrame; kolom dictionary (category) dibuka."""
+    if hasattr(table, 'table'):
+        table = table.table
+    elif not isinstance(table, pa.Table):
+        table = pa.Table.from_pandas(table, preserve_index=False)
+    columns = [column.dictionary_decode() if pa.types.is_dictionary(column.type) else column for column in table.columns]
+    return pa.table(columns, names=table.column_names)
+
+
+def filter_mask(table, column, op, value):
+    values = table.column(column)
+    if op == 'contains':
+        if not pa.types.is_string(values.type):
+            values = values.cast(pa.string())
+        return pc.match_substring(values, value, ignore_case=True)
+    if op not in OPERATORS:
+        raise ApiError(400, f"Operator tidak dikenal: {op}")
+    if pa.types.is_integer(values.type) or pa.types.is_floating(values.type):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ApiError(400, f"Kolom {column} berisi angka, nilai '{value}' bukan angka")
+        values = values.cast(pa.float64())
+    elif not pa.types.is_string(values.type):
+        values = values.cast(pa.string())
+    return OPERATORS[op](values, value)
+
+
+def apply_query(table, columns=None, where=()):
+    """Filter baris (AND) lalu proyeksi kolom."""
+    mask = None
+    for condition in where:
+        try:
+            column, op, value = condition.split(':', 2)
+        except ValueError:
+            raise ApiError(400, f"Format where harus Kolom:op:nilai, bukan '{condition}'")
+        if column not in table.column_names:
+            raise ApiError(400, f"Kolom tidak ditemukan: {column}")
+        condition_mask = pc.fill_null(filter_mask(table, column, op, value), False)
+        mask = condition_mask if mask is None else pc.and_(mask, condition_mask)
+    if mask is not None:
+        table = table.filter(mask)
+    if columns:
+        missing = [column for column in columns if column not in table.column_names]
+        if missing:
+            raise ApiError(400, f"Kolom tidak ditemukan: {', '.join(missing)}")
+        table = table.select(columns)
+    return table
+
+
+def encode(table, fmt, meta):
+    if fmt == 'csv':
+        sink = io.BytesIO()
+        pa_csv.write_csv(table, sink)
+        return sink.getvalue()
+    if fmt == 'arrow':
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return json.dumps(dict(meta, columns=table.column_names, rows=table.to_pylist()), ensure_ascii=False, default=str).encode('utf-8')
+
+
+class DataApi:
+    """Menjawab permintaan ``/api/...`` menjadi ``(status, headers, body)``.
+
+    ``load(sheet_id) -> (versi, {tab: tabel})`` membaca dari cache aplikasi
+    (ekspor, tabel, kolumnar), jadi semua konsumen berbagi satu cache hangat.
+    Hak akses memakai aturan yang sama dengan halaman: ``has_access(role, page_id)``.
+    """
+
+    def __init__(self, load, account_store, secret, has_access, sheet_id=None,
+                 default_limit=1000, max_limit=50000, max_tables=16):
+        self.load = load
+        self.account_store = account_store
+        self.secret = secret
+        self.has_access = has_access
+        self.sheet_id = sheet_id
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.max_tables = max_tables
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'errors': 0}
+
+    def handle(self, path, headers):
+        with self._lock:
+            self.stats['requests'] += 1
+        try:
+            status, response_headers, body = self._route(path, headers)
+        except ApiError as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            status, response_headers, body = e.status, {}, json.dumps({'error': e.message}).encode('utf-8')
+            response_headers['Content-Type'] = FORMATS['json']
+        if status == 304:
+            with self._lock:
+                self.stats['not_modified'] += 1
+        elif len(body) >= GZIP_MIN_BYTES and 'gzip' in headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, 5)
+            response_headers['Content-Encoding'] = 'gzip'
+        response_headers['Vary'] = 'Accept-Encoding, Authorization'
+        return status, response_headers, body
+
+    def _user(self, headers, query):
+        authorization = headers.get('Authorization', '')
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else (query.get('token') or [None])[0]
+        payload = verify_token(self.secret, token) if token else None
+        if payload is None or payload.get('scope') != TOKEN_SCOPE:
+            raise ApiError(401, "Token API tidak valid atau sudah kedaluwarsa")
+        # Role dibaca ulang setiap permintaan sehingga perubahan hak akses langsung berlaku
+        user = self.account_store.user(payload['u'])
+        if user is None:
+            raise ApiError(401, "Pengguna token ini sudah tidak ada")
+        return payload['u'], user['role']
+
+    def _route(self, path, headers):
+        path, _, raw_query = path.partition('?')
+        query = parse_qs(raw_query)
+        username, role = self._user(headers, query)
+        parts = [unquote(part) for part in path.strip('/').split('/')[1:]]
+        if parts[:1] != ['sheets']:
+            raise ApiError(404, "Endpoint tidak ditemukan")
+
+        sheets = self.account_store.spreadsheets()
+        if len(parts) == 1:
+            body = {'sheets': [
+                {'id': page_id, 'name': info['name'], 'url': f"/api/sheets/{quote(page_id)}"}
+                for page_id, info in sheets.items() if self.has_access(role, page_id)
+            ]}
+            return self._json(body, headers)
+
+        page_id = parts[1]
+        if page_id not in sheets:
+            raise ApiError(404, f"Sheet tidak ditemukan: {page_id}")
+        if not self.has_access(role, page_id):
+            raise ApiError(403, "Anda tidak memiliki akses ke sheet ini")
+        version, tables = self._tables_for(page_id, sheets[page_id])
+
+        if len(parts) == 2:
+            body = {'id': page_id, 'name': sheets[page_id]['name'], 'version': str(version), 'tabs': [
+                {'name': tab, 'rows': table.num_rows, 'columns': table.column_names, 'url': f"/api/sheets/{quote(page_id)}/{quote(tab)}"}
+                for tab, table in tables.items()
+            ]}
+            return self._json(body, headers)
+        if len(parts) != 3 or parts[2] not in tables:
+            raise ApiError(404, "Tab tidak ditemukan")
+        return self._tab(page_id, parts[2], version, tables[parts[2]], query, headers)
+
+    def _tables_for(self, page_id, info):
+        sheet_id = self.sheet_id(info['url']) if self.sheet_id else info['url']
+        if sheet_id is None:
+            raise ApiError(404, "URL sheet bukan Google Spreadsheet yang valid")
+        try:
+            version, tables = self.load(sheet_id)
+        except Exception as e:
+            raise ApiError(502, f"Gagal memuat sheet: {e}")
+        key = (sheet_id, version)
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                self._tables[key][2] = time.time()
+                return version, self._tables[key][0]
+        converted = {tab: arrow_table(table) for tab, table in tables.items()}
+        with self._lock:
+            self._tables[key] = [converted, sum(table.nbytes for table in converted.values()), time.time()]
+            for old in [old for old in self._tables if old[0] == sheet_id and old != key]:
+                del self._tables[old]
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return version, converted
+
+    def _tab(self, page_id, tab, version, table, query, headers):
+        fmt = (query.get('format') or ['json'])[0]
+        if fmt not in FORMATS:
+            raise ApiError(400, f"Format harus salah satu dari: {', '.join(FORMATS)}")
+        columns = [column for value in query.get('columns', []) for column in value.split(',') if column]
+        where = query.get('where', [])
+        try:
+            offset = max(0, int((query.get('offset') or [0])[0]))
+            limit = min(self.max_limit, max(1, int((query.get('limit') or [self.default_limit])[0])))
+        except ValueError:
+            raise ApiError(400, "offset dan limit harus angka")
+
+        # ETag dari versi data dan parameter, dihitung sebelum data disentuh
+        params = sorted((key, value) for key, values in query.items() if key != 'token' for value in values)
+        etag = '"' + hashlib.sha256(json.dumps([page_id, tab, str(version), params]).encode('utf-8')).hexdigest()[:20] + '"'
+        response_headers = {'ETag': etag, 'Cache-Control': 'private, max-age=0, must-revalidate'}
+        if headers.get('If-None-Match') == etag:
+            return 304, response_headers, b''
+
+        selected = apply_query(table, columns, where)
+        total = selected.num_rows
+        page = selected.slice(offset, limit)
+        next_offset = offset + limit if offset + limit < total else None
+        next_url = None
+        if next_offset is not None:
+            next_query = [(key, value) for key, value in params if key != 'offset'] + [('offset', next_offset)]
+            next_url = f"/api/sheets/{quote(page_id)}/{quote(tab)}?{urlencode(next_query)}"
+            response_headers['Link'] = f'<{next_url}>; rel="next"'
+        response_headers['X-Total-Count'] = str(total)
+        response_headers['Content-Type'] = FORMATS[fmt]
+        meta = {'sheet': page_id, 'tab': tab, 'version': str(version), 'total': total, 'offset': offset, 'limit': limit, 'next': next_url}
+        return 200, response_headers, encode(page, fmt, meta)
+
+    def _json(self, body, headers):
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.sha256(content).hexdigest()[:20] + '"'
+        response_headers = {'ETag': etag, 'Cache-Control': 'private, max-age=0, must-revalidate', 'Content-Type': FORMATS['json']}
+        if headers.get('If-None-Match') == etag:
+            return 304, response_headers, b''
+        return 200, response_headers, content
+
+    def memory_entries(self):
+        with self._lock:
+            return [(key, nbytes, used_at) for key, (_, nbytes, used_at) in self._tables.items()]
+
+    def release(self, key):
+        with self._lock:
+            entry = self._tables.pop(key, None)
+        return entry[1] if entry is not None else 0
+
+    def info(self):
+        with self._lock:
+            return {'tables': len(self._tables), **self.stats}
@@ -0,0 +1,302 @@
+"""Server HTTP kecil untuk mengalirkan unduhan workbook langsung ke browser."""
+import base64
+import errno
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+import requests
+
+from export_cache import export_url, fetch_many
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_BYTES = 4 * CHUNK_SIZE
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+
+
+def sign_token(secret, payload, ttl_seconds=3600):
+    """Buat token bertanda tangan HMAC yang berlaku selama ``ttl_seconds``."""
+    body = dict(payload, exp=int(time.time() + ttl_seconds))
+    raw = base64.urlsafe_b64encode(json.dumps(body, separators=(',', ':')).encode()).decode().rstrip('=')
+    signature = hmac.new(secret.encode(), raw.encode(), hashlib.sha256).hexdigest()
+    return f"{raw}.{signature}"
+
+
+def load_secret(path):
+    """Rahasia penanda tangan token milik server, dibuat acak sekali di ``path`` saat pertama dijalankan.
+
+    File ditulis lengkap ke nama sementara lalu di-``link`` ke ``path``, sehingga
+    worker yang start bersamaan memakai rahasia yang sama dan tidak pernah
+    membaca file kosong.
+    """
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as file:
+            file.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, 'r') as file:
+        return file.read().strip()
+
+
+def verify_token(secret, token, scope=None):
+    """Kembalikan payload token, atau None jika tanda tangan salah/kedaluwarsa.
+
+    Dengan ``scope``, token untuk keperluan lain (mis. token API dipakai
+    sebagai link unduhan) juga ditolak.
+    """
+    try:
+        raw, signature = token.split('.', 1)
+    except ValueError:
+        return None
+    expected = hmac.new(secret.encode(), raw.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+    except ValueError:
+        return None
+    if payload.get('exp', 0) < time.time():
+        return None
+    if scope is not None and payload.get('scope') != scope:
+        return None
+    return payload
+
+
+def write_zip(fileobj, results, filenames):
+    """Tulis hasil ``fetch_many`` ke ZIP satu per satu begitu tiap sheet selesai.
+
+    ``fileobj`` boleh stream yang tidak bisa di-seek (mis. socket); workbook
+    dilepas dari memori setelah ditulis. Mengembalikan daftar sheet yang gagal.
+    """
+    failed = []
+    # xlsx sudah terkompresi, jadi cukup disimpan apa adanya
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for sheet_id, content, error, _ in results:
+            if error:
+                failed.append(f"{filenames[sheet_id]}: {error}")
+                continue
+            with archive.open(filenames[sheet_id], 'w') as entry:
+                view = memoryview(content)
+                for start in range(0, len(view), CHUNK_SIZE):
+                    entry.write(view[start:start + CHUNK_SIZE])
+        if failed:
+            archive.writestr('GAGAL.txt', '\n'.join(failed))
+    return failed
+
+
+class DownloadHandler(BaseHTTPRequestHandler):
+    """Melayani ``GET /download/<token>`` dari cache atau langsung dari Google, plus ``/export/``, ``/assets/`` dan ``/api/``."""
+
+    def do_GET(self):
+        if self.path.startswith('/api/'):
+            self._send_api()
+            return
+        if self.path.startswith('/assets/'):
+            self._send_asset(self.path[len('/assets/'):].split('?')[0])
+            return
+        if self.path.startswith('/export/'):
+            self._send_export(self.path[len('/export/'):].split('?')[0])
+            return
+        if self.path.startswith('/bundle/'):
+            self._send_bundle(self.path[len('/bundle/'):].split('?')[0])
+            return
+        if not self.path.startswith('/download/'):
+            self.send_error(404)
+            return
+
+        payload = verify_token(self.server.secret, self.path[len('/download/'):].split('?')[0], 'download')
+        if payload is None:
+            self.send_error(403, "Link unduhan tidak valid atau sudah kedaluwarsa")
+            return
+
+        sheet_id = payload['sheet']
+        filename = payload.get('name', f"{sheet_id}.xlsx")
+        entry = self.server.cache.peek(sheet_id)
+        if entry is not None and entry.is_fresh(self.server.cache.ttl_seconds):
+            self._send_headers(filename, entry.size)
+            view = memoryview(entry.content)
+            for start in range(0, len(view), CHUNK_SIZE):
+                self.wfile.write(view[start:start + CHUNK_SIZE])
+            return
+
+        # Worker lain di host ini mungkin sudah punya salinan segar
+        content = self.server.cache.adopt(sheet_id)
+        if content is not None:
+            self._send_headers(filename, len(content))
+            view = memoryview(content)
+            for start in range(0, len(view), CHUNK_SIZE):
+                self.wfile.write(view[start:start + CHUNK_SIZE])
+            return
+
+        self._stream_upstream(sheet_id, filename)
+
+    def _stream_upstream(self, sheet_id, filename):
+        try:
+            response = self.server.client.get(export_url(sheet_id, base_url=self.server.export_base_url), stream=True)
+        except requests.RequestException as e:
+            self.send_error(502, f"Gagal menghubungi Google: {e}")
+            return
+
+        with response:
+            if response.status_code != 200:
+                self.send_error(502, f"Gagal mengunduh file: {response.status_code}")
+                return
+
+            length = response.headers.get('Content-Length')
+            self._send_headers(filename, int(length) if length else None)
+            # Salinan untuk cache ditulis ke file sementara (di disk setelah beberapa
+            # chunk), bukan list chunk yang digabung lagi di akhir
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+                client_open = True
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if client_open:
+                        try:
+                            self.wfile.write(chunk)
+                        except (BrokenPipeError, ConnectionResetError):
+                            # Browser menutup koneksi; unduhan tetap diselesaikan untuk cache
+                            client_open = False
+                    spool.write(chunk)
+                spool.seek(0)
+                content = spool.read()
+
+        # Simpan ke cache agar tampilan/unduhan berikutnya tidak ke Google lagi
+        self.server.cache.put(sheet_id, content, response.headers)
+
+    def _send_bundle(self, token):
+        payload = verify_token(self.server.secret, token, 'bundle')
+        if payload is None:
+            self.send_error(403, "Link unduhan tidak valid atau sudah kedaluwarsa")
+            return
+
+        filenames = {sheet_id: name for sheet_id, name in payload['sheets']}
+        results = fetch_many(self.server.cache, self.server.fetch, list(filenames))
+        # Tanpa Content-Length: ZIP dialirkan sampai koneksi ditutup
+        self._send_headers(payload.get('name', 'spreadsheet.zip'), None, ZIP_MIME)
+        write_zip(self.wfile, results, filenames)
+
+    def _send_export(self, token):
+        """File hasil ekspor turunan (lihat export_jobs.py) yang sudah selesai dibuat."""
+        payload = verify_token(self.server.secret, token, 'export')
+        if payload is None:
+            self.send_error(403, "Link unduhan tidak valid atau sudah kedaluwarsa")
+            return
+        job = self.server.exports.get(payload['export']) if self.server.exports is not None else None
+        if job is None or job.state != 'done':
+            self.send_error(404, "Hasil ekspor tidak ditemukan, silakan buat ulang")
+            return
+        try:
+            file = open(job.path, 'rb')
+        except OSError:
+            self.send_error(404, "Hasil ekspor tidak ditemukan, silakan buat ulang")
+            return
+        with file:
+            self._send_headers(payload.get('name', os.path.basename(job.path)), os.fstat(file.fileno()).st_size, payload.get('mime', 'application/octet-stream'))
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                self.wfile.write(chunk)
+
+    def _send_asset(self, filename):
+        """File statis ber-hash (mis. bundle CSS tema): isinya tidak pernah berubah untuk nama yang sama."""
+        asset = self.server.assets.get(filename) if self.server.assets is not None else None
+        if asset is None:
+            self.send_error(404)
+            return
+        not_modified = self.headers.get('If-None-Match') == asset.etag
+        self.send_response(304 if not_modified else 200)
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.send_header('ETag', asset.etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return
+        body = asset.content
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = asset.gzipped
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_api(self):
+        """API data baca-saja (lihat data_api.py); jawabannya sudah lengkap dengan header."""
+        if self.server.api is None:
+            self.send_error(404)
+            return
+        status, headers, body = self.server.api.handle(self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_headers(self, filename, length, content_type=XLSX_MIME):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}")
+        self.send_header('Cache-Control', 'private, no-store')
+        if length is not None:
+            self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloadServer:
+    """Menjalankan ``ThreadingHTTPServer`` di thread latar belakang."""
+
+    def __init__(self, cache, secret, client, fetch, host='0.0.0.0', port=8502, export_base_url=None, assets=None, api=None, exports=None):
+        self.host = host
+        self.port = port
+        self.error = None
+        self.shared = False
+        self._httpd = None
+        try:
+            self._httpd = ThreadingHTTPServer((host, port), DownloadHandler)
+        except OSError as e:
+            # Port sudah dipakai, biasanya oleh worker Streamlit lain di host yang sama
+            # yang memakai secret yang sama sehingga link tetap bisa dilayani
+            self.shared = e.errno == errno.EADDRINUSE
+            self.error = str(e)
+            return
+        self._httpd.daemon_threads = True
+        self._httpd.cache = cache
+        self._httpd.client = client
+        self._httpd.fetch = fetch
+        self._httpd.secret = secret
+        self._httpd.export_base_url = export_base_url
+        self._httpd.assets = assets
+        self._httpd.api = api
+        self._httpd.exports = exports
+        threading.Thread(target=self._httpd.serve_forever, name='download-server', daemon=True).start()
+
+    @property
+    def running(self):
+        return self._httpd is not None
+
+    @property
+    def available(self):
+        return self.running or self.shared
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
@@ -0,0 +1,369 @@
+"""Cache ekspor workbook Google Sheets yang dipakai bersama oleh semua sesi."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+
+GOOGLE_BASE_URL = 'https://docs.google.com'
+
+
+def export_url(sheet_id, fmt='xlsx', base_url=None):
+    """URL ekspor Google Sheets untuk sheet ID tertentu.
+
+    ``base_url`` mengganti host Google, mis. server stub lokal saat benchmark.
+    """
+    return f"{(base_url or GOOGLE_BASE_URL).rstrip('/')}/spreadsheets/d/{sheet_id}/export?format={fmt}"
+
+
+def make_fetcher(client, base_url=None):
+    """Buat fungsi ``fetch`` untuk ``ExportCache`` yang memakai klien HTTP bersama."""
+    def fetch(sheet_id, etag=None, last_modified=None):
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = client.get(export_url(sheet_id, base_url=base_url), headers=headers)
+        return response.status_code, response.content, response.headers
+    return fetch
+
+
+def fetch_many(cache, fetch, sheet_ids, max_workers=8):
+    """Ambil beberapa sheet bersamaan; hasil di-yield sesuai urutan selesai.
+
+    Setiap item berbentuk ``(sheet_id, content, error, detik)``.
+    """
+    def timed(sheet_id):
+        started = time.perf_counter()
+        content, error = cache.get(sheet_id, fetch)
+        return sheet_id, content, error, time.perf_counter() - started
+
+    if not sheet_ids:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sheet_ids))) as executor:
+        futures = [executor.submit(timed, sheet_id) for sheet_id in sheet_ids]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class CacheEntry:
+    """Satu workbook hasil ekspor beserta metadata validasinya."""
+
+    def __init__(self, sheet_id, content, etag=None, last_modified=None, fetched_at=None):
+        self.sheet_id = sheet_id
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = hashlib.sha256(content).hexdigest()
+        self.fetched_at = fetched_at or time.time()
+        self.used_at = time.time()
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    def is_fresh(self, ttl_seconds):
+        return time.time() - self.fetched_at < ttl_seconds
+
+
+class ExportCache:
+    """LRU ber-TTL dengan batas byte dan single-flight per sheet ID.
+
+    ``fetch(sheet_id, etag, last_modified)`` harus mengembalikan tuple
+    ``(status_code, content, headers)``. Status 304 berarti salinan di cache
+    masih valid dan hanya umurnya yang diperbarui.
+
+    Dengan ``shared`` (``SharedExportStore``), salinan yang masih segar dari
+    worker lain dipakai tanpa ke Google, dan unduhan diserialkan antar proses
+    sehingga satu sheet hanya diunduh sekali per host. Listener hanya
+    dipanggil di worker yang benar-benar mengunduh.
+
+    Dengan ``spill`` (``SpillStore``), entry yang dilepas anggaran memori
+    (``release``) ditulis ke disk dan dipulihkan saat diminta lagi.
+    """
+
+    def __init__(self, ttl_seconds=300, max_bytes=64 * 1024 * 1024, shared=None, spill=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.spill = spill
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._listeners = []
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'revalidated': 0,
+            'evictions': 0,
+            'shared_waits': 0,
+            'shared_hits': 0,
+            'bytes_fetched': 0,
+            'released': 0,
+            'unspilled': 0,
+        }
+
+    def configure(self, ttl_seconds=None, max_bytes=None):
+        with self._lock:
+            if ttl_seconds is not None:
+                self.ttl_seconds = ttl_seconds
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+                self._evict_locked()
+
+    def get(self, sheet_id, fetch, force=False):
+        """Kembalikan ``(content, error)`` untuk sheet, dari cache bila masih segar.
+
+        ``force=True`` selalu memvalidasi ulang ke Google (dipakai refresh latar).
+        """
+        if self.spill is not None:
+            self._unspill(sheet_id)
+        with self._lock:
+            entry = self._entries.get(sheet_id)
+            if not force and entry is not None and entry.is_fresh(self.ttl_seconds):
+                self._entries.move_to_end(sheet_id)
+                entry.used_at = time.time()
+                self.stats['hits'] += 1
+                return entry.content, None
+
+            future = self._inflight.get(sheet_id)
+            if future is not None:
+                # Sesi lain sedang mengunduh sheet yang sama, tunggu hasilnya
+                self.stats['shared_waits'] += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[sheet_id] = future
+                self.stats['refreshes' if force else 'misses'] += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._refresh_shared(sheet_id, entry, fetch, force)
+        except Exception as e:
+            # Google lambat/mati: sajikan salinan lama jika ada
+            result = (entry.content, None) if entry is not None else (None, f"Error: {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.pop(sheet_id, None)
+        future.set_result(result)
+        return result
+
+    def add_listener(self, callback):
+        """Panggil ``callback(entry)`` setiap kali isi baru sebuah sheet diunduh."""
+        self._listeners.append(callback)
+
+    def restore(self, sheet_id, content, etag=None, last_modified=None, fetched_at=None):
+        """Isi cache dari salinan tersimpan tanpa menghitungnya sebagai unduhan.
+
+        Umur aslinya dipertahankan sehingga salinan lama divalidasi ulang
+        (``If-None-Match``) saat pertama diminta, bukan diunduh penuh.
+        """
+        entry = CacheEntry(sheet_id, content, etag=etag, last_modified=last_modified, fetched_at=fetched_at)
+        with self._lock:
+            if sheet_id not in self._entries:
+                self._store_locked(entry)
+
+    def peek(self, sheet_id):
+        """Ambil entry tanpa mengubah urutan LRU maupun statistik."""
+        with self._lock:
+            return self._entries.get(sheet_id)
+
+    def put(self, sheet_id, content, headers=None):
+        """Masukkan workbook yang diunduh di luar ``get`` (mis. saat streaming)."""
+        headers = headers or {}
+        entry = CacheEntry(
+            sheet_id,
+            content,
+            etag=headers.get('ETag'),
+            last_modified=headers.get('Last-Modified'),
+        )
+        with self._lock:
+            self.stats['bytes_fetched'] += entry.size
+            self._store_locked(entry)
+        if self.shared is not None:
+            self.shared.write(entry)
+        self._notify(entry)
+
+    def invalidate(self, sheet_id=None):
+        with self._lock:
+            if sheet_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(sheet_id, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+        if self.spill is not None:
+            self.spill.discard('export', sheet_id)
+
+    def memory_entries(self):
+        """``(sheet_id, byte, terakhir_dipakai)`` per entry, untuk anggaran memori global."""
+        with self._lock:
+            return [(entry.sheet_id, entry.size, entry.used_at) for entry in self._entries.values()]
+
+    def release(self, sheet_id):
+        """Lepas satu entry dari memori dan kembalikan jumlah byte-nya.
+
+        Isinya di-spill ke disk kecuali salinan yang sama sudah ada di tier
+        bersama, yang dipakai ``get`` dengan sendirinya.
+        """
+        with self._lock:
+            entry = self._entries.pop(sheet_id, None)
+            if entry is None:
+                return 0
+            self._bytes -= entry.size
+            self.stats['released'] += 1
+        meta = self.shared.meta(sheet_id) if self.shared is not None else None
+        if self.spill is not None and (meta is None or meta['digest'] != entry.digest):
+            self.spill.put_bytes('export', sheet_id, entry.content, {
+                'etag': entry.etag,
+                'last_modified': entry.last_modified,
+                'fetched_at': entry.fetched_at,
+            })
+        return entry.size
+
+    def _unspill(self, sheet_id):
+        with self._lock:
+            if sheet_id in self._entries or sheet_id in self._inflight:
+                return
+        saved = self.spill.take_bytes('export', sheet_id)
+        if saved is None:
+            return
+        content, meta = saved
+        # Umur asli dipertahankan: salinan kedaluwarsa divalidasi ulang, bukan diunduh penuh
+        self.restore(sheet_id, content, etag=meta.get('etag'), last_modified=meta.get('last_modified'), fetched_at=meta.get('fetched_at'))
+        with self._lock:
+            self.stats['unspilled'] += 1
+
+    def info(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                **self.stats,
+            }
+
+    def adopt(self, sheet_id, max_age=None):
+        """Pakai salinan worker lain yang umurnya di bawah ``max_age`` detik; ``None`` jika tidak ada."""
+        if self.shared is None:
+            return None
+        meta = self.shared.meta(sheet_id)
+        max_age = self.ttl_seconds if max_age is None else max_age
+        if meta is None or time.time() - meta['fetched_at'] >= max_age:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(sheet_id)
+            if entry is not None and entry.digest == meta['digest']:
+                # Isi sama, cukup ikuti umur dan validator dari worker yang mengunduh
+                entry.fetched_at = max(entry.fetched_at, meta['fetched_at'])
+                entry.etag, entry.last_modified = meta['etag'], meta['last_modified']
+                entry.used_at = time.time()
+                self.stats['shared_hits'] += 1
+                return entry.content
+
+        content = self.shared.read(sheet_id, meta)
+        if content is None:
+            return None
+        entry = CacheEntry(sheet_id, content, etag=meta['etag'], last_modified=meta['last_modified'], fetched_at=meta['fetched_at'])
+        with self._lock:
+            self._store_locked(entry)
+            self.stats['shared_hits'] += 1
+        return content
+
+    def _refresh_shared(self, sheet_id, entry, fetch, force=False):
+        if self.shared is None:
+            return self._refresh(sheet_id, entry, fetch)
+
+        # Refresh latar cukup memakai hasil worker lain dari paruh TTL terakhir
+        max_age = self.ttl_seconds / 2 if force else self.ttl_seconds
+        content = self.adopt(sheet_id, max_age)
+        if content is not None:
+            return content, None
+
+        with self.shared.lock(sheet_id):
+            # Selagi menunggu kunci, worker lain mungkin sudah selesai mengunduh
+            content = self.adopt(sheet_id, max_age)
+            if content is not None:
+                return content, None
+            entry = self.peek(sheet_id)
+            meta = self.shared.meta(sheet_id)
+            if entry is None and meta is not None:
+                # Salinan kedaluwarsa dari worker lain tetap berguna untuk If-None-Match
+                content = self.shared.read(sheet_id, meta)
+                if content is not None:
+                    self.restore(sheet_id, content, etag=meta['etag'], last_modified=meta['last_modified'], fetched_at=meta['fetched_at'])
+                    entry = self.peek(sheet_id)
+            started = time.time()
+            result = self._refresh(sheet_id, entry, fetch)
+            entry = self.peek(sheet_id)
+            # Salinan lama yang disajikan karena Google gagal tidak dibagikan
+            if entry is not None and entry.content is result[0] and entry.fetched_at >= started:
+                meta = self.shared.meta(sheet_id)
+                if meta is not None and meta['digest'] == entry.digest:
+                    self.shared.touch(sheet_id, entry.fetched_at)
+                else:
+                    self.shared.write(entry)
+            return result
+
+    def _refresh(self, sheet_id, entry, fetch):
+        etag = entry.etag if entry else None
+        last_modified = entry.last_modified if entry else None
+        status, content, headers = fetch(sheet_id, etag, last_modified)
+
+        if status == 304 and entry is not None:
+            with self._lock:
+                entry.fetched_at = time.time()
+                if sheet_id in self._entries:
+                    self._entries.move_to_end(sheet_id)
+                self.stats['revalidated'] += 1
+            return entry.content, None
+
+        if status != 200:
+            if entry is not None:
+                # Lebih baik menyajikan salinan lama daripada gagal total
+                return entry.content, None
+            return None, f"Gagal mengunduh file: {status}"
+
+        new_entry = CacheEntry(
+            sheet_id,
+            content,
+            etag=headers.get('ETag'),
+            last_modified=headers.get('Last-Modified'),
+        )
+        with self._lock:
+            self.stats['bytes_fetched'] += new_entry.size
+            self._store_locked(new_entry)
+        self._notify(new_entry)
+        return new_entry.content, None
+
+    def _notify(self, entry):
+        for callback in self._listeners:
+            try:
+                callback(entry)
+            except Exception:
+                pass
+
+    def _store_locked(self, entry):
+        old = self._entries.pop(entry.sheet_id, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size <= self.max_bytes:
+            self._entries[entry.sheet_id] = entry
+            self._bytes += entry.size
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.stats['evictions'] += 1
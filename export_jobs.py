@@ -0,0 +1,390 @@
+"""Ekspor turunan (CSV, Parquet, xlsx per bidang, rekap cetak) yang dibuat di process pool.
+
+Pekerjaan berat (serialisasi, openpyxl) berjalan di proses terpisah sehingga
+thread script Streamlit dan sesi lain tidak ikut tertahan. Hasil disimpan di
+disk dengan kunci ``(sheet, versi sumber, format, parameter)``: permintaan
+yang sama untuk data yang sama langsung dijawab dari file yang sudah ada.
+"""
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from config_store import atomic_write
+
+FORMATS = {
+    'csv': {'label': "CSV", 'ext': '.csv', 'mime': 'text/csv'},
+    'parquet': {'label': "Parquet", 'ext': '.parquet', 'mime': 'application/vnd.apache.parquet'},
+    'xlsx_bidang': {'label': "Excel per bidang", 'ext': '.xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'recap': {'label': "Rekap cetak (HTML)", 'ext': '.html', 'mime': 'text/html'},
+}
+GROUP_CANDIDATES = ['sub bidang', 'bidang', 'subbidang']
+CHUNK_ROWS = 20000
+
+
+# --- dijalankan di proses worker ---
+
+class Progress:
+    """Tulis ``"selesai total"`` ke file kecil yang dibaca proses Streamlit, paling sering 5x per detik."""
+
+    def __init__(self, path, total):
+        self.path = path
+        self.total = max(1, total)
+        self.done = 0
+        self._written = 0.0
+
+    def step(self, count=1):
+        self.done += count
+        if time.time() - self._written >= 0.2 or self.done >= self.total:
+            self._written = time.time()
+            try:
+                with open(self.path, 'w') as file:
+                    file.write(f"{min(self.done, self.total)} {self.total}")
+            except OSError:
+                pass
+
+
+def filtered(frame, params):
+    from sheet_data import filter_frame
+    return filter_frame(frame, params.get('filter_column'), params.get('filter_query'))
+
+
+def group_column(frame, params):
+    if params.get('group') in frame.columns:
+        return params['group']
+    from analytics import find_column
+    return find_column(frame, GROUP_CANDIDATES)
+
+
+def python_rows(frame):
+    """Baris sebagai list nilai Python biasa (NaN/NA -> None) untuk openpyxl."""
+    values = frame.astype(object).where(frame.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield [value.item() if hasattr(value, 'item') else value for value in row]
+
+
+def sheet_title(value, used):
+    title = re.sub(r'[\[\]:*?/\\]', ' ', str(value) if value is not None else "(kosong)").strip()[:31] or "(kosong)"
+    base, number = title, 2
+    while title.lower() in used:
+        suffix = f" ({number})"
+        title = base[:31 - len(suffix)] + suffix
+        number += 1
+    used.add(title.lower())
+    return title
+
+
+def write_csv(frame, path, progress):
+    # utf-8-sig agar Excel membaca huruf non-ASCII dengan benar
+    with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+        for start in range(0, max(1, len(frame)), CHUNK_ROWS):
+            frame.iloc[start:start + CHUNK_ROWS].to_csv(file, header=start == 0, index=False)
+            progress.step(min(CHUNK_ROWS, len(frame) - start))
+
+
+def write_parquet(frame, path, progress):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pq.ParquetWriter(path, table.schema, compression='zstd') as writer:
+        for start in range(0, max(1, table.num_rows), CHUNK_ROWS):
+            writer.write_table(table.slice(start, CHUNK_ROWS))
+            progress.step(min(CHUNK_ROWS, table.num_rows - start))
+
+
+def write_xlsx_bidang(frame, path, progress, column):
+    import openpyxl
+    # Mode write-only: baris langsung dialirkan ke file, tidak ditahan di memori
+    workbook = openpyxl.Workbook(write_only=True)
+    groups = frame.groupby(column, sort=True, dropna=False, observed=True) if column else [("Data", frame)]
+    used = set()
+    for value, group in groups:
+        sheet = workbook.create_sheet(sheet_title(None if pd.isna(value) else value, used))
+        sheet.append([str(name) for name in group.columns])
+        for number, row in enumerate(python_rows(group), 1):
+            sheet.append(row)
+            if number % 500 == 0:
+                progress.step(500)
+        progress.step(len(group) % 500)
+    if not used:
+        workbook.create_sheet("Data").append([str(name) for name in frame.columns])
+    workbook.save(path)
+
+
+def recap_html(frame, column, meta):
+    from analytics import DEFAULT_COLUMNS, find_column, to_number
+    amounts = {
+        label: to_number(frame[found])
+        for label, key in (("Pagu", 'pagu'), ("Realisasi", 'realisasi'))
+        for found in [find_column(frame, DEFAULT_COLUMNS[key], numeric=True)] if found is not None
+    }
+    status_column = find_column(frame, DEFAULT_COLUMNS['status'])
+    keys = frame[column].astype('string').fillna("(kosong)") if column else pd.Series("Semua", index=frame.index)
+    summary = pd.DataFrame({'Jumlah baris': keys.groupby(keys, sort=True).size()})
+    for label, values in amounts.items():
+        summary[label] = values.groupby(keys, sort=True).sum()
+    if 'Pagu' in summary and 'Realisasi' in summary:
+        summary['Serapan'] = (summary['Realisasi'] / summary['Pagu'].where(summary['Pagu'] != 0)).map(lambda value: f"{value:.1%}" if pd.notna(value) else "-")
+    total = {'Jumlah baris': int(summary['Jumlah baris'].sum()), **{label: summary[label].sum() for label in amounts}}
+
+    def money(value):
+        return f"Rp {value:,.0f}".replace(',', '.') if pd.notna(value) else "-"
+
+    def table(data, index_label):
+        head = ''.join(f"<th>{html.escape(str(name))}</th>" for name in [index_label, *data.columns])
+        rows = ''.join(
+            "<tr>" + f"<td>{html.escape(str(index))}</td>" + ''.join(
+                f"<td class=\"num\">{money(value) if name in amounts else html.escape(str(value))}</td>" for name, value in row.items()
+            ) + "</tr>"
+            for index, row in data.iterrows()
+        )
+        return f"<table><thead><tr>{head}</tr></thead><tbody>{rows}</tbody></table>"
+
+    sections = [f"<h2>Per {html.escape(str(column)) if column else 'sheet'}</h2>", table(summary, str(column or "Grup"))]
+    if status_column is not None:
+        statuses = pd.crosstab(keys, frame[status_column].astype('string').fillna("(kosong)"))
+        sections += [f"<h2>Per {html.escape(str(status_column))}</h2>", table(statuses, str(column or "Grup"))]
+    totals = ''.join(f"<li>{html.escape(label)}: <b>{money(value) if label in amounts else value}</b></li>" for label, value in total.items())
+    filter_text = f"{meta['filter_column']} berisi \"{meta['filter_query']}\"" if meta.get('filter_column') and meta.get('filter_query') else "tanpa filter"
+    return f"""<!DOCTYPE html>
+<html lang="id"><head><meta charset="utf-8"><title>{html.escape(meta['title'])}</title>
+<style>
+  body {{ font-family: Arial, sans-serif; margin: 24px; color: #222; }}
+  h1 {{ font-size: 20px; margin-bottom: 4px; }}
+  h2 {{ font-size: 16px; margin-top: 24px; }}
+  .meta {{ color: #666; font-size: 12px; }}
+  table {{ border-collapse: collapse; width: 100%; font-size: 12px; }}
+  th, td {{ border: 1px solid #bbb; padding: 4px 6px; text-align: left; }}
+  th {{ background: #eef3fb; }}
+  td.num {{ text-align: right; }}
+  @media print {{ body {{ margin: 0; }} .noprint {{ display: none; }} tr {{ page-break-inside: avoid; }} }}
+</style></head><body>
+<p class="noprint"><button onclick="window.print()">Cetak / simpan sebagai PDF</button></p>
+<h1>{html.escape(meta['title'])}</h1>
+<p class="meta">Tab {html.escape(meta['tab'])} · {html.escape(filter_text)} · dibuat {datetime.now().strftime('%d-%m-%Y %H:%M')}</p>
+<ul>{totals}</ul>
+{''.join(sections)}
+</body></html>
+"""
+
+
+def run_export(fmt, frame, params, path, progress_path):
+    """Buat satu artefak di ``path`` (ditulis ke file sementara lalu di-rename); kembalikan ukurannya."""
+    frame = filtered(frame, params)
+    column = group_column(frame, params) if fmt in ('xlsx_bidang', 'recap') else None
+    progress = Progress(progress_path, len(frame))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if fmt == 'csv':
+            write_csv(frame, tmp_path, progress)
+        elif fmt == 'parquet':
+            write_parquet(frame, tmp_path, progress)
+        elif fmt == 'xlsx_bidang':
+            write_xlsx_bidang(frame, tmp_path, progress, column)
+        elif fmt == 'recap':
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(recap_html(frame, column, params))
+            progress.step(len(frame))
+        else:
+            raise ValueError(f"Format tidak dikenal: {fmt}")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {'rows': len(frame), 'group': column, 'size': os.path.getsize(path)}
+
+
+# --- dijalankan di proses Streamlit ---
+
+class ExportJob:
+    def __init__(self, key, fmt, filename, path, progress_path):
+        self.key = key
+        self.fmt = fmt
+        self.filename = filename
+        self.path = path
+        self.progress_path = progress_path
+        self.state = 'queued'
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.used_at = self.created_at
+
+    @property
+    def done(self):
+        return self.state in ('done', 'failed')
+
+    def progress(self):
+        """Perkiraan 0..1 dari file progres worker."""
+        if self.state == 'done':
+            return 1.0
+        try:
+            with open(self.progress_path, 'r') as file:
+                done, total = (int(part) for part in file.read().split())
+            return min(1.0, done / max(1, total))
+        except (OSError, ValueError):
+            return 0.0
+
+
+class ExportService:
+    """Antrian ekspor di atas ``ProcessPoolExecutor`` dengan cache hasil di ``root``.
+
+    ``submit()`` mengembalikan job yang sudah ada bila kuncinya sama: yang
+    selesai langsung dipakai ulang (juga setelah restart, lewat file meta di
+    disk), yang sedang berjalan ditunggu bersama. Hasil tertua dibuang saat
+    jumlah atau total ukurannya melewati batas.
+    """
+
+    def __init__(self, root='exports', workers=2, max_results=100, max_bytes=1024 * 1024 * 1024):
+        self.root = root
+        self.workers = workers
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {'submitted': 0, 'cache_hits': 0, 'joined': 0, 'completed': 0, 'failed': 0}
+        os.makedirs(root, exist_ok=True)
+        self._load_results()
+
+    def _load_results(self):
+        """Hasil yang sudah ada di disk (dari proses sebelumnya) langsung bisa dipakai ulang."""
+        from memory_budget import pid_alive
+        for name in os.listdir(self.root):
+            if name.endswith(('.progress', '.tmp')):
+                # Sisa job yang terputus saat prosesnya berhenti; file milik proses
+                # lain yang masih hidup (worker lain di direktori yang sama) dibiarkan
+                pid = name.rsplit('.', 2)[-2]
+                if pid.isdigit() and (int(pid) == os.getpid() or not pid_alive(int(pid))):
+                    try:
+                        os.remove(os.path.join(self.root, name))
+                    except OSError:
+                        pass
+                continue
+            if name.endswith('.json'):
+                job = self._load_result(name[:-len('.json')])
+                if job is not None:
+                    self._jobs[job.key] = job
+
+    def _load_result(self, key):
+        """Job selesai dari file meta ``<key>.json`` (mis. dibuat proses lain), atau ``None``."""
+        try:
+            with open(os.path.join(self.root, f"{key}.json"), 'r') as file:
+                meta = json.load(file)
+            job = ExportJob(key, meta['fmt'], meta['filename'], *self._paths(key, meta['fmt']))
+        except (OSError, ValueError, KeyError):
+            return None
+        if not os.path.exists(job.path):
+            return None
+        job.state, job.result = 'done', meta
+        job.finished_at = job.used_at = meta.get('finished_at', job.created_at)
+        return job
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: worker tidak mewarisi thread dan socket server Streamlit
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    @staticmethod
+    def job_key(source_id, version, fmt, params):
+        raw = json.dumps([source_id, str(version), fmt, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:24]
+
+    def _paths(self, key, fmt):
+        return os.path.join(self.root, key + FORMATS[fmt]['ext']), os.path.join(self.root, f"{key}.{os.getpid()}.progress")
+
+    def submit(self, source_id, version, fmt, params, load_frame, filename):
+        """Job untuk ``(source_id, version, fmt, params)``; ``load_frame()`` hanya dipanggil bila perlu dibuat."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Format tidak dikenal: {fmt}")
+        key = self.job_key(source_id, version, fmt, params)
+        path, progress_path = self._paths(key, fmt)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.state != 'failed' and (not job.done or os.path.exists(job.path)):
+                job.used_at = time.time()
+                self.stats['cache_hits' if job.done else 'joined'] += 1
+                return job
+            job = ExportJob(key, fmt, filename, path, progress_path)
+            self._jobs[key] = job
+            self.stats['submitted'] += 1
+
+        try:
+            future = self._pool().submit(run_export, fmt, load_frame(), params, path, progress_path)
+        except Exception as e:
+            self._finish(job, error=str(e))
+            return job
+        job.state = 'running'
+        future.add_done_callback(lambda future: self._finish(job, future=future))
+        return job
+
+    def _finish(self, job, future=None, error=None):
+        if future is not None:
+            try:
+                job.result = future.result()
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        job.finished_at = time.time()
+        try:
+            os.remove(job.progress_path)
+        except OSError:
+            pass
+        if error is not None:
+            job.error, job.state = error, 'failed'
+            with self._lock:
+                self.stats['failed'] += 1
+            return
+        # Worker lain membaca file meta ini (get/_load_result), jadi ditulis atomik
+        atomic_write(os.path.join(self.root, f"{job.key}.json"), json.dumps(dict(job.result, finished_at=job.finished_at, filename=job.filename, fmt=job.fmt)))
+        job.state = 'done'
+        with self._lock:
+            self.stats['completed'] += 1
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.state == 'done'), key=lambda job: job.used_at)
+            total = sum((job.result or {}).get('size', 0) for job in finished)
+            while finished and (len(finished) > self.max_results or total > self.max_bytes):
+                job = finished.pop(0)
+                total -= (job.result or {}).get('size', 0)
+                del self._jobs[job.key]
+                for path in (job.path, os.path.join(self.root, f"{job.key}.json")):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def get(self, key):
+        """Job ``key``; hasil yang dibuat proses lain dibaca dari disk."""
+        if not re.fullmatch(r'[0-9a-f]+', key or ''):
+            return None
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                job.used_at = time.time()
+                return job
+        job = self._load_result(key)
+        if job is None:
+            return None
+        with self._lock:
+            return self._jobs.setdefault(key, job)
+
+    def info(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            return {
+                'workers': self.workers,
+                'running': states.count('running') + states.count('queued'),
+                'results': states.count('done'),
+                **self.stats,
+            }
@@ -0,0 +1,176 @@
+"""Klien HTTP bersama: koneksi keep-alive, timeout, retry dengan backoff, dan circuit breaker."""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Host sedang dianggap mati; permintaan ditolak tanpa menyentuh jaringan."""
+
+
+class CircuitBreaker:
+    """Breaker per host: terbuka setelah ``threshold`` kegagalan beruntun,
+    lalu mengizinkan satu percobaan (half-open) setelah ``reset_seconds``."""
+
+    def __init__(self, threshold=5, reset_seconds=30):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release(self):
+        """Akhiri percobaan half-open tanpa hasil (galat di luar jaringan)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.time()
+
+
+def default_transport(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class HttpClient:
+    """Pembungkus ``transport.request()`` dengan batas waktu dan retry.
+
+    ``transport`` adalah objek apa pun dengan method ``request(method, url,
+    **kwargs)`` yang mengembalikan response bergaya ``requests``; defaultnya
+    ``requests.Session`` dengan connection pool, dan bisa diganti untuk
+    pengujian terhadap server stub lokal.
+    """
+
+    def __init__(self, transport=None, connect_timeout=5, read_timeout=30, retries=3,
+                 backoff_seconds=0.5, max_backoff_seconds=8, pool_size=10,
+                 breaker_threshold=5, breaker_reset_seconds=30):
+        self.transport = transport if transport is not None else default_transport(pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset_seconds)
+            return self._breakers[host]
+
+    def breaker_states(self):
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        breaker = self.breaker(urlsplit(url).netloc)
+
+        for attempt in range(self.retries + 1):
+            if not breaker.allow():
+                self._count('rejected')
+                raise CircuitOpenError(f"Koneksi ke {urlsplit(url).netloc} sementara dihentikan setelah gagal berulang")
+
+            self._count('requests')
+            try:
+                response = self.transport.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                if attempt >= self.retries:
+                    self._count('failures')
+                    raise
+                self._sleep(attempt)
+                continue
+            except requests.RequestException:
+                # Galat lain (ChunkedEncodingError, TooManyRedirects, ...) tidak diulang
+                # tetapi tetap dihitung agar percobaan half-open selalu selesai
+                breaker.record_failure()
+                self._count('failures')
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+
+            breaker.record_failure()
+            if attempt >= self.retries:
+                self._count('failures')
+                return response
+            retry_after = self._retry_after(response)
+            response.close()
+            self._sleep(attempt, retry_after)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _sleep(self, attempt, retry_after=None):
+        self._count('retries')
+        # Full jitter: acak antara 0 dan batas eksponensial
+        delay = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt)))
+        if retry_after is not None:
+            delay = min(self.max_backoff_seconds, max(delay, retry_after))
+        time.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,69 @@
+"""Penyimpanan logo aplikasi sebagai file statis yang sudah diperkecil."""
+import base64
+import hashlib
+import io
+import os
+
+STATIC_DIR = 'static'
+# Lebar logo yang benar-benar dipakai UI: preview admin dan halaman login/sidebar
+LOGO_SIZES = (150, 120)
+
+
+def save_logo(data, static_dir=STATIC_DIR):
+    """Perkecil gambar ke ``LOGO_SIZES`` dan kembalikan referensi untuk config."""
+    # Pillow hanya dibutuhkan saat admin mengunggah logo
+    from PIL import Image
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    image = Image.open(io.BytesIO(data))
+    has_alpha = image.mode in ('RGBA', 'LA', 'P')
+    ext = 'png' if has_alpha else 'jpg'
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    os.makedirs(static_dir, exist_ok=True)
+    ref = f"logo-{digest}.{ext}"
+    for size in LOGO_SIZES:
+        path = logo_path(ref, size, static_dir)
+        if os.path.exists(path):
+            continue
+        resized = image.copy()
+        resized.thumbnail((size, size * 4), Image.LANCZOS)
+        tmp_path = f"{path}.tmp"
+        if has_alpha:
+            resized.save(tmp_path, format='PNG', optimize=True)
+        else:
+            resized.save(tmp_path, format='JPEG', quality=90, optimize=True)
+        os.replace(tmp_path, path)
+    return ref
+
+
+def save_data_uri(data_uri, static_dir=STATIC_DIR):
+    """Ubah logo lama berbentuk ``data:`` URI menjadi file statis."""
+    header, encoded = data_uri.split(',', 1)
+    if 'svg' in header:
+        # SVG sudah vektor dan tidak bisa diproses Pillow, biarkan apa adanya
+        return data_uri
+    return save_logo(base64.b64decode(encoded), static_dir)
+
+
+def logo_path(ref, size, static_dir=STATIC_DIR):
+    name, ext = os.path.splitext(ref)
+    return os.path.join(static_dir, f"{name}-{size}{ext}")
+
+
+def logo_url(ref, size):
+    """URL logo untuk tag ``<img>``; ``v`` membuat Streamlit mengirim cache header panjang."""
+    if ref.startswith('data:'):
+        return ref
+    name, ext = os.path.splitext(ref)
+    digest = name.split('-', 1)[-1]
+    return f"app/static/{name}-{size}{ext}?v={digest}"
+
+
+def remove_logo(ref, static_dir=STATIC_DIR):
+    if not ref or ref.startswith('data:'):
+        return
+    for size in LOGO_SIZES:
+        path = logo_path(ref, size, static_dir)
+        if os.path.exists(path):
+            os.remove(path)
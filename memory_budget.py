@@ -0,0 +1,363 @@
+"""Anggaran memori global: byte per cache dan per sesi, eviksi lintas cache, dan spill ke disk."""
+import ctypes
+import gc
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from sheet_data import SheetLayout, frame_layout, set_layout
+from snapshot_store import atomic_write_bytes, tab_key, write_frame
+from config_store import atomic_write
+
+
+def deep_size(value, seen=None, depth=0):
+    """Perkiraan byte yang dipegang ``value`` (DataFrame, bytes, array, dict/list bertingkat)."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if hasattr(value, 'nbytes') and not isinstance(value, type):
+        # numpy array dan tabel/array pyarrow
+        try:
+            return int(value.nbytes)
+        except (TypeError, ValueError):
+            pass
+    size = sys.getsizeof(value)
+    if depth >= 6:
+        return size
+    if isinstance(value, dict):
+        size += sum(deep_size(key, seen, depth + 1) + deep_size(item, seen, depth + 1) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen, depth + 1) for item in value)
+    return size
+
+
+def process_rss():
+    """RSS proses ini dalam byte, ``None`` jika tidak bisa dibaca (mis. di Windows)."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # Hanya puncak RSS yang tersedia di luar Linux; macOS melaporkan byte, Linux KB
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill di Windows menghentikan proses, bukan sekadar mengecek
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        # Proses ada tapi milik pengguna lain, atau platform tanpa sinyal 0
+        return True
+    return True
+
+
+def release_to_os():
+    """Kembalikan halaman heap yang sudah kosong ke OS (glibc), agar RSS ikut turun setelah eviksi."""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class SpillStore:
+    """Tier disk untuk entri cache yang dilepas dari memori: ``<root>/<jenis>/<kunci>/``.
+
+    Entri diambil sekali (``take_*``) lalu dihapus dari disk karena isinya
+    kembali ke cache memori. Daftar kunci disimpan di memori sehingga cek
+    "ada di spill?" pada setiap cache miss tidak menyentuh disk.
+    """
+
+    def __init__(self, root='spill', max_bytes=1024 * 1024 * 1024):
+        # Satu subfolder per proses: spill hanya berlaku selama proses yang menulisnya hidup
+        self.root = os.path.join(root, str(os.getpid()))
+        self.max_bytes = max_bytes
+        self._index = {}
+        self._lock = threading.Lock()
+        self.stats = {'spilled': 0, 'restored': 0, 'dropped': 0}
+        os.makedirs(root, exist_ok=True)
+        for name in os.listdir(root):
+            if name.isdigit() and (int(name) == os.getpid() or not pid_alive(int(name))):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, kind, key, *parts):
+        return os.path.join(self.root, kind, tab_key(str(key)), *parts)
+
+    def _add(self, kind, key, nbytes):
+        with self._lock:
+            self._index[(kind, key)] = (nbytes, time.time())
+            self.stats['spilled'] += 1
+        # Entri spill tertua dibuang bila tier disk melewati batasnya
+        while True:
+            with self._lock:
+                if len(self._index) <= 1 or sum(size for size, _ in self._index.values()) <= self.max_bytes:
+                    return
+                oldest = min(self._index, key=lambda item: self._index[item][1])
+                self.stats['dropped'] += 1
+            self.discard(*oldest)
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._index
+
+    def put_bytes(self, kind, key, content, meta=None):
+        os.makedirs(self._dir(kind, key), exist_ok=True)
+        atomic_write_bytes(self._dir(kind, key, 'content.bin'), content)
+        atomic_write(self._dir(kind, key, 'meta.json'), json.dumps(meta or {}))
+        self._add(kind, key, len(content))
+
+    def take_bytes(self, kind, key):
+        """``(content, meta)`` yang di-spill, atau ``None``; entri dihapus dari disk."""
+        if (kind, key) not in self:
+            return None
+        try:
+            with open(self._dir(kind, key, 'content.bin'), 'rb') as file:
+                content = file.read()
+            with open(self._dir(kind, key, 'meta.json'), 'r') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            self.discard(kind, key)
+            return None
+        self.discard(kind, key)
+        with self._lock:
+            self.stats['restored'] += 1
+        return content, meta
+
+    def put_frames(self, kind, key, version, frames):
+        """Simpan ``{tab: DataFrame}`` sebagai parquet; layout sel asli (untuk edit) ikut disimpan."""
+        os.makedirs(self._dir(kind, key), exist_ok=True)
+        tabs, layouts, nbytes = {}, {}, 0
+        for name, frame in frames.items():
+            tabs[name] = tab_key(name)
+            path = self._dir(kind, key, f"{tabs[name]}.parquet")
+            write_frame(frame, path)
+            nbytes += os.path.getsize(path)
+            layout = frame_layout(frame)
+            if layout is not None:
+                layouts[name] = {'rows': [int(row) for row in layout.rows], 'columns': layout.columns}
+        atomic_write(self._dir(kind, key, 'meta.json'), json.dumps({'version': version, 'tabs': tabs, 'layouts': layouts}))
+        self._add(kind, key, nbytes)
+
+    def take_frames(self, kind, key, version):
+        """``{tab: DataFrame}`` untuk ``version``, atau ``None`` jika tidak ada/versinya lain."""
+        if (kind, key) not in self:
+            return None
+        try:
+            with open(self._dir(kind, key, 'meta.json'), 'r') as file:
+                meta = json.load(file)
+            if meta['version'] != version:
+                self.discard(kind, key)
+                return None
+            frames = {name: pd.read_parquet(self._dir(kind, key, f"{tab}.parquet")) for name, tab in meta['tabs'].items()}
+        except (OSError, ValueError, KeyError):
+            self.discard(kind, key)
+            return None
+        for name, layout in meta.get('layouts', {}).items():
+            set_layout(frames[name], SheetLayout(layout['rows'], layout['columns']))
+        self.discard(kind, key)
+        with self._lock:
+            self.stats['restored'] += 1
+        return frames
+
+    def discard(self, kind, key=None):
+        """Hapus satu entri, atau semua entri satu jenis bila ``key`` None."""
+        with self._lock:
+            keys = [item for item in self._index if item[0] == kind and (key is None or item[1] == key)]
+            for item in keys:
+                del self._index[item]
+        for item in keys:
+            shutil.rmtree(self._dir(*item), ignore_errors=True)
+
+    def info(self):
+        with self._lock:
+            return {'entries': len(self._index), 'bytes': sum(size for size, _ in self._index.values()), 'max_bytes': self.max_bytes, **self.stats}
+
+
+class MemoryBudget:
+    """Satu anggaran byte untuk semua cache dan sesi dalam proses ini.
+
+    Setiap sumber yang didaftarkan (``register``) menyediakan
+    ``memory_entries() -> [(kunci, byte, terakhir_dipakai)]`` dan
+    ``release(kunci) -> byte_dilepas``; cache yang punya ``SpillStore``
+    menulis entri yang dilepas ke disk. ``enforce()`` (dijalankan berkala oleh
+    thread latar) lebih dulu membuang data besar milik sesi yang lama tidak
+    aktif, lalu bila total masih di atas anggaran melepas entri dengan skor
+    ``byte x lama_tidak_dipakai`` tertinggi sampai total turun ke
+    ``target_ratio`` dari anggaran. Entri besar yang dingin keluar lebih
+    dulu; entri kecil yang sering dipakai bertahan.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, target_ratio=0.85, idle_session_seconds=1800,
+                 interval_seconds=10.0, max_rss_bytes=None):
+        self.max_bytes = max_bytes
+        self.target_ratio = target_ratio
+        self.idle_session_seconds = idle_session_seconds
+        self.interval_seconds = interval_seconds
+        self.max_rss_bytes = max_rss_bytes
+        self._sources = {}
+        self._sessions = {}
+        self._measure_session = None
+        self._drop_session = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._enforce_lock = threading.Lock()
+        self.last = None
+        self.stats = {'runs': 0, 'evictions': 0, 'evicted_bytes': 0, 'sessions_dropped': 0, 'session_bytes_dropped': 0}
+
+    def register(self, name, source):
+        with self._lock:
+            self._sources[name] = source
+
+    def attach_sessions(self, measure, drop):
+        """``measure(session_id) -> byte`` (``None`` bila sesi sudah tutup) dan ``drop(session_id) -> byte_dilepas``."""
+        self._measure_session = measure
+        self._drop_session = drop
+
+    def touch_session(self, session_id):
+        """Catat bahwa sesi baru saja aktif (dipanggil setiap eksekusi script)."""
+        if session_id is None:
+            return
+        with self._lock:
+            session = self._sessions.setdefault(session_id, {'bytes': 0, 'seen': 0.0, 'dropped': False})
+            session['seen'] = time.time()
+            session['dropped'] = False
+
+    def _entries(self):
+        with self._lock:
+            sources = list(self._sources.items())
+        return {name: source.memory_entries() for name, source in sources}
+
+    def _measure_sessions(self):
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            nbytes = self._measure_session(session_id) if self._measure_session else 0
+            with self._lock:
+                if nbytes is None:
+                    self._sessions.pop(session_id, None)
+                elif session_id in self._sessions:
+                    self._sessions[session_id]['bytes'] = nbytes
+
+    def usage(self):
+        """``{'caches': {nama: {entries, bytes}}, 'sessions': {id: {...}}, 'total': byte}`` tanpa mengukur ulang sesi."""
+        caches = {name: {'entries': len(entries), 'bytes': sum(entry[1] for entry in entries)} for name, entries in self._entries().items()}
+        with self._lock:
+            sessions = {session_id: dict(session) for session_id, session in self._sessions.items()}
+        total = sum(cache['bytes'] for cache in caches.values()) + sum(session['bytes'] for session in sessions.values())
+        return {'caches': caches, 'sessions': sessions, 'total': total}
+
+    def enforce(self):
+        """Satu putaran penegakan anggaran; mengembalikan ringkasan yang juga disimpan di ``last``."""
+        with self._enforce_lock:
+            started = time.time()
+            self._measure_sessions()
+
+            dropped = 0
+            with self._lock:
+                idle = [
+                    session_id for session_id, session in self._sessions.items()
+                    if not session['dropped'] and session['bytes'] and started - session['seen'] > self.idle_session_seconds
+                ]
+            for session_id in idle:
+                freed = self._drop_session(session_id) if self._drop_session else 0
+                dropped += freed
+                with self._lock:
+                    if session_id in self._sessions:
+                        self._sessions[session_id]['dropped'] = True
+                        self._sessions[session_id]['bytes'] = max(0, self._sessions[session_id]['bytes'] - freed)
+                    self.stats['sessions_dropped'] += 1
+                    self.stats['session_bytes_dropped'] += freed
+
+            entries = self._entries()
+            with self._lock:
+                session_bytes = sum(session['bytes'] for session in self._sessions.values())
+            total = sum(entry[1] for items in entries.values() for entry in items) + session_bytes
+            target = total
+            if total > self.max_bytes:
+                target = int(self.max_bytes * self.target_ratio)
+            rss = process_rss()
+            if self.max_rss_bytes and rss is not None and rss > self.max_rss_bytes:
+                # Memori di luar yang terhitung (interpreter, library) ikut menekan plafon RSS
+                target = min(target, total - (rss - int(self.max_rss_bytes * self.target_ratio)))
+
+            evicted = evicted_bytes = 0
+            if target < total:
+                candidates = sorted(
+                    ((nbytes * max(1.0, started - used_at), name, key, nbytes) for name, items in entries.items() for key, nbytes, used_at in items),
+                    key=lambda candidate: candidate[0],
+                    reverse=True
+                )
+                for _, name, key, nbytes in candidates:
+                    if total <= target:
+                        break
+                    freed = self._sources[name].release(key)
+                    total -= freed
+                    evicted += 1 if freed else 0
+                    evicted_bytes += freed
+            if evicted or dropped:
+                release_to_os()
+
+            with self._lock:
+                self.stats['runs'] += 1
+                self.stats['evictions'] += evicted
+                self.stats['evicted_bytes'] += evicted_bytes
+                self.last = {
+                    'at': started,
+                    'seconds': time.time() - started,
+                    'total': total,
+                    'evicted': evicted,
+                    'evicted_bytes': evicted_bytes,
+                    'session_bytes_dropped': dropped,
+                    'rss': process_rss(),
+                }
+                return dict(self.last)
+
+    def start(self):
+        """Jalankan ``enforce()`` setiap ``interval_seconds`` di thread latar (sekali per proses)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='memory-budget', daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                self.enforce()
+            except Exception:
+                pass
+
+    def info(self):
+        with self._lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'max_rss_bytes': self.max_rss_bytes,
+                'sources': list(self._sources),
+                'sessions': len(self._sessions),
+                'last': dict(self.last) if self.last else None,
+                **self.stats,
+            }
@@ -0,0 +1,208 @@
+"""Pengukuran waktu per tahap (span) dengan ring buffer, ekspor JSON lines dan Prometheus."""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from config_store import atomic_write
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Metrics:
+    """Ring buffer berukuran tetap untuk span dan ukuran payload.
+
+    Mencatat span hanya berupa ``deque.append`` di bawah kunci; persentil
+    dihitung saat panel admin dibuka atau saat ekspor berkala berjalan.
+    """
+
+    def __init__(self, capacity=10000):
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sequence = 0
+        self._exported = 0
+        self._exporter = None
+        self.enabled = True
+
+    def configure(self, capacity=None, enabled=None):
+        with self._lock:
+            if capacity is not None and capacity != self._records.maxlen:
+                self._records = deque(self._records, maxlen=capacity)
+            if enabled is not None:
+                self.enabled = enabled
+
+    # --- pencatatan ---
+
+    def begin_run(self, session_id=None):
+        """Tandai awal satu eksekusi script; span berikutnya di thread ini ikut run ini."""
+        self._local.run = (session_id, time.perf_counter())
+        with self._lock:
+            self._sequence += 1
+            self._local.run_id = self._sequence
+
+    def end_run(self):
+        run = getattr(self._local, 'run', None)
+        if run is None:
+            return
+        session_id, started = run
+        self.record('rerun', time.perf_counter() - started)
+        self._local.run = None
+
+    def record(self, stage, seconds=None, nbytes=None):
+        if not self.enabled:
+            return
+        run = getattr(self._local, 'run', None)
+        with self._lock:
+            self._sequence += 1
+            self._records.append({
+                'seq': self._sequence,
+                'ts': time.time(),
+                'stage': stage,
+                'seconds': seconds,
+                'bytes': nbytes,
+                'session': run[0] if run else None,
+                'run': getattr(self._local, 'run_id', None) if run else None,
+            })
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def timed(self, stage):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def size(self, stage, text):
+        """Catat ukuran payload (mis. HTML yang dikirim ke browser) dalam byte."""
+        self.record(stage, nbytes=len(text.encode('utf-8')) if isinstance(text, str) else len(text))
+
+    # --- ringkasan ---
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._records)
+
+    def summary(self):
+        """``{stage: {count, p50, p95, p99, max, ...}}`` dari isi ring buffer."""
+        grouped = {}
+        for record in self.snapshot():
+            grouped.setdefault(record['stage'], []).append(record)
+
+        result = {}
+        for stage, records in grouped.items():
+            item = {'count': len(records)}
+            seconds = np.array([record['seconds'] for record in records if record['seconds'] is not None])
+            if len(seconds):
+                item['sum'] = float(seconds.sum())
+                item['max'] = float(seconds.max())
+                for quantile, value in zip(QUANTILES, np.quantile(seconds, QUANTILES)):
+                    item[f"p{int(quantile * 100)}"] = float(value)
+            # Ukuran dijumlahkan per eksekusi script (satu bagian bisa terdiri dari beberapa potong HTML)
+            per_run = {}
+            for record in records:
+                if record['bytes'] is not None:
+                    key = record['run'] if record['run'] is not None else -record['seq']
+                    per_run[key] = per_run.get(key, 0) + record['bytes']
+            sizes = np.array(list(per_run.values()))
+            if len(sizes):
+                item['bytes_sum'] = int(sizes.sum())
+                item['bytes_mean'] = float(sizes.mean())
+                item['bytes_p95'] = float(np.quantile(sizes, 0.95))
+            result[stage] = item
+        return result
+
+    def sessions(self):
+        """Jumlah rerun dan median durasinya per sesi."""
+        runs = {}
+        for record in self.snapshot():
+            if record['stage'] == 'rerun' and record['session']:
+                runs.setdefault(record['session'], []).append(record['seconds'])
+        return {
+            session: {'runs': len(values), 'p50': float(np.median(values)), 'max': float(max(values))}
+            for session, values in runs.items()
+        }
+
+    # --- ekspor ---
+
+    def export_jsonl(self, path, max_bytes=50 * 1024 * 1024):
+        """Tambahkan record yang belum pernah diekspor ke file JSON lines.
+
+        File yang melewati ``max_bytes`` dipindah ke ``<path>.1`` terlebih dahulu.
+        """
+        with self._lock:
+            pending = [record for record in self._records if record['seq'] > self._exported]
+            if pending:
+                self._exported = pending[-1]['seq']
+        if not pending:
+            return 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+            os.replace(path, f"{path}.1")
+        with open(path, 'a') as file:
+            for record in pending:
+                file.write(json.dumps(record) + '\n')
+        return len(pending)
+
+    def prometheus_text(self, gauges=None, prefix='barjas'):
+        lines = [
+            f"# HELP {prefix}_stage_seconds Durasi tahap per eksekusi script",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        summary = self.summary()
+        for stage, item in sorted(summary.items()):
+            if 'sum' not in item:
+                continue
+            for quantile in QUANTILES:
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {item[f"p{int(quantile * 100)}"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {item["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {item["count"]}')
+        lines.append(f"# TYPE {prefix}_payload_bytes_sum counter")
+        for stage, item in sorted(summary.items()):
+            if 'bytes_sum' in item:
+                lines.append(f'{prefix}_payload_bytes_sum{{stage="{stage}"}} {item["bytes_sum"]}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, gauges=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write(path, self.prometheus_text(gauges))
+
+    def start_exporter(self, interval, jsonl_path, prometheus_path, gauges=None):
+        """Thread latar yang mengekspor secara berkala; ``gauges()`` mengembalikan dict angka."""
+        if self._exporter is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if jsonl_path:
+                        self.export_jsonl(jsonl_path)
+                    if prometheus_path:
+                        self.write_prometheus(prometheus_path, gauges() if gauges else None)
+                except Exception:
+                    pass
+
+        self._exporter = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+        self._exporter.start()
+
+
+# Satu registry per proses, dipakai dekorator ``timed`` di seluruh aplikasi
+REGISTRY = Metrics()
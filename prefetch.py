@@ -0,0 +1,141 @@
+"""Penjadwal latar belakang yang menyegarkan dan memprefetch semua spreadsheet."""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sheet_data import frames_from_gspread, frames_from_xlsx
+
+
+class SheetJob:
+    def __init__(self, page_id, sheet_id, interval):
+        self.page_id = page_id
+        self.sheet_id = sheet_id
+        self.interval = interval
+        self.mode = 'embed'
+        self.next_run = 0
+        self.running = False
+        self.last_refresh = None
+        self.last_duration = None
+        self.last_error = None
+        self.refresh_count = 0
+
+
+class PrefetchScheduler:
+    """Thread pool yang menyegarkan cache ekspor (dan tabel) setiap sheet.
+
+    Setiap sheet punya interval sendiri ditambah jitter agar tidak semuanya
+    menghantam Google pada detik yang sama. ``prefetch()`` menjalankan
+    sheet tertentu secepatnya, mis. saat pengguna baru login.
+    """
+
+    def __init__(self, export_cache, fetch, table_cache=None, gspread_client=None,
+                 workers=4, jitter=0.1):
+        self.export_cache = export_cache
+        self.fetch = fetch
+        self.table_cache = table_cache
+        self.gspread_client = gspread_client
+        self.jitter = jitter
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._thread = threading.Thread(target=self._run, name='prefetch-scheduler', daemon=True)
+        self._thread.start()
+
+    def sync(self, sheets, default_interval):
+        """Samakan daftar job dengan ``{page_id: (sheet_id, interval, mode)}`` dari config."""
+        with self._lock:
+            for page_id in list(self._jobs):
+                if page_id not in sheets:
+                    del self._jobs[page_id]
+            for page_id, (sheet_id, interval, mode) in sheets.items():
+                interval = interval or default_interval
+                job = self._jobs.get(page_id)
+                if job is None or job.sheet_id != sheet_id:
+                    job = SheetJob(page_id, sheet_id, interval)
+                    # Pemanasan awal disebar sedikit agar tidak serentak
+                    job.next_run = time.time() + random.uniform(0, self.jitter * interval)
+                    self._jobs[page_id] = job
+                elif job.interval != interval:
+                    job.interval = interval
+                    job.next_run = min(job.next_run, time.time() + self._jittered(interval))
+                job.mode = mode
+        self._wakeup.set()
+
+    def prefetch(self, page_ids):
+        """Jadwalkan sheet yang bisa dibuka pengguna untuk dijalankan sekarang."""
+        now = time.time()
+        with self._lock:
+            for page_id in page_ids:
+                job = self._jobs.get(page_id)
+                if job is None or job.running:
+                    continue
+                # Lewati sheet yang baru saja disegarkan
+                if job.last_refresh is not None and now - job.last_refresh < job.interval / 2:
+                    continue
+                job.next_run = now
+        self._wakeup.set()
+
+    def status(self):
+        with self._lock:
+            return [
+                {
+                    'page_id': job.page_id,
+                    'last_refresh': job.last_refresh,
+                    'last_duration': job.last_duration,
+                    'last_error': job.last_error,
+                    'next_run': job.next_run,
+                    'interval': job.interval,
+                    'refresh_count': job.refresh_count,
+                    'running': job.running,
+                }
+                for job in self._jobs.values()
+            ]
+
+    def _jittered(self, interval):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self):
+        while True:
+            now = time.time()
+            with self._lock:
+                due = [job for job in self._jobs.values() if not job.running and job.next_run <= now]
+                for job in due:
+                    job.running = True
+                pending = [job.next_run for job in self._jobs.values() if not job.running]
+            for job in due:
+                self._executor.submit(self._refresh, job)
+
+            timeout = max(0.5, min(pending) - now) if pending else 60
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _refresh(self, job):
+        started = time.perf_counter()
+        error = None
+        try:
+            content, error = self.export_cache.get(job.sheet_id, self.fetch, force=True)
+            if error is None and job.mode == 'table' and self.table_cache is not None:
+                self._warm_table(job, content)
+        except Exception as e:
+            error = f"Error: {str(e)}"
+        finally:
+            with self._lock:
+                job.running = False
+                job.last_refresh = time.time()
+                job.last_duration = time.perf_counter() - started
+                job.last_error = error
+                job.refresh_count += 1
+                job.next_run = time.time() + self._jittered(job.interval)
+            self._wakeup.set()
+
+    def _warm_table(self, job, content):
+        if self.gspread_client is not None:
+            # Sama dengan versi yang dipakai halaman: berganti tiap periode TTL
+            version = int(time.time() // max(1, self.export_cache.ttl_seconds))
+            self.table_cache.get(job.sheet_id, version, lambda: frames_from_gspread(self.gspread_client, job.sheet_id))
+            return
+        entry = self.export_cache.peek(job.sheet_id)
+        if entry is not None:
+            self.table_cache.get(job.sheet_id, entry.digest, lambda: frames_from_xlsx(content))
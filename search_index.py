@@ -0,0 +1,301 @@
+"""Indeks teks terbalik lintas sheet untuk pencarian cepat (prefix dan salah ketik)."""
+import bisect
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from snapshot_store import row_hashes
+
+TOKEN_PATTERN = r'\w+'
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, str(text).lower())
+
+
+def deletes(token):
+    """Semua varian token dengan satu huruf dihapus (kunci pencocokan salah ketik)."""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def edit_distance(a, b, limit=2):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def term_scores(index, matches):
+    """Dokumen yang memuat salah satu token ``matches`` dan bobot tertingginya."""
+    found = [(index.postings[token], weight) for token, weight in matches.items() if token in index.postings]
+    if not found:
+        return np.array([], dtype=np.int32), np.array([], dtype=float)
+    docs = np.concatenate([postings for postings, _ in found])
+    weights = np.concatenate([np.full(len(postings), weight) for postings, weight in found])
+    order = np.lexsort((-weights, docs))
+    docs, weights = docs[order], weights[order]
+    first = np.r_[True, docs[1:] != docs[:-1]]
+    return docs[first], weights[first]
+
+
+class SheetIndex:
+    """Posting list satu sheet: token -> array nomor dokumen (baris).
+
+    Dengan ``previous`` (indeks versi sebelumnya), hanya baris yang isinya baru
+    (hash baris tidak ada di versi lama, lihat ``snapshot_store.row_hashes``)
+    yang ditokenisasi; posting baris lama dipetakan ke nomor dokumen barunya.
+    """
+
+    def __init__(self, sheet_id, version, frames, previous=None):
+        self.sheet_id = sheet_id
+        self.version = version
+        self.frames = frames
+        self.tabs = []
+        self.offsets = []
+        self.hashes = {}
+        self.postings = {}
+        self.built_at = time.time()
+        self.tokenized_rows = 0
+
+        pairs = []
+        # Nomor dokumen lama untuk setiap dokumen baru (-1 = baris baru)
+        sources = []
+        offset = 0
+        for tab_name, frame in frames.items():
+            self.tabs.append(tab_name)
+            self.offsets.append(offset)
+            self.hashes[tab_name] = row_hashes(frame)
+            source = previous.source_rows(tab_name, frame, self.hashes[tab_name]) if previous is not None else None
+            if source is None:
+                source = np.full(len(frame), -1, dtype=np.int64)
+            sources.append(source)
+            fresh = frame[source < 0]
+            self.tokenized_rows += len(fresh)
+            for column in fresh.columns:
+                tokens = fresh[column].astype('string').str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+                if len(tokens):
+                    pairs.append(pd.DataFrame({'token': tokens.to_numpy(dtype=object), 'doc': tokens.index.to_numpy() + offset}))
+            offset += len(frame)
+        self.size = offset
+
+        if previous is not None and previous.postings:
+            source = np.concatenate(sources) if sources else np.array([], dtype=np.int64)
+            self.postings = previous.remap(source)
+        if pairs:
+            table = pd.concat(pairs, ignore_index=True).drop_duplicates()
+            for token, docs in table.groupby('token', sort=False)['doc']:
+                docs = docs.to_numpy(dtype=np.int32)
+                if token in self.postings:
+                    docs = np.union1d(self.postings[token], docs)
+                self.postings[token] = np.sort(docs)
+        # Posting list, kuncinya dan hash baris; DataFrame sumber milik cache tabel sehingga tidak dihitung
+        self.nbytes = sum(docs.nbytes + sys.getsizeof(token) for token, docs in self.postings.items())
+        self.nbytes += sum(hashes.nbytes for hashes in self.hashes.values())
+        self.used_at = self.built_at
+
+    def source_rows(self, tab_name, frame, hashes):
+        """Nomor dokumen di indeks ini untuk tiap baris ``frame`` yang isinya sama, -1 bila baru.
+
+        Baris kembar dipasangkan berurutan (kemunculan ke-n dengan kemunculan ke-n),
+        sehingga satu dokumen lama paling banyak dipakai satu dokumen baru.
+        """
+        if tab_name not in self.hashes or list(self.frames[tab_name].columns) != list(frame.columns):
+            return None
+        old = self.hashes[tab_name]
+        lookup = pd.MultiIndex.from_arrays([old, pd.Series(old).groupby(old).cumcount().to_numpy()])
+        found = lookup.get_indexer(pd.MultiIndex.from_arrays([hashes, pd.Series(hashes).groupby(hashes).cumcount().to_numpy()]))
+        offset = self.offsets[self.tabs.index(tab_name)]
+        return np.where(found >= 0, found + offset, -1)
+
+    def remap(self, source):
+        """Posting list untuk dokumen yang dipakai ulang (``source[doc]`` = nomor dokumen lama, -1 = baru)."""
+        reused = np.flatnonzero(source >= 0)
+        if not len(reused):
+            return {}
+        inverse = np.full(self.size, -1, dtype=np.int64)
+        inverse[source[reused]] = reused
+        lengths = np.array([len(docs) for docs in self.postings.values()])
+        new_docs = inverse[np.concatenate(list(self.postings.values()))]
+        kept = new_docs >= 0
+        counts = np.add.reduceat(kept, np.r_[0, np.cumsum(lengths)[:-1]])
+        parts = np.split(new_docs[kept].astype(np.int32), np.cumsum(counts)[:-1])
+        return {token: np.sort(docs) for token, docs, count in zip(self.postings, parts, counts) if count}
+
+    def locate(self, doc):
+        """Nomor dokumen -> ``(nama_tab, nomor_baris)`` (baris 0-based di DataFrame)."""
+        position = bisect.bisect_right(self.offsets, doc) - 1
+        return self.tabs[position], doc - self.offsets[position]
+
+
+class SearchIndex:
+    """Gabungan indeks per sheet dengan kosakata bersama.
+
+    ``update()`` hanya membangun ulang sheet yang versinya berubah; kosakata
+    terurut (untuk prefix) dan peta varian-hapus (untuk salah ketik satu huruf
+    atau dua huruf tertukar) diperbarui secara inkremental dengan hitungan
+    referensi.
+    """
+
+    def __init__(self):
+        self._sheets = {}
+        self._vocabulary = {}
+        self._sorted = []
+        self._deletes = {}
+        self._lock = threading.RLock()
+        self.stats = {'builds': 0, 'queries': 0, 'tokenized_rows': 0}
+
+    def version(self, sheet_id):
+        with self._lock:
+            index = self._sheets.get(sheet_id)
+            return index.version if index is not None else None
+
+    def update(self, sheet_id, version, frames):
+        with self._lock:
+            index = self._sheets.get(sheet_id)
+            if index is not None and index.version == version:
+                # Isi sama; ikuti objek DataFrame terbaru (mis. setelah cache tabel
+                # memuatnya lagi dari spill) agar salinan lama bisa dibebaskan
+                index.frames = frames
+                index.used_at = time.time()
+                return False
+            previous = index
+        # Dibangun di luar kunci; pencarian lain tetap jalan dengan versi lama.
+        # Versi sebelumnya dipakai ulang untuk baris yang tidak berubah
+        index = SheetIndex(sheet_id, version, frames, previous)
+        with self._lock:
+            old = self._sheets.get(sheet_id)
+            if old is not None:
+                self._forget(old.postings.keys())
+            self._sheets[sheet_id] = index
+            self._learn(index.postings.keys())
+            self.stats['builds'] += 1
+            self.stats['tokenized_rows'] += index.tokenized_rows
+        return True
+
+    def remove(self, sheet_id):
+        with self._lock:
+            old = self._sheets.pop(sheet_id, None)
+            if old is not None:
+                self._forget(old.postings.keys())
+
+    def _learn(self, tokens):
+        added = []
+        for token in tokens:
+            count = self._vocabulary.get(token, 0)
+            self._vocabulary[token] = count + 1
+            if count == 0:
+                added.append(token)
+                for variant in deletes(token) | {token}:
+                    self._deletes.setdefault(variant, set()).add(token)
+        if added:
+            self._sorted = sorted(set(self._sorted).union(added))
+
+    def _forget(self, tokens):
+        removed = set()
+        for token in tokens:
+            count = self._vocabulary.get(token, 0) - 1
+            if count > 0:
+                self._vocabulary[token] = count
+                continue
+            self._vocabulary.pop(token, None)
+            removed.add(token)
+            for variant in deletes(token) | {token}:
+                bucket = self._deletes.get(variant)
+                if bucket is not None:
+                    bucket.discard(token)
+                    if not bucket:
+                        del self._deletes[variant]
+        if removed:
+            self._sorted = [token for token in self._sorted if token not in removed]
+
+    def expand(self, term, prefix=True, fuzzy=True):
+        """Token di kosakata yang cocok dengan ``term`` beserta bobotnya."""
+        matches = {}
+        if term in self._vocabulary:
+            matches[term] = 3.0
+        if prefix:
+            start = bisect.bisect_left(self._sorted, term)
+            for token in self._sorted[start:start + 200]:
+                if not token.startswith(term):
+                    break
+                matches.setdefault(token, 2.0)
+        if fuzzy and len(term) >= 4:
+            candidates = set()
+            for variant in deletes(term) | {term}:
+                candidates |= self._deletes.get(variant, set())
+            limit = 2 if len(term) >= 8 else 1
+            for token in candidates:
+                if token not in matches and edit_distance(term, token, limit) <= limit:
+                    matches[token] = 1.0
+        return matches
+
+    def search(self, query, sheet_ids, limit=100, per_sheet=None):
+        """Cari semua kata di ``query`` (AND) pada sheet tertentu.
+
+        Mengembalikan list ``(skor, sheet_id, nama_tab, nomor_baris)``, paling
+        banyak ``per_sheet`` hasil dari satu sheet agar sheet lain tetap terlihat.
+        """
+        per_sheet = per_sheet or limit
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            self.stats['queries'] += 1
+            # Kata terakhir dianggap sedang diketik sehingga selalu dicocokkan sebagai prefix
+            expansions = [self.expand(term, prefix=(i == len(terms) - 1 or len(term) >= 3)) for i, term in enumerate(terms)]
+            sheets = [self._sheets[sheet_id] for sheet_id in sheet_ids if sheet_id in self._sheets]
+            for index in sheets:
+                index.used_at = time.time()
+
+        hits = []
+        for index in sheets:
+            docs, scores = term_scores(index, expansions[0])
+            for matches in expansions[1:]:
+                if not len(docs):
+                    break
+                other_docs, other_scores = term_scores(index, matches)
+                docs, left, right = np.intersect1d(docs, other_docs, assume_unique=True, return_indices=True)
+                scores = scores[left] + other_scores[right]
+            # Hanya baris dengan skor teratas yang diterjemahkan ke tab/baris
+            for position in np.argsort(-scores, kind='stable')[:per_sheet]:
+                tab_name, row = index.locate(int(docs[position]))
+                hits.append((float(scores[position]), index.sheet_id, tab_name, row))
+
+        hits.sort(key=lambda hit: (-hit[0], hit[1], hit[2], hit[3]))
+        return hits[:limit]
+
+    def row(self, sheet_id, tab_name, row):
+        with self._lock:
+            index = self._sheets.get(sheet_id)
+        if index is None or tab_name not in index.frames:
+            return None
+        return index.frames[tab_name].iloc[row]
+
+    def memory_entries(self):
+        with self._lock:
+            return [(sheet_id, index.nbytes, index.used_at) for sheet_id, index in self._sheets.items()]
+
+    def release(self, sheet_id):
+        """Buang indeks satu sheet; dibangun ulang pada pencarian berikutnya."""
+        with self._lock:
+            index = self._sheets.get(sheet_id)
+            self.remove(sheet_id)
+        return index.nbytes if index is not None else 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'sheets': len(self._sheets),
+                'documents': sum(index.size for index in self._sheets.values()),
+                'tokens': len(self._vocabulary),
+                **self.stats,
+            }
@@ -0,0 +1,232 @@
+"""Jalur cepat autentikasi: token sesi terverifikasi, cek bcrypt terbatas, dan rate limit per IP."""
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+from download_server import sign_token, verify_token
+
+TOKEN_SCOPE = 'session'
+
+
+class LoginBusy(Exception):
+    """Terlalu banyak pengecekan password yang sedang mengantri."""
+
+
+class SessionCache:
+    """Token sesi bertanda tangan → ``(username, role)`` dengan masa berlaku.
+
+    Verifikasi penuh (password atau cookie) dilakukan sekali saat login;
+    eksekusi berikutnya cukup mencari token di dict ini tanpa membaca
+    kredensial. Token yang tidak ada di cache (mis. sesudah restart) masih
+    diterima selama tanda tangan dan masa berlakunya valid dan tidak dicabut.
+
+    ``lookup(username) -> role | None`` membaca akun dari penyimpanan saat token
+    pertama kali terlihat dan paling lama setiap ``recheck_seconds`` setelahnya,
+    sehingga pengguna yang dihapus (juga dari proses lain) keluar dan perubahan
+    role ikut berlaku tanpa menunggu token kedaluwarsa.
+    """
+
+    def __init__(self, secret, ttl_seconds=8 * 3600, lookup=None, recheck_seconds=60):
+        self.secret = secret
+        self.ttl_seconds = ttl_seconds
+        self.lookup = lookup
+        self.recheck_seconds = recheck_seconds
+        # token -> [username, role, kedaluwarsa, terakhir dicek]
+        self._sessions = {}
+        # token dicabut -> kedaluwarsa; username -> waktu pencabutan semua sesinya
+        self._revoked = {}
+        self._revoked_users = {}
+        self._lock = threading.Lock()
+        self.stats = {'issued': 0, 'hits': 0, 'verified': 0, 'rejected': 0}
+
+    def issue(self, username, role):
+        now = time.time()
+        # nonce membuat token setiap login berbeda sehingga bisa dicabut sendiri-sendiri
+        token = sign_token(self.secret, {'scope': TOKEN_SCOPE, 'u': username, 'r': role, 'n': secrets.token_hex(8), 'iat': now}, self.ttl_seconds)
+        with self._lock:
+            self._prune_locked()
+            self._sessions[token] = [username, role, now + self.ttl_seconds, now]
+            self.stats['issued'] += 1
+        return token
+
+    def verify(self, token):
+        """``(username, role)`` untuk token yang masih berlaku, atau ``None``."""
+        if not token:
+            return None
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None and session[2] > now and (self.lookup is None or now - session[3] < self.recheck_seconds):
+                self.stats['hits'] += 1
+                return session[0], session[1]
+
+        if session is not None:
+            username, role, expires = session[:3]
+        else:
+            # Hanya token sesi; token API atau link unduhan tidak bisa dipakai login
+            payload = verify_token(self.secret, token, TOKEN_SCOPE)
+            if payload is None or 'u' not in payload:
+                return self._reject(token)
+            username, role, expires = payload['u'], payload.get('r'), payload['exp']
+            with self._lock:
+                revoked = token in self._revoked or payload.get('iat', 0) <= self._revoked_users.get(username, float('-inf'))
+            if revoked:
+                return self._reject(token)
+        if expires <= now:
+            return self._reject(token)
+
+        if self.lookup is not None:
+            # Role dibaca dari penyimpanan, bukan dari token
+            role = self.lookup(username)
+            if role is None:
+                return self._reject(token)
+        with self._lock:
+            if token in self._revoked:
+                # Dicabut saat role sedang dibaca
+                self.stats['rejected'] += 1
+                return None
+            self._sessions[token] = [username, role, expires, now]
+            self.stats['verified'] += 1
+        return username, role
+
+    def _reject(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+            self.stats['rejected'] += 1
+        return None
+
+    def revoke(self, token):
+        if not token:
+            return
+        payload = verify_token(self.secret, token)
+        with self._lock:
+            session = self._sessions.pop(token, None)
+            expires = session[2] if session is not None else (payload or {}).get('exp')
+            if expires is not None:
+                self._revoked[token] = expires
+
+    def revoke_user(self, username):
+        """Cabut semua sesi milik satu pengguna (mis. setelah akunnya dihapus)."""
+        with self._lock:
+            self._revoked_users[username] = time.time()
+            for token in [token for token, session in self._sessions.items() if session[0] == username]:
+                self._revoked[token] = self._sessions.pop(token)[2]
+
+    def _prune_locked(self):
+        now = time.time()
+        for token in [token for token, session in self._sessions.items() if session[2] <= now]:
+            del self._sessions[token]
+        for token in [token for token, expires in self._revoked.items() if expires <= now]:
+            del self._revoked[token]
+        for username in [username for username, revoked_at in self._revoked_users.items() if revoked_at + self.ttl_seconds <= now]:
+            del self._revoked_users[username]
+
+    def info(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), **self.stats}
+
+
+class PasswordVerifier:
+    """``bcrypt.checkpw`` di pool thread berukuran tetap.
+
+    bcrypt melepas GIL, sehingga paling banyak ``workers`` core yang dipakai
+    untuk login sekaligus; sisanya tetap melayani sesi yang sudah login.
+    Jika antrian melebihi ``max_pending``, ``check()`` langsung menolak dengan
+    ``LoginBusy`` alih-alih menumpuk pekerjaan.
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'failures': 0, 'busy': 0}
+
+    def _check(self, password, hashed):
+        try:
+            return bcrypt.checkpw(password.encode(), hashed.encode())
+        except ValueError:
+            # Hash rusak atau bukan bcrypt
+            return False
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def check(self, password, hashed):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats['busy'] += 1
+                raise LoginBusy()
+            self._pending += 1
+            self.stats['checks'] += 1
+        future = self._executor.submit(self._check, password, hashed)
+        try:
+            valid = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise LoginBusy()
+        if not valid:
+            with self._lock:
+                self.stats['failures'] += 1
+        return valid
+
+    def info(self):
+        with self._lock:
+            return {'workers': self.workers, 'pending': self._pending, **self.stats}
+
+
+class RateLimiter:
+    """Paling banyak ``attempts`` login gagal per kunci (alamat IP) dalam ``window_seconds`` terakhir.
+
+    Hanya percobaan gagal yang dihitung, sehingga banyak pengguna di balik
+    satu IP kantor tetap bisa login bersamaan di awal jam kerja.
+    """
+
+    def __init__(self, attempts=10, window_seconds=60.0, max_keys=10000):
+        self.attempts = attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._failures = {}
+        self._lock = threading.Lock()
+        self.stats = {'limited': 0}
+
+    def _recent_locked(self, key, now):
+        failures = self._failures.get(key)
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        return failures
+
+    def allow(self, key):
+        """``False`` jika kunci ini sudah mencapai batas login gagal."""
+        with self._lock:
+            failures = self._recent_locked(key, time.time())
+            if failures and len(failures) >= self.attempts:
+                self.stats['limited'] += 1
+                return False
+            return True
+
+    def record(self, key):
+        now = time.time()
+        with self._lock:
+            self._failures.setdefault(key, deque()).append(now)
+            if len(self._failures) > self.max_keys:
+                for stale in list(self._failures):
+                    if not self._recent_locked(stale, now):
+                        del self._failures[stale]
+
+    def retry_after(self, key):
+        """Detik sampai percobaan gagal tertua keluar dari jendela."""
+        with self._lock:
+            failures = self._recent_locked(key, time.time())
+            if not failures:
+                return 0
+            return max(1, int(failures[0] + self.window_seconds - time.time()) + 1)
+
+    def info(self):
+        with self._lock:
+            return {'keys': len(self._failures), **self.stats}
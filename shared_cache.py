@@ -0,0 +1,153 @@
+"""Tier cache ekspor di disk yang dibagi semua proses Streamlit pada satu host."""
+import json
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config_store import atomic_write, file_lock
+from snapshot_store import atomic_write_bytes
+
+
+class SharedExportStore:
+    """Workbook terakhir per sheet di ``<root>/<sheet_id>/``, dipakai bersama antar worker.
+
+    ``lock(sheet_id)`` adalah kunci antar-proses (single-flight): hanya satu
+    worker yang mengunduh sebuah sheet, worker lain menunggu lalu membaca
+    hasilnya dari disk. ``publish()``/``subscribe()`` menyebarkan invalidasi
+    lewat file event yang di-poll setiap worker.
+    """
+
+    def __init__(self, root='shared_cache', poll_seconds=1.0, max_events_bytes=1024 * 1024):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self.max_events_bytes = max_events_bytes
+        self.events_path = os.path.join(root, 'events.log')
+        self._subscribers = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'reads': 0, 'writes': 0, 'events_published': 0, 'events_received': 0}
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, sheet_id, *parts):
+        return os.path.join(self.root, sheet_id, *parts)
+
+    # --- isi cache ---
+
+    def meta(self, sheet_id):
+        try:
+            with open(self._dir(sheet_id, 'meta.json'), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read(self, sheet_id, meta):
+        """Isi workbook untuk ``meta`` lewat memory map, ``None`` jika sudah diganti versi lain."""
+        try:
+            with open(self._dir(sheet_id, f"{meta['digest']}.xlsx"), 'rb') as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    content = mapped[:]
+        except (FileNotFoundError, ValueError):
+            return None
+        with self._lock:
+            self.stats['reads'] += 1
+        return content
+
+    def write(self, entry):
+        """Simpan ``CacheEntry`` baru; versi lama dihapus setelah meta menunjuk ke versi baru."""
+        os.makedirs(self._dir(entry.sheet_id), exist_ok=True)
+        filename = f"{entry.digest}.xlsx"
+        if not os.path.exists(self._dir(entry.sheet_id, filename)):
+            atomic_write_bytes(self._dir(entry.sheet_id, filename), entry.content)
+        atomic_write(self._dir(entry.sheet_id, 'meta.json'), json.dumps({
+            'digest': entry.digest,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'fetched_at': entry.fetched_at,
+            'size': entry.size,
+        }))
+        for name in os.listdir(self._dir(entry.sheet_id)):
+            if name.endswith('.xlsx') and name != filename:
+                try:
+                    os.remove(self._dir(entry.sheet_id, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self.stats['writes'] += 1
+
+    def touch(self, sheet_id, fetched_at):
+        """Perbarui umur salinan setelah Google menjawab 304."""
+        meta = self.meta(sheet_id)
+        if meta is not None:
+            meta['fetched_at'] = fetched_at
+            atomic_write(self._dir(sheet_id, 'meta.json'), json.dumps(meta))
+
+    def invalidate(self, sheet_id):
+        try:
+            os.remove(self._dir(sheet_id, 'meta.json'))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def lock(self, sheet_id):
+        os.makedirs(self._dir(sheet_id), exist_ok=True)
+        with file_lock(self._dir(sheet_id, 'fetch')):
+            yield
+
+    # --- invalidasi antar proses ---
+
+    def publish(self, kind, **payload):
+        line = json.dumps({'kind': kind, 'ts': time.time(), 'pid': os.getpid(), **payload}) + '\n'
+        with file_lock(self.events_path):
+            # File event dipotong saat terlalu besar; subscriber membaca ulang dari awal
+            if os.path.exists(self.events_path) and os.path.getsize(self.events_path) > self.max_events_bytes:
+                open(self.events_path, 'w').close()
+            with open(self.events_path, 'a') as events:
+                events.write(line)
+        with self._lock:
+            self.stats['events_published'] += 1
+
+    def subscribe(self, callback):
+        """Panggil ``callback(event)`` untuk setiap event (termasuk dari proses ini)."""
+        with self._lock:
+            self._subscribers.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name='shared-cache-events', daemon=True)
+                self._thread.start()
+
+    def _poll(self):
+        offset = os.path.getsize(self.events_path) if os.path.exists(self.events_path) else 0
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                size = os.path.getsize(self.events_path)
+            except FileNotFoundError:
+                continue
+            if size < offset:
+                offset = 0
+            if size == offset:
+                continue
+            with open(self.events_path, 'rb') as events:
+                events.seek(offset)
+                data = events.read()
+            # Baris terakhir yang belum lengkap dibaca pada putaran berikutnya
+            complete = data[:data.rfind(b'\n') + 1]
+            offset += len(complete)
+            for line in complete.decode('utf-8').splitlines():
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                with self._lock:
+                    self.stats['events_received'] += 1
+                    subscribers = list(self._subscribers)
+                for callback in subscribers:
+                    try:
+                        callback(event)
+                    except Exception:
+                        pass
+
+    def info(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), **self.stats}
@@ -0,0 +1,263 @@
+"""Data sheet dalam bentuk tabel pandas untuk tampilan tabel native."""
+import io
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Kolom teks dengan proporsi nilai unik di bawah batas ini disimpan sebagai
+# category (mis. vendor, sub bidang, status)
+CATEGORY_RATIO = 0.5
+
+
+def unique_headers(row):
+    headers = []
+    seen = {}
+    for index, value in enumerate(row):
+        name = str(value).strip() if value not in (None, '') else f"Kolom {index + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name} ({seen[name]})"
+        else:
+            seen[name] = 1
+        headers.append(name)
+    return headers
+
+
+def optimize_frame(frame):
+    """Ubah kolom ke dtype yang hemat memori: angka, category, atau string Arrow."""
+    frame = frame.dropna(how='all').dropna(axis=1, how='all')
+    for column in frame.columns:
+        series = frame[column]
+        if series.dtype != object:
+            continue
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.notna().sum() == series.notna().sum():
+            frame[column] = numeric
+        elif series.nunique(dropna=True) <= max(1, len(series) * CATEGORY_RATIO):
+            frame[column] = series.astype(str).where(series.notna()).astype('category')
+        else:
+            frame[column] = series.astype(str).where(series.notna()).astype('string[pyarrow]')
+    return frame.reset_index(drop=True)
+
+
+class SheetLayout:
+    """Posisi asli di sheet: nomor baris per baris DataFrame dan nomor kolom per nama kolom (1-based)."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    def cell(self, row, column):
+        return int(self.rows[row]), self.columns[column]
+
+
+# Layout per DataFrame, dibuang otomatis saat DataFrame-nya dibebaskan. Tidak
+# disimpan di ``frame.attrs`` karena attrs ikut ditulis (sebagai JSON) oleh to_parquet.
+_layouts = {}
+
+
+def set_layout(frame, layout):
+    _layouts[id(frame)] = layout
+    weakref.finalize(frame, _layouts.pop, id(frame), None)
+
+
+def frame_layout(frame):
+    """``SheetLayout`` DataFrame hasil ``values_to_frame``, atau ``None``."""
+    return _layouts.get(id(frame))
+
+
+def values_to_frame(values):
+    """Ubah list baris (hasil API Sheets) menjadi DataFrame dengan baris pertama sebagai header.
+
+    Posisi asli setiap sel dicatat (lihat ``frame_layout``) agar hasil edit
+    bisa ditulis kembali ke sel yang benar.
+    """
+    numbered = [(number, row) for number, row in enumerate(values, 1) if any(cell not in (None, '') for cell in row)]
+    if not numbered:
+        return pd.DataFrame()
+    width = max(len(row) for _, row in numbered)
+    rows = [list(row) + [None] * (width - len(row)) for _, row in numbered]
+    headers = unique_headers(rows[0])
+    frame = pd.DataFrame(rows[1:], columns=headers)
+    frame = frame.replace('', None)
+    frame = optimize_frame(frame)
+    set_layout(frame, SheetLayout(
+        np.array([number for number, _ in numbered[1:]], dtype=np.int64),
+        {name: index for index, name in enumerate(headers, 1)}
+    ))
+    return frame
+
+
+def frames_from_xlsx(content):
+    """Baca semua tab workbook xlsx menjadi ``{nama_tab: DataFrame}``."""
+    sheets = pd.read_excel(io.BytesIO(content), sheet_name=None, header=None, dtype=object, engine='openpyxl')
+    return {name: values_to_frame(frame.where(frame.notna(), None).values.tolist()) for name, frame in sheets.items()}
+
+
+def frames_from_gspread(client, sheet_id):
+    """Ambil semua tab lewat satu panggilan ``values:batchGet``."""
+    spreadsheet = client.open_by_key(sheet_id)
+    titles = [worksheet.title for worksheet in spreadsheet.worksheets()]
+    ranges = ["'{}'".format(title.replace("'", "''")) for title in titles]
+    response = spreadsheet.values_batch_get(ranges)
+    return {
+        title: values_to_frame(value_range.get('values', []))
+        for title, value_range in zip(titles, response.get('valueRanges', []))
+    }
+
+
+def frames_nbytes(frames):
+    return int(sum(frame.memory_usage(deep=True).sum() for frame in frames.values()))
+
+
+class TableEntry:
+    def __init__(self, sheet_id, version, frames):
+        self.sheet_id = sheet_id
+        self.version = version
+        self.frames = frames
+        self.nbytes = frames_nbytes(frames)
+        self.built_at = time.time()
+        self.used_at = self.built_at
+
+
+class TableCache:
+    """LRU berbatas byte untuk DataFrame per sheet, dibangun ulang saat versinya berubah.
+
+    Dengan ``spill`` (``SpillStore``), entry yang dilepas anggaran memori
+    ditulis ke parquet dan dibaca lagi (tanpa ``build()``) bila versinya masih sama.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024, spill=None):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.stats = {'hits': 0, 'builds': 0, 'evictions': 0, 'released': 0, 'unspilled': 0}
+
+    def configure(self, max_bytes=None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+                self._evict_locked()
+
+    def get(self, sheet_id, version, build):
+        """Kembalikan ``{nama_tab: DataFrame}``; ``build()`` dipanggil sekali per versi."""
+        with self._lock:
+            entry = self._entries.get(sheet_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(sheet_id)
+                entry.used_at = time.time()
+                self.stats['hits'] += 1
+                return entry.frames
+            sheet_lock = self._locks.setdefault(sheet_id, threading.Lock())
+
+        with sheet_lock:
+            # Sesi lain mungkin sudah membangunnya selagi kita menunggu
+            with self._lock:
+                entry = self._entries.get(sheet_id)
+                if entry is not None and entry.version == version:
+                    self.stats['hits'] += 1
+                    return entry.frames
+
+            frames = self.spill.take_frames('tables', sheet_id, version) if self.spill is not None else None
+            entry = TableEntry(sheet_id, version, frames if frames is not None else build())
+            with self._lock:
+                self.stats['unspilled' if frames is not None else 'builds'] += 1
+                old = self._entries.pop(sheet_id, None)
+                if old is not None:
+                    self._bytes -= old.nbytes
+                self._entries[sheet_id] = entry
+                self._bytes += entry.nbytes
+                self._evict_locked(keep=sheet_id)
+            return entry.frames
+
+    def peek(self, sheet_id):
+        with self._lock:
+            return self._entries.get(sheet_id)
+
+    def invalidate(self, sheet_id=None):
+        with self._lock:
+            if sheet_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(sheet_id, None)
+                if entry is not None:
+                    self._bytes -= entry.nbytes
+        if self.spill is not None:
+            self.spill.discard('tables', sheet_id)
+
+    def memory_entries(self):
+        """``(sheet_id, byte, terakhir_dipakai)`` per entry, untuk anggaran memori global."""
+        with self._lock:
+            return [(entry.sheet_id, entry.nbytes, entry.used_at) for entry in self._entries.values()]
+
+    def release(self, sheet_id):
+        """Lepas satu entry dari memori (di-spill ke disk bila ada ``spill``); kembalikan byte-nya."""
+        with self._lock:
+            entry = self._entries.pop(sheet_id, None)
+            if entry is None:
+                return 0
+            self._bytes -= entry.nbytes
+            self.stats['released'] += 1
+        if self.spill is not None:
+            try:
+                self.spill.put_frames('tables', sheet_id, entry.version, entry.frames)
+            except Exception:
+                # Tab yang tidak bisa ditulis ke parquet cukup dibangun ulang nanti
+                self.spill.discard('tables', sheet_id)
+        return entry.nbytes
+
+    def info(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                **self.stats,
+            }
+
+    def _evict_locked(self, keep=None):
+        for sheet_id in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if sheet_id == keep:
+                continue
+            evicted = self._entries.pop(sheet_id)
+            self._bytes -= evicted.nbytes
+            self.stats['evictions'] += 1
+
+
+def filter_frame(frame, column=None, query=None):
+    if not column or not query:
+        return frame
+    mask = frame[column].astype(str).str.contains(query, case=False, na=False, regex=False)
+    return frame[mask]
+
+
+class FrameTable:
+    """DataFrame dengan antarmuka yang sama seperti ``ColumnarTable`` untuk tampilan tabel."""
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    @property
+    def columns(self):
+        return list(self.frame.columns)
+
+    @property
+    def num_rows(self):
+        return len(self.frame)
+
+    def filter(self, column=None, query=None):
+        return FrameTable(filter_frame(self.frame, column, query))
+
+    def rows(self, start=0, stop=None, columns=None):
+        frame = self.frame[columns] if columns else self.frame
+        return frame.iloc[start:stop]
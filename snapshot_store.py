@@ -0,0 +1,206 @@
+"""Snapshot sheet di disk: salinan ekspor terakhir, tabel per tab, dan riwayat perubahan per baris."""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from config_store import atomic_write, file_lock
+
+
+def row_hashes(frame):
+    """Hash 64-bit per baris; sama untuk baris yang isinya sama di mana pun posisinya."""
+    if frame.empty:
+        return np.array([], dtype='uint64')
+    return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+
+
+def diff_rows(old, new, old_hashes=None, new_hashes=None):
+    """Bandingkan dua DataFrame per baris; kembalikan ``(baris_baru, baris_hilang)``."""
+    if old is None or list(old.columns) != list(new.columns):
+        # Struktur kolom berubah: seluruh tab dianggap baru
+        return new, old if old is not None else new.iloc[0:0]
+    old_hashes = row_hashes(old) if old_hashes is None else old_hashes
+    new_hashes = row_hashes(new) if new_hashes is None else new_hashes
+    added = new[~np.isin(new_hashes, old_hashes)]
+    removed = old[~np.isin(old_hashes, new_hashes)]
+    return added, removed
+
+
+def tab_key(name):
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:12]
+
+
+def atomic_write_bytes(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_frame(frame, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    os.close(fd)
+    try:
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SnapshotStore:
+    """Menyimpan versi terakhir setiap sheet di ``<root>/<sheet_id>/``.
+
+    Setiap ekspor baru dibandingkan per baris dengan snapshot sebelumnya;
+    yang disimpan hanya baris yang bertambah/hilang per tab ditambah satu
+    baris riwayat di ``history.jsonl``. Tabel tab yang tidak berubah tidak
+    ditulis ulang. Salinan xlsx dan tabel terakhir dipakai untuk menghangatkan cache saat aplikasi dijalankan ulang.
+    """
+
+    def __init__(self, root='snapshots', max_versions=50):
+        self.root = root
+        self.max_versions = max_versions
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, sheet_id, *parts):
+        return os.path.join(self.root, sheet_id, *parts)
+
+    def sheet_ids(self):
+        return [name for name in os.listdir(self.root) if os.path.exists(self._dir(name, 'meta.json'))]
+
+    def meta(self, sheet_id):
+        try:
+            with open(self._dir(sheet_id, 'meta.json'), 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def load_export(self, sheet_id):
+        """``(content, meta)`` dari salinan ekspor terakhir, atau ``None``."""
+        meta = self.meta(sheet_id)
+        if meta is None:
+            return None
+        try:
+            with open(self._dir(sheet_id, 'export.xlsx'), 'rb') as file:
+                return file.read(), meta
+        except FileNotFoundError:
+            return None
+
+    def load_frames(self, sheet_id, digest=None):
+        """Tabel snapshot terakhir; ``None`` jika tidak ada atau digest-nya berbeda."""
+        meta = self.meta(sheet_id)
+        if meta is None or (digest is not None and meta['digest'] != digest):
+            return None
+        return {name: pd.read_parquet(self._dir(sheet_id, 'tables', f"{key}.parquet")) for name, key in meta['tabs'].items()}
+
+    def history(self, sheet_id):
+        try:
+            with open(self._dir(sheet_id, 'history.jsonl'), 'r') as file:
+                return [json.loads(line) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def changes(self, sheet_id, version=None):
+        """``{tab: (baris_baru, baris_hilang)}`` untuk satu versi (default: terbaru)."""
+        records = self.history(sheet_id)
+        if version is None and records:
+            version = records[-1]['version']
+        record = next((item for item in records if item['version'] == version), None)
+        if record is None or record.get('base'):
+            return {}
+        result = {}
+        for name, counts in record['tabs'].items():
+            key = tab_key(name)
+            added_path = self._dir(sheet_id, 'versions', str(version), f"{key}.added.parquet")
+            removed_path = self._dir(sheet_id, 'versions', str(version), f"{key}.removed.parquet")
+            if counts['added'] or counts['removed']:
+                result[name] = (
+                    pd.read_parquet(added_path) if os.path.exists(added_path) else None,
+                    pd.read_parquet(removed_path) if os.path.exists(removed_path) else None,
+                )
+        return result
+
+    def save(self, sheet_id, content, frames, etag=None, last_modified=None, fetched_at=None):
+        """Simpan ekspor baru; kembalikan catatan riwayatnya, atau ``None`` jika isinya sama."""
+        digest = hashlib.sha256(content).hexdigest()
+        os.makedirs(self._dir(sheet_id, 'tables'), exist_ok=True)
+        with file_lock(self._dir(sheet_id, 'store')):
+            meta = self.meta(sheet_id)
+            if meta is not None and meta['digest'] == digest:
+                return None
+
+            previous = self.load_frames(sheet_id) if meta is not None else None
+            version = meta['version'] + 1 if meta is not None else 1
+            record = {'version': version, 'digest': digest, 'fetched_at': fetched_at or time.time(), 'tabs': {}}
+            if previous is None:
+                record['base'] = True
+            else:
+                version_dir = self._dir(sheet_id, 'versions', str(version))
+                os.makedirs(version_dir, exist_ok=True)
+
+            for name, frame in frames.items():
+                key = tab_key(name)
+                if previous is None:
+                    record['tabs'][name] = {'rows': len(frame), 'added': len(frame), 'removed': 0}
+                else:
+                    old = previous.get(name)
+                    old_hashes = new_hashes = None
+                    if old is not None and list(old.columns) == list(frame.columns):
+                        old_hashes, new_hashes = row_hashes(old), row_hashes(frame)
+                        if old.dtypes.equals(frame.dtypes) and np.array_equal(old_hashes, new_hashes):
+                            # Tab tidak berubah: parquet lama tetap dipakai, tidak ditulis ulang
+                            record['tabs'][name] = {'rows': len(frame), 'added': 0, 'removed': 0}
+                            continue
+                    added, removed = diff_rows(old, frame, old_hashes, new_hashes)
+                    record['tabs'][name] = {'rows': len(frame), 'added': len(added), 'removed': len(removed)}
+                    if len(added):
+                        write_frame(added, os.path.join(version_dir, f"{key}.added.parquet"))
+                    if len(removed):
+                        write_frame(removed, os.path.join(version_dir, f"{key}.removed.parquet"))
+                write_frame(frame, self._dir(sheet_id, 'tables', f"{key}.parquet"))
+
+            if previous is not None:
+                for name in previous.keys() - frames.keys():
+                    record['tabs'][name] = {'rows': 0, 'added': 0, 'removed': len(previous[name])}
+                    write_frame(previous[name], os.path.join(version_dir, f"{tab_key(name)}.removed.parquet"))
+
+            atomic_write_bytes(self._dir(sheet_id, 'export.xlsx'), content)
+            with open(self._dir(sheet_id, 'history.jsonl'), 'a') as history:
+                history.write(json.dumps(record) + '\n')
+            atomic_write(self._dir(sheet_id, 'meta.json'), json.dumps({
+                'version': version,
+                'digest': digest,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': record['fetched_at'],
+                'tabs': {name: tab_key(name) for name in frames},
+            }))
+            self._prune_locked(sheet_id)
+        return record
+
+    def _prune_locked(self, sheet_id):
+        records = self.history(sheet_id)
+        if len(records) <= self.max_versions:
+            return
+        kept = records[-self.max_versions:]
+        for record in records[:-self.max_versions]:
+            shutil.rmtree(self._dir(sheet_id, 'versions', str(record['version'])), ignore_errors=True)
+        atomic_write(self._dir(sheet_id, 'history.jsonl'), ''.join(json.dumps(record) + '\n' for record in kept))
+
+    def remove(self, sheet_id):
+        shutil.rmtree(self._dir(sheet_id), ignore_errors=True)
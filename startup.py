@@ -0,0 +1,180 @@
+"""Start dingin: impor yang ditunda, warm-up di latar belakang, dan anggaran waktu start.
+
+Dipakai dari app.py (``BOOT``, ``Warmup``, ``preload``) dan sebagai CLI::
+
+    python startup.py serve [opsi streamlit]   # impor berat dimuat paralel dengan start server
+    python startup.py report                   # ukur waktu impor di interpreter baru
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Modul yang tidak diimpor app.py di awal; dimuat oleh warm-up setelah halaman pertama tampil
+DEFERRED_MODULES = ('gspread', 'streamlit_authenticator', 'openpyxl', 'columnar_store', 'write_queue', 'PIL.Image', 'data_api', 'export_jobs')
+
+# Modul yang tetap diimpor app.py di awal (selain streamlit, yang sudah dimuat server)
+EAGER_MODULES = (
+    'pandas', 'export_cache', 'http_client', 'download_server', 'config_store', 'sheet_data',
+    'account_store', 'session_auth', 'prefetch', 'analytics', 'snapshot_store', 'shared_cache',
+    'search_index', 'logo_store', 'metrics', 'memory_budget',
+)
+
+
+def preload(modules=DEFERRED_MODULES):
+    """Impor ``modules`` dan kembalikan ``{modul: detik}`` (0 untuk yang sudah dimuat)."""
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+class StartupTimer:
+    """Waktu start dingin proses ini: setiap tahap dicatat sekali, pada eksekusi pertama."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def mark(self, stage, seconds):
+        with self._lock:
+            self._stages.setdefault(stage, seconds)
+
+    def stages(self):
+        with self._lock:
+            return dict(self._stages)
+
+    def report(self, budgets):
+        """Baris ``{tahap, ms, anggaran_ms, ok}`` untuk setiap tahap yang punya anggaran."""
+        stages = self.stages()
+        return [
+            {
+                'stage': stage,
+                'ms': round(stages[stage] * 1000, 1) if stage in stages else None,
+                'budget_ms': budget,
+                'ok': stages[stage] * 1000 <= budget if stage in stages else None,
+            }
+            for stage, budget in budgets.items()
+        ]
+
+
+BOOT = StartupTimer()
+
+
+class ThreadNameFilter(logging.Filter):
+    def __init__(self, thread_name):
+        super().__init__()
+        self.thread_name = thread_name
+
+    def filter(self, record):
+        return record.threadName != self.thread_name
+
+
+class Warmup:
+    """Jalankan daftar ``(nama, fungsi)`` sekali di thread latar belakang dan catat durasinya.
+
+    Thread ini sengaja tidak diberi ScriptRunContext agar fungsi
+    ``@st.cache_resource`` tidak menampilkan spinner di sesi mana pun;
+    peringatan "missing ScriptRunContext" dari Streamlit untuk thread ini diredam.
+    """
+
+    def __init__(self, tasks, name='startup-warmup'):
+        self.tasks = list(tasks)
+        self.name = name
+        self.results = []
+        self.state = 'idle'
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        logging.getLogger('streamlit.runtime.scriptrunner.script_run_context').addFilter(ThreadNameFilter(self.name))
+        self.state = 'running'
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+        return self
+
+    def _run(self):
+        started = time.perf_counter()
+        for name, task in self.tasks:
+            task_started = time.perf_counter()
+            error = None
+            try:
+                task()
+            except Exception as e:
+                error = str(e)
+            with self._lock:
+                self.results.append({'task': name, 'seconds': time.perf_counter() - task_started, 'error': error})
+        self.seconds = time.perf_counter() - started
+        self.state = 'done'
+
+    def info(self):
+        with self._lock:
+            return {'state': self.state, 'seconds': self.seconds, 'tasks': list(self.results)}
+
+
+def measure_import(modules, python=sys.executable, base=('streamlit',)):
+    """Detik untuk mengimpor ``modules`` di interpreter baru, setelah ``base`` dimuat."""
+    code = (
+        "import time, importlib\n"
+        f"for name in {list(base)!r}: importlib.import_module(name)\n"
+        "started = time.perf_counter()\n"
+        f"for name in {list(modules)!r}: importlib.import_module(name)\n"
+        "print(time.perf_counter() - started)\n"
+    )
+    result = subprocess.run([python, '-c', code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start dingin aplikasi barjas")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('serve', help="jalankan streamlit dengan impor berat dimuat di latar belakang; opsi lain diteruskan ke streamlit")
+    report = commands.add_parser('report', help="ukur waktu impor dingin dibanding anggaran di config.json")
+    report.add_argument('--config', default='config.json')
+    args, streamlit_args = parser.parse_known_args(argv)
+    if streamlit_args and args.command != 'serve':
+        parser.error(f"argumen tidak dikenal: {' '.join(streamlit_args)}")
+
+    if args.command == 'serve':
+        # Streamlit tidak menyediakan hook saat server start untuk kode aplikasi;
+        # impor berat dimuat paralel selagi server menyiapkan diri sehingga
+        # eksekusi pertama app.py (dan warm-up-nya) tidak perlu menunggu
+        threading.Thread(target=preload, args=(EAGER_MODULES + DEFERRED_MODULES,), name='startup-preload', daemon=True).start()
+        from streamlit.web import cli
+        sys.argv = ['streamlit', 'run', 'app.py', *streamlit_args]
+        return cli.main()
+
+    try:
+        with open(args.config, 'r', encoding='utf-8') as file:
+            budget = json.load(file).get('startup', {}).get('import_budget_ms', 500)
+    except FileNotFoundError:
+        budget = 500
+    eager = measure_import(EAGER_MODULES)
+    if eager is None:
+        print("Gagal mengimpor modul awal")
+        return 1
+    print(f"{'modul':<28}{'ms':>10}")
+    print(f"{'(impor awal app.py)':<28}{eager * 1000:>10.1f}")
+    for module in DEFERRED_MODULES:
+        # Biaya tambahan setiap modul yang ditunda, di atas impor awal
+        seconds = measure_import([module], base=('streamlit',) + EAGER_MODULES)
+        print(f"{module:<28}{(f'{seconds * 1000:.1f}' if seconds is not None else 'gagal'):>10}  ditunda")
+    print(f"\nImpor awal {eager * 1000:.1f} ms, anggaran {budget} ms")
+    return 0 if eager * 1000 <= budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Bundle CSS tema terang/gelap yang diminifikasi dan dilayani dengan URL ber-hash."""
+import gzip
+import hashlib
+import json
+import re
+import threading
+
+THEMES = ('light', 'dark')
+CSS_MIME = 'text/css; charset=utf-8'
+
+_COMMENTS = re.compile(r'/\*.*?\*/', re.S)
+_SPACES = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_BLOCK = re.compile(r'(:root|\[data-theme="(\w+)"\])\{([^}]*)\}')
+
+
+def minify_css(css):
+    """Buang komentar dan spasi yang tidak berarti; spasi antar-selector (descendant) tetap."""
+    css = _COMMENTS.sub('', css)
+    css = _SPACES.sub(' ', css)
+    css = _PUNCTUATION.sub(r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def parse_variables(block):
+    variables = {}
+    for declaration in block.split(';'):
+        name, _, value = declaration.partition(':')
+        if name.strip().startswith('--'):
+            variables[name.strip()] = value.strip()
+    return variables
+
+
+def theme_css(css, theme):
+    """CSS mandiri untuk satu tema: variabel ``[data-theme=...]`` digabung ke ``:root``."""
+    css = minify_css(css)
+    blocks = {}
+    for match in _BLOCK.finditer(css):
+        blocks.setdefault(match.group(2) or 'light', {}).update(parse_variables(match.group(3)))
+    variables = dict(blocks.get('light', {}), **blocks.get(theme, {}))
+    root = ':root{' + ';'.join(f"{name}:{value}" for name, value in variables.items()) + '}'
+    body = _BLOCK.sub('', css)
+    return root + body
+
+
+class ThemeBundle:
+    content_type = CSS_MIME
+
+    def __init__(self, theme, css):
+        self.theme = theme
+        self.content = css.encode('utf-8')
+        self.digest = hashlib.sha256(self.content).hexdigest()[:12]
+        self.gzipped = gzip.compress(self.content, 9, mtime=0)
+        self.filename = f"theme-{theme}-{self.digest}.css"
+
+    @property
+    def etag(self):
+        return f'"{self.digest}"'
+
+
+class ThemeAssets:
+    """Bundle per tema, dibangun ulang hanya jika isi ``style.css`` berubah.
+
+    Bundle lama tetap bisa diambil (browser yang masih memegang URL lama)
+    sampai ``keep`` versi lebih baru menggantikannya.
+    """
+
+    def __init__(self, themes=THEMES, keep=4):
+        self.themes = themes
+        self.keep = keep
+        self.source_digest = None
+        self.bundles = {}
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def build(self, css):
+        """``{tema: ThemeBundle}`` untuk isi ``css``; dibangun sekali per isi."""
+        digest = hashlib.sha256(css.encode('utf-8')).hexdigest()
+        with self._lock:
+            if digest == self.source_digest:
+                return self.bundles
+        bundles = {theme: ThemeBundle(theme, theme_css(css, theme)) for theme in self.themes}
+        with self._lock:
+            self.source_digest = digest
+            self.bundles = bundles
+            for bundle in bundles.values():
+                self._files.pop(bundle.filename, None)
+                self._files[bundle.filename] = bundle
+            while len(self._files) > self.keep * len(self.themes):
+                del self._files[next(iter(self._files))]
+            return bundles
+
+    def get(self, filename):
+        with self._lock:
+            return self._files.get(filename)
+
+
+# Dijalankan di iframe komponen (same-origin dengan halaman Streamlit). Stylesheet
+# dipasang di <head> halaman induk, di luar pohon elemen Streamlit, sehingga rerun
+# tidak menyentuhnya; pilihan tema disimpan di localStorage browser.
+SWITCHER_SCRIPT = """
+<script>
+(function () {
+  const KEY = 'barjas-theme';
+  const sources = %(sources)s;
+  const parent = window.parent;
+  const doc = parent.document;
+
+  function apply(theme) {
+    const source = sources[theme] || sources.light;
+    const current = doc.getElementById(KEY);
+    if (source.href) {
+      if (current && current.getAttribute('href') === source.href) return;
+      const link = doc.createElement('link');
+      link.rel = 'stylesheet';
+      link.href = source.href;
+      // Stylesheet lama dilepas setelah yang baru termuat agar tidak berkedip
+      link.onload = function () {
+        if (current) current.remove();
+        link.id = KEY;
+      };
+      doc.head.appendChild(link);
+    } else {
+      if (current && current.textContent === source.css) return;
+      const style = doc.createElement('style');
+      style.textContent = source.css;
+      if (current) current.remove();
+      style.id = KEY;
+      doc.head.appendChild(style);
+    }
+    doc.documentElement.dataset.theme = theme;
+  }
+
+  function stored() {
+    try { return parent.localStorage.getItem(KEY) || 'light'; } catch (e) { return 'light'; }
+  }
+
+  apply(stored());
+  const button = document.getElementById('toggle');
+  if (!button) return;
+  const label = function () { button.textContent = stored() === 'dark' ? '☀️' : '🌙'; };
+  button.onclick = function () {
+    const theme = stored() === 'dark' ? 'light' : 'dark';
+    try { parent.localStorage.setItem(KEY, theme); } catch (e) {}
+    apply(theme);
+    label();
+  };
+  label();
+})();
+</script>
+"""
+
+TOGGLE_HTML = """
+<style>
+  body { margin: 0; }
+  #toggle { width: 100%; height: 38px; border: none; border-radius: 10px; background: #1E88E5; color: white; cursor: pointer; font-size: 16px; }
+</style>
+<button id="toggle" title="Ganti tema"></button>
+"""
+
+
+def switcher_html(sources, toggle=False):
+    """HTML komponen yang memasang tema; ``sources`` = ``{tema: {'href': url} atau {'css': teks}}``."""
+    # '</' di-escape agar isi CSS tidak bisa menutup tag <script>
+    html = SWITCHER_SCRIPT % {'sources': json.dumps(sources).replace('</', '<\\/')}
+    return TOGGLE_HTML + html if toggle else html
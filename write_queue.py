@@ -0,0 +1,248 @@
+"""Antrian tulis balik hasil edit sel ke Google Sheets: debounce, coalesce, satu batchUpdate."""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from gspread.urls import SPREADSHEET_VALUES_BATCH_UPDATE_URL
+from gspread.utils import absolute_range_name, rowcol_to_a1
+
+from sheet_data import frame_layout
+
+
+def cell_value(value):
+    """Nilai sel untuk API Sheets (USER_ENTERED): kosong jadi '', angka numpy jadi angka Python."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def same_value(a, b):
+    return str(cell_value(a)) == str(cell_value(b))
+
+
+def cell_ranges(edits):
+    """Sel bersebelahan dalam satu baris digabung menjadi satu range A1 (payload ``values:batchUpdate``)."""
+    by_row = {}
+    for edit in edits:
+        by_row.setdefault((edit.tab, edit.row), {})[edit.col] = cell_value(edit.value)
+
+    data = []
+    for (tab, row), cells in sorted(by_row.items()):
+        columns = sorted(cells)
+        runs = [[columns[0]]]
+        for column in columns[1:]:
+            if column == runs[-1][-1] + 1:
+                runs[-1].append(column)
+            else:
+                runs.append([column])
+        for run in runs:
+            cell_range = rowcol_to_a1(row, run[0])
+            if len(run) > 1:
+                cell_range += ':' + rowcol_to_a1(row, run[-1])
+            data.append({'range': absolute_range_name(tab, cell_range), 'values': [[cells[column] for column in run]]})
+    return data
+
+
+def make_writer(client):
+    """Satu panggilan ``values:batchUpdate`` langsung, tanpa mengambil metadata spreadsheet dulu."""
+    def write(sheet_id, data):
+        body = {'valueInputOption': 'USER_ENTERED', 'data': data}
+        return client.request('post', SPREADSHEET_VALUES_BATCH_UPDATE_URL % sheet_id, json=body).json()
+    return write
+
+
+class CellEdit:
+    """Satu sel yang diubah: posisi di DataFrame (``label``, ``column``) dan di sheet (``row``, ``col``)."""
+
+    def __init__(self, tab, label, column, row, col, base, value, version):
+        self.tab = tab
+        self.label = label
+        self.column = column
+        self.row = row
+        self.col = col
+        self.base = base
+        self.value = value
+        self.version = version
+        self.at = time.time()
+
+    @property
+    def key(self):
+        return (self.tab, self.row, self.col)
+
+    def describe(self, upstream=None):
+        return {
+            'Tab': self.tab,
+            'Baris': self.row,
+            'Kolom': self.column,
+            'Nilai awal': cell_value(self.base),
+            'Nilai baru': cell_value(self.value),
+            'Nilai di sheet': cell_value(upstream),
+        }
+
+
+class WriteQueue:
+    """Antrian edit per sheet yang dikirim sebagai satu batch setelah jeda.
+
+    ``submit()`` menggabungkan edit pada sel yang sama (nilai terakhir menang,
+    nilai awal tetap dari edit pertama) dan menunda flush selama ``delay`` detik
+    sejak edit terakhir, paling lama ``max_delay`` detik sejak edit pertama.
+    Sebelum menulis, setiap sel dibandingkan dengan versi tabel terbaru di
+    cache (``current(sheet_id) -> (version, frames)``); sel yang sudah berubah
+    di sheet sejak diedit tidak ditimpa dan dilaporkan sebagai konflik.
+    """
+
+    def __init__(self, write, current=None, delay=2.0, max_delay=10.0):
+        self.write = write
+        self.current = current
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}
+        self._applied = {}
+        self._timers = {}
+        self._results = {}
+        self._flush_locks = {}
+        self._lock = threading.Lock()
+        self.stats = {'flushes': 0, 'cells': 0, 'conflicts': 0, 'errors': 0}
+
+    def configure(self, delay=None, max_delay=None):
+        with self._lock:
+            if delay is not None:
+                self.delay = delay
+            if max_delay is not None:
+                self.max_delay = max_delay
+
+    def submit(self, sheet_id, edits):
+        with self._lock:
+            pending = self._pending.setdefault(sheet_id, {})
+            for edit in edits:
+                queued = pending.get(edit.key)
+                if queued is not None:
+                    edit.base, edit.version, edit.at = queued.base, queued.version, queued.at
+                if same_value(edit.base, edit.value):
+                    # Dikembalikan ke nilai awal: tidak perlu ditulis
+                    pending.pop(edit.key, None)
+                else:
+                    pending[edit.key] = edit
+            if pending:
+                self._schedule_locked(sheet_id)
+            else:
+                self._cancel_locked(sheet_id)
+
+    def _schedule_locked(self, sheet_id):
+        self._cancel_locked(sheet_id)
+        first = min(edit.at for edit in self._pending[sheet_id].values())
+        delay = max(0.0, min(self.delay, first + self.max_delay - time.time()))
+        timer = threading.Timer(delay, self.flush, args=(sheet_id,))
+        timer.daemon = True
+        self._timers[sheet_id] = timer
+        timer.start()
+
+    def _cancel_locked(self, sheet_id):
+        timer = self._timers.pop(sheet_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def find_conflicts(self, edits, state):
+        """Edit yang nilai awalnya tidak lagi sama dengan isi sheet pada versi cache ``state``."""
+        if state is None:
+            return []
+        version, frames = state
+        conflicts = []
+        for edit in edits:
+            if edit.version == version:
+                continue
+            frame = frames.get(edit.tab)
+            layout = frame_layout(frame) if frame is not None else None
+            if layout is None:
+                continue
+            positions = np.flatnonzero(layout.rows == edit.row)
+            columns = [name for name, col in layout.columns.items() if col == edit.col and name in frame.columns]
+            upstream = frame[columns[0]].iloc[positions[0]] if len(positions) and columns else None
+            if not same_value(upstream, edit.base):
+                conflicts.append((edit, upstream))
+        return conflicts
+
+    def flush(self, sheet_id):
+        """Kirim semua edit yang tertunda untuk satu sheet dalam satu permintaan."""
+        with self._lock:
+            flush_lock = self._flush_locks.setdefault(sheet_id, threading.Lock())
+        with flush_lock:
+            with self._lock:
+                self._cancel_locked(sheet_id)
+                edits = list(self._pending.pop(sheet_id, {}).values())
+            if not edits:
+                return None
+
+            state = self.current(sheet_id) if self.current else None
+            conflicts = self.find_conflicts(edits, state)
+            conflicted = {id(edit) for edit, _ in conflicts}
+            to_write = [edit for edit in edits if id(edit) not in conflicted]
+            result = {
+                'at': time.time(),
+                'written': 0,
+                'conflicts': [edit.describe(upstream) for edit, upstream in conflicts],
+                'error': None,
+            }
+            try:
+                if to_write:
+                    self.write(sheet_id, cell_ranges(to_write))
+                result['written'] = len(to_write)
+                with self._lock:
+                    applied = self._applied.setdefault(sheet_id, {})
+                    for edit in to_write:
+                        # Tetap ditampilkan sampai cache memuat versi setelah penulisan ini
+                        if state is not None:
+                            edit.version = state[0]
+                        applied[edit.key] = edit
+            except Exception as e:
+                result['error'] = str(e)
+                with self._lock:
+                    # Kembalikan ke antrian kecuali sel itu sudah diedit lagi
+                    pending = self._pending.setdefault(sheet_id, {})
+                    for edit in to_write:
+                        pending.setdefault(edit.key, edit)
+                    self.stats['errors'] += 1
+
+            with self._lock:
+                self._results[sheet_id] = result
+                self.stats['flushes'] += 1
+                self.stats['cells'] += result['written']
+                self.stats['conflicts'] += len(conflicts)
+            return result
+
+    def overlay(self, sheet_id, tab, frame, version):
+        """``{(label, kolom): nilai}`` edit yang belum terlihat di ``frame`` (tertunda atau baru ditulis).
+
+        Edit yang sudah ditulis dibuang begitu cache memuat versi tabel yang lebih baru.
+        """
+        layout = frame_layout(frame)
+        if layout is None:
+            return {}
+        with self._lock:
+            applied = self._applied.get(sheet_id, {})
+            for key in [key for key, edit in applied.items() if edit.version != version]:
+                del applied[key]
+            edits = list(applied.values()) + list(self._pending.get(sheet_id, {}).values())
+
+        names = {col: name for name, col in layout.columns.items() if name in frame.columns}
+        result = {}
+        for edit in edits:
+            if edit.tab != tab or edit.col not in names:
+                continue
+            position = int(np.searchsorted(layout.rows, edit.row))
+            if position < len(layout.rows) and layout.rows[position] == edit.row:
+                result[(position, names[edit.col])] = edit.value
+        return result
+
+    def status(self, sheet_id):
+        with self._lock:
+            return {'pending': len(self._pending.get(sheet_id, {})), 'last': self._results.get(sheet_id)}
+
+    def info(self):
+        with self._lock:
+            return {'pending': sum(len(edits) for edits in self._pending.values()), **self.stats}